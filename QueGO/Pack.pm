@@ -0,0 +1,61 @@
+package QueGO::Pack;
+## Pombert Lab 2022
+
+## Reader of the structure packs built by structure_pack.py (PACK + PACK.idx), shared by
+## run_MICAN.pl and create_visualizations.pl
+
+use strict;
+use warnings;
+use IO::Uncompress::Gunzip qw(gunzip $GunzipError);
+use Exporter qw(import);
+
+our @EXPORT_OK = qw(read_pack_index pack_structure);
+
+sub read_pack_index {
+
+	## Structure name (1abc_A.pdb.gz) and ID (1abc_A) => [offset, length] in the pack
+	my ($pack_file) = @_;
+	my %index;
+	my @names;
+	open my $INDEX, "<", "$pack_file.idx" or die "Cannot read $pack_file.idx: $!\n";
+	while (my $line = <$INDEX>){
+		next if ($line =~ /^#/);
+		chomp($line);
+		my ($name,$offset,$length) = split("\t",$line);
+		$index{$name} = [$offset,$length];
+		(my $id = $name) =~ s/\.(pdb|ent|cif)(\.gz)?$//;
+		$index{$id} //= [$offset,$length];
+		push(@names,$name);
+	}
+	close $INDEX;
+	return { file => $pack_file, index => \%index, names => [sort(@names)] };
+}
+
+sub pack_structure {
+
+	## Structure with the given name or ID, read from a single gzip member of the pack; with
+	## $prefix, the first structure starting with the ID is taken otherwise (i.e., locus =>
+	## locus-model). Returns undef if the structure is not in the pack.
+	my ($structure_pack,$name,$prefix) = @_;
+	my $entry = $structure_pack->{index}{$name};
+	unless ($entry){
+		(my $id = $name) =~ s/\.(pdb|ent|cif)(\.gz)?$//;
+		$entry = $structure_pack->{index}{$id};
+		if ((!$entry) && $prefix){
+			my ($match) = grep { index($_,$id) == 0 } @{$structure_pack->{names}};
+			$entry = $structure_pack->{index}{$match} if ($match);
+		}
+	}
+	return unless ($entry);
+
+	open my $PACK, "<:raw", $structure_pack->{file} or die "Cannot read $structure_pack->{file}: $!\n";
+	seek($PACK,$entry->[0],0);
+	read($PACK,my $member,$entry->[1]);
+	close $PACK;
+
+	my $structure;
+	gunzip(\$member => \$structure, MultiStream => 1) or die "Cannot read $name from $structure_pack->{file}: $GunzipError\n";
+	return $structure;
+}
+
+1;
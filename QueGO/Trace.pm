@@ -0,0 +1,29 @@
+package QueGO::Trace;
+## Pombert Lab 2022
+
+## Tool calls traced by quego_trace.py, shared by the scripts of the pipeline:
+##   use FindBin qw($RealBin);
+##   use lib $RealBin;
+##   use QueGO::Trace qw(traced);
+
+use strict;
+use warnings;
+use File::Basename;
+use Cwd qw(abs_path);
+use Exporter qw(import);
+
+our @EXPORT_OK = qw(traced);
+
+my $trace_script = dirname(dirname(abs_path(__FILE__)))."/quego_trace.py";
+
+sub traced {
+
+	## Command line recording the wall time, CPU time, peak memory and exit status of a
+	## command with quego_trace.py when $QUEGO_TRACE is set (see run_QueGO.pl --trace)
+	my ($tool,$item,$command) = @_;
+	return $command unless ($ENV{QUEGO_TRACE});
+	my @quoted = map { my $word = $_ // ''; $word =~ s/'/'\\''/g; "'$word'" } ($tool,$item,$command);
+	return "$trace_script exec --tool $quoted[0] --item $quoted[1] --command $quoted[2]";
+}
+
+1;
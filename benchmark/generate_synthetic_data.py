@@ -0,0 +1,154 @@
+#!/usr/bin/python
+
+name = "generate_synthetic_data.py"
+version = "0.1.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Generates a synthetic QueGO dataset: a UniProt scrap (metadata.log, FASTA files and
+		gzipped PDB chains) for N accessions, and a set of M predicted structures with their
+		proteome. Structures are small C-alpha traces, so their sequences can be extracted
+		and their TM-scores computed. The same accessions are also written as a recorded
+		UniProt REST search, replayed by stand_ins/uniprot_rest. Used by run_benchmark.py
+		with the stand-in tools.
+
+COMMAND		{name} \\
+		  -o BENCHMARK_DATA \\
+		  -a 10000 \\
+		  -p 10000
+
+OPTIONS
+-o (--outdir)		Output directory
+-a (--accessions)	Number of UniProt accessions (one experimental structure each) [Default = 1000]
+-p (--predicted)	Number of predicted structures [Default = 1000]
+-l (--length)		Residues per structure [Default = 50]
+-n (--names)		Accessions per protein name (isoforms, orthologs) [Default = 3]
+-s (--seed)		Random seed [Default = 1]
+
+OUTPUT
+OUTDIR/UNIPROT_SCRAP_RESULTS/{{metadata.log,FASTA/,PDBs/}}
+OUTDIR/PREDICTIONS/SYNTHETIC/LOCUS_000001.pdb ...
+OUTDIR/proteins.faa
+OUTDIR/uniprot_rest.json
+
+"""
+
+import gzip
+import json
+import math
+import random
+from os import makedirs
+
+amino_acids = {
+	"A": "ALA", "C": "CYS", "D": "ASP", "E": "GLU", "F": "PHE", "G": "GLY", "H": "HIS",
+	"I": "ILE", "K": "LYS", "L": "LEU", "M": "MET", "N": "ASN", "P": "PRO", "Q": "GLN",
+	"R": "ARG", "S": "SER", "T": "THR", "V": "VAL", "W": "TRP", "Y": "TYR",
+}
+residues = sorted(amino_acids)
+
+def pdb_code(index):
+
+	## Four characters starting with a digit, like PDB codes
+	digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+	code = ""
+	for position in range(3):
+		code = digits[index % 36] + code
+		index //= 36
+	return str(1 + index % 9) + code
+
+def ca_trace(rng,sequence,chain="A"):
+
+	## Helix-like C-alpha trace (3.8 A steps) with some noise, so structure pairs differ
+	lines = []
+	turn = math.radians(100)
+	for position, residue in enumerate(sequence):
+		x = 2.3 * math.cos(turn * position) + rng.gauss(0,0.6)
+		y = 2.3 * math.sin(turn * position) + rng.gauss(0,0.6)
+		z = 1.5 * position + rng.gauss(0,0.6)
+		lines.append(f"ATOM  {position+1:>5}  CA  {amino_acids[residue]} {chain}{position+1:>4}    {x:>8.3f}{y:>8.3f}{z:>8.3f}  1.00 80.00           C\n")
+	lines.append("TER\nEND\n")
+	return "".join(lines)
+
+def fasta(header,sequence):
+
+	return f">{header}\n" + "".join([sequence[begin:begin+60]+"\n" for begin in range(0,len(sequence),60)])
+
+def generate(outdir,accessions=1000,predicted=1000,length=50,names=3,seed=1):
+
+	rng = random.Random(seed)
+
+	uniprot_dir = f"{outdir}/UNIPROT_SCRAP_RESULTS"
+	prediction_dir = f"{outdir}/PREDICTIONS/SYNTHETIC"
+	for directory in (f"{uniprot_dir}/FASTA",f"{uniprot_dir}/PDBs",prediction_dir):
+		makedirs(directory,exist_ok=True)
+
+	## UniProt scrap, written like uniprot_scraper.py, and the REST search it comes from
+	recording = {"query": "synthetic", "results": [], "fasta": {}}
+	META = open(f"{uniprot_dir}/metadata.log","w")
+	for index in range(accessions):
+		accession = f"SYN{index+1:06d}"
+		protein = f"Synthetic protein {index//names+1}"
+		code = pdb_code(index)
+		sequence = "".join(rng.choice(residues) for position in range(length))
+
+		META.write(f">{accession}\n")
+		META.write(f"\tPROTEIN_NAME\n\t\t{protein}\n")
+		META.write(f"\tORGANISM_NAME\n\t\tSynthetic organism\n")
+		META.write(f"\tFEATURES\n\t\tNone Available\n")
+		META.write(f"\tSTRUCTURES\n\t\t{code}\tA\tX-ray\thttps://files.rcsb.org/download/{code}.pdb\n")
+
+		FASTA = open(f"{uniprot_dir}/FASTA/{accession}.fasta","w")
+		FASTA.write(fasta(f"sp|{accession}|SYN{index//names+1}_SYNTH {protein} OS=Synthetic organism",sequence))
+		FASTA.close()
+
+		recording["results"].append({
+			"primaryAccession": accession,
+			"proteinDescription": {"recommendedName": {"fullName": {"value": protein}}},
+			"organism": {"scientificName": "Synthetic organism"},
+			"uniProtKBCrossReferences": [{"database": "PDB", "id": code, "properties": [{"key": "Method", "value": "X-ray"}, {"key": "Chains", "value": f"A=1-{length}"}]}],
+		})
+		recording["fasta"][accession] = fasta(f"sp|{accession}|SYN{index//names+1}_SYNTH {protein} OS=Synthetic organism",sequence)
+
+		with gzip.open(f"{uniprot_dir}/PDBs/{code}_A.pdb.gz","wt",compresslevel=1) as PDB:
+			PDB.write(ca_trace(rng,sequence))
+	META.close()
+
+	RECORDING = open(f"{outdir}/uniprot_rest.json","w")
+	json.dump(recording,RECORDING)
+	RECORDING.close()
+
+	## Predicted structures and the proteome they come from
+	FAA = open(f"{outdir}/proteins.faa","w")
+	for index in range(predicted):
+		locus = f"LOCUS_{index+1:06d}"
+		sequence = "".join(rng.choice(residues) for position in range(length))
+		FAA.write(fasta(locus,sequence))
+		PDB = open(f"{prediction_dir}/{locus}.pdb","w")
+		PDB.write(ca_trace(rng,sequence))
+		PDB.close()
+	FAA.close()
+
+	return {"accessions": accessions, "predicted": predicted, "length": length, "seed": seed}
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-o","--outdir",required=True)
+	parser.add_argument("-a","--accessions",type=int,default=1000)
+	parser.add_argument("-p","--predicted",type=int,default=1000)
+	parser.add_argument("-l","--length",type=int,default=50)
+	parser.add_argument("-n","--names",type=int,default=3)
+	parser.add_argument("-s","--seed",type=int,default=1)
+
+	args = parser.parse_args()
+
+	generate(args.outdir,args.accessions,args.predicted,args.length,args.names,args.seed)
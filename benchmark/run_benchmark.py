@@ -0,0 +1,221 @@
+#!/usr/bin/python
+
+name = "run_benchmark.py"
+version = "0.2.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Times each QueGO stage on synthetic datasets of increasing size, with stand-ins for
+		Foldseek, GESAMT, DIAMOND and MICAN (stand_ins/) that answer in a fraction of the
+		time of the real tools, so what is measured is QueGO's own work: directory scans,
+		subprocess spawns, parsing and joins. Results (wall time, CPU time, peak RSS and exit
+		status per stage and scale) are written to a JSON baseline; runs can be compared to a
+		previous baseline to catch regressions. The UniProt scrap itself is timed with
+		uniprot_scraper.py --rest against stand_ins/uniprot_rest, which replays the synthetic
+		accessions as a recorded REST search; its metadata.log must match the synthetic one.
+		benchmark/baseline.json holds the reference results for 1000 and 10000 accessions with
+		the default settings; regenerate it on the machine the comparisons are run on.
+
+COMMAND		{name} \\
+		  -s 1000 10000 100000 \\
+		  -o benchmark/baseline.json
+
+		{name} -s 1000 10000 -c benchmark/baseline.json
+
+OPTIONS
+-s (--scales)		Numbers of UniProt accessions to benchmark [Default = 1000 10000 100000]
+-r (--ratio)		Predicted structures per UniProt accession [Default = 1.0]
+-d (--density)		Mean number of hits per query returned by the stand-ins [Default = 5]
+-t (--threads)		Threads given to each stage [Default = 4]
+-b (--backend)		TM-score backend for run_MICAN.pl: mican or numpy [Default = mican]; the NumPy engine
+			is first checked against the fixture pairs of validate_tmscore_engine.py
+-g (--gesamt)		Also benchmark the GESAMT archive and searches
+-w (--workdir)		Working directory [Default = BENCHMARK_RUNS]
+-k (--keep)		Keep the synthetic data and outputs of each scale
+-o (--out)		JSON file to write the results to [Default = benchmark_results.json]
+-c (--compare)		Baseline JSON to compare the results to; exits with an error on regressions
+-x (--tolerance)	Slowdown tolerated before a stage is flagged, as a fraction [Default = 0.25]
+-m (--min_seconds)	Slowdowns shorter than this are ignored as noise [Default = 0.5]
+
+"""
+
+import json
+import shutil
+import socket
+import platform
+import subprocess
+from os import path, environ, makedirs, cpu_count
+from sys import path as sys_path
+from time import time, strftime
+
+benchmark_dir = path.dirname(path.abspath(__file__))
+pipeline_dir = path.dirname(benchmark_dir)
+sys_path.insert(0,pipeline_dir)
+
+from quego_trace import run, read_trace
+from generate_synthetic_data import generate
+
+def stages(data,work,threads,backend,gesamt,rest_url):
+
+	## Same calls as run_QueGO.pl, in pipeline order
+	uniprot = f"{data}/UNIPROT_SCRAP_RESULTS"
+	predicted = f"{data}/PREDICTIONS/SYNTHETIC"
+	archives = f"{work}/STRUCTURE_HOMOLOGY/ARCHIVES"
+	results = f"{work}/STRUCTURE_HOMOLOGY/RESULTS"
+
+	commands = [
+		("uniprot_rest", f"{pipeline_dir}/uniprot_scraper.py --rest --rest_url {rest_url} --page_size 100 -df -c synthetic -w {threads} -o {work}/UNIPROT_SCRAP_RESULTS"),
+		("extract", f"{pipeline_dir}/extract_pdb_sequence.pl --dirs {predicted} --fasta {work}/SEQUENCE_HOMOLOGY/proteins.faa --threads {threads}"),
+		("sequence_search", f"{pipeline_dir}/perform_sequence_search.pl --faa {work}/SEQUENCE_HOMOLOGY/proteins.faa --uni {uniprot}/FASTA --threads {threads} --eval 1e-10 --outdir {work}/SEQUENCE_HOMOLOGY --batch"),
+		("foldseek_archive", f"{pipeline_dir}/run_foldseek.pl --create --db {archives}/FOLDSEEK/SYNTHETIC/SYNTHETIC --pdb {predicted} --threads {threads}"),
+		("foldseek_search", f"{pipeline_dir}/run_foldseek.pl --query --db {archives}/FOLDSEEK/SYNTHETIC/SYNTHETIC --input {uniprot}/PDBs/*.pdb* --outdir {results}/FOLDSEEK/SYNTHETIC --threads {threads} --batch --gzip"),
+		("tmscore", f"{pipeline_dir}/run_MICAN.pl --results_dir {results} --uniprot_pdb {uniprot}/PDBs --threads {threads} --backend {backend} --pack --predict_dir {predicted}"),
+	]
+	if gesamt:
+		commands += [
+			("gesamt_archive", f"{pipeline_dir}/run_GESAMT.pl -cpu {threads} -make -arch {archives}/GESAMT/SYNTHETIC -pdb {predicted}"),
+			("gesamt_search", f"{pipeline_dir}/run_GESAMT.pl --cpu {threads} --jobs {max(threads//4,1)} --query --arch {archives}/GESAMT/SYNTHETIC --input {uniprot}/PDBs/*.pdb* --outdir {results}/GESAMT/SYNTHETIC --gzip -mode normal"),
+		]
+	commands += [
+		("parse", f"{pipeline_dir}/parse_3D_homology_results.pl --gesamt {results}/GESAMT --foldseek {results}/FOLDSEEK_w_MICAN --qscore 0.3 --tm 0.3 --outdir {work}/RESULTS"),
+		("compile", f"{pipeline_dir}/organize_results.pl --metadata {uniprot}/metadata.log --foldseek {work}/RESULTS/FoldSeek_parsed_results.matches --gesamt {work}/RESULTS/GESAMT_parsed_results.matches --seqnc {work}/SEQUENCE_HOMOLOGY/All_sequence_results.tsv --outfile {work}/RESULTS"),
+		("store", f"{pipeline_dir}/results_store.py build --outdir {work}/RESULTS/results_store --sequence {work}/SEQUENCE_HOMOLOGY/All_sequence_results.tsv --foldseek {work}/RESULTS/FoldSeek_parsed_results.matches --gesamt {work}/RESULTS/GESAMT_parsed_results.matches --compiled {work}/RESULTS/compiled_results.tsv"),
+	]
+	return commands
+
+def read_file(file):
+
+	if not path.isfile(file):
+		return None
+	FILE = open(file,"r")
+	content = FILE.read()
+	FILE.close()
+	return content
+
+def benchmark(scale,args):
+
+	data = path.abspath(f"{args.workdir}/{scale}/DATA")
+	work = path.abspath(f"{args.workdir}/{scale}/RUN")
+	for directory in (data,work):
+		if path.isdir(directory):
+			shutil.rmtree(directory)
+	## Directories run_QueGO.pl creates before its stages
+	for directory in ("RESULTS","STRUCTURE_HOMOLOGY/ARCHIVES/FOLDSEEK","STRUCTURE_HOMOLOGY/ARCHIVES/GESAMT","STRUCTURE_HOMOLOGY/RESULTS/FOLDSEEK","STRUCTURE_HOMOLOGY/RESULTS/GESAMT"):
+		makedirs(f"{work}/{directory}",exist_ok=True)
+
+	start = time()
+	dataset = generate(data,accessions=scale,predicted=max(int(scale*args.ratio),1))
+	dataset["generation_seconds"] = round(time()-start,3)
+	print(f"\n{scale}\tSynthetic data generated in {dataset['generation_seconds']:.1f} s")
+
+	## Replays the synthetic accessions as a UniProt REST search; structures are already in place
+	## (as when a scrap is resumed), so only metadata and FASTA files are requested
+	shutil.copytree(f"{data}/UNIPROT_SCRAP_RESULTS/PDBs",f"{work}/UNIPROT_SCRAP_RESULTS/PDBs")
+	server = subprocess.Popen([f"{benchmark_dir}/stand_ins/uniprot_rest","serve",f"{data}/uniprot_rest.json"],stdout=subprocess.PIPE,text=True)
+	rest_url = server.stdout.readline().strip()
+
+	trace_file = f"{work}/benchmark_trace.jsonl"
+	results = {}
+	for stage, command in stages(data,work,args.threads,args.backend,args.gesamt,rest_url):
+		status = run(f"cd {work} && {command} 1>{work}/{stage}.out 2>{work}/{stage}.err",tool=stage,item=str(scale),stage=stage,trace_file=trace_file)
+		event = read_trace([trace_file])[-1]
+		if (stage == "uniprot_rest") and (not status) and (read_file(f"{work}/UNIPROT_SCRAP_RESULTS/metadata.log") != read_file(f"{data}/UNIPROT_SCRAP_RESULTS/metadata.log")):
+			print(f"[E]  {work}/UNIPROT_SCRAP_RESULTS/metadata.log differs from the synthetic one")
+			status = event["status"] = 1
+		results[stage] = {key: event[key] for key in ("wall","user","sys","max_rss_kb","status")}
+		print(f"{scale}\t{stage:<18}\t{event['wall']:>9.2f} s\t{event['user']+event['sys']:>9.2f} s CPU\t{event['max_rss_kb']/1024:>8.1f} MB" + (f"\t[E] exit status {status}, see {work}/{stage}.err" if status else ""))
+
+	server.terminate()
+	server.wait()
+
+	if not args.keep:
+		shutil.rmtree(f"{args.workdir}/{scale}")
+
+	return {"dataset": dataset, "stages": results}
+
+def compare(current,baseline,tolerance,min_seconds):
+
+	## Stages slower than the baseline by more than the tolerance (and min_seconds)
+	regressions = []
+	print("\nScale\tStage\tBaseline (s)\tCurrent (s)\tChange")
+	for scale in sorted(current["scales"],key=int):
+		if scale not in baseline.get("scales",{}):
+			continue
+		for stage, result in current["scales"][scale]["stages"].items():
+			reference = baseline["scales"][scale]["stages"].get(stage)
+			if not reference:
+				continue
+			change = (result["wall"]-reference["wall"])/max(reference["wall"],1e-6)
+			flag = ""
+			if (change > tolerance) and ((result["wall"]-reference["wall"]) > min_seconds):
+				flag = "\t[REGRESSION]"
+				regressions.append((scale,stage))
+			elif result["status"] and not reference["status"]:
+				flag = "\t[FAILED]"
+				regressions.append((scale,stage))
+			print(f"{scale}\t{stage}\t{reference['wall']:.2f}\t{result['wall']:.2f}\t{change*100:+.1f}%{flag}")
+	return regressions
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-s","--scales",type=int,nargs="+",default=[1000,10000,100000])
+	parser.add_argument("-r","--ratio",type=float,default=1.0)
+	parser.add_argument("-d","--density",type=float,default=5)
+	parser.add_argument("-t","--threads",type=int,default=4)
+	parser.add_argument("-b","--backend",choices=["mican","numpy"],default="mican")
+	parser.add_argument("-g","--gesamt",action='store_true')
+	parser.add_argument("-w","--workdir",default="BENCHMARK_RUNS")
+	parser.add_argument("-k","--keep",action='store_true')
+	parser.add_argument("-o","--out",default="benchmark_results.json")
+	parser.add_argument("-c","--compare")
+	parser.add_argument("-x","--tolerance",type=float,default=0.25)
+	parser.add_argument("-m","--min_seconds",type=float,default=0.5)
+
+	args = parser.parse_args()
+
+	## Stand-ins are found first in $PATH by the pipeline scripts
+	environ["PATH"] = f"{benchmark_dir}/stand_ins:{environ['PATH']}"
+	environ["QUEGO_STANDIN_HITS"] = str(args.density)
+	environ.pop("QUEGO_TRACE",None)
+	environ.pop("QUEGO_CACHE",None)
+
+	## Timings of an engine giving wrong scores are of no use
+	if args.backend == "numpy":
+		if subprocess.run(f"cd {pipeline_dir} && ./validate_tmscore_engine.py -p benchmark/fixtures/tmscore/pairs.tsv",shell=True).returncode:
+			exit("\n[E]  The NumPy TM-score engine does not agree with the fixture references\n")
+
+	results = {
+		"version": version,
+		"created": strftime("%Y-%m-%dT%H:%M:%S"),
+		"host": {"name": socket.gethostname(), "cpus": cpu_count(), "platform": platform.platform(), "python": platform.python_version()},
+		"settings": {"ratio": args.ratio, "density": args.density, "threads": args.threads, "backend": args.backend, "gesamt": args.gesamt},
+		"scales": {},
+	}
+
+	for scale in args.scales:
+		results["scales"][str(scale)] = benchmark(scale,args)
+		## Written after each scale, so the smaller scales are kept if a larger one is interrupted
+		OUT = open(f"{args.out}.tmp","w")
+		json.dump(results,OUT,indent=1)
+		OUT.close()
+		shutil.move(f"{args.out}.tmp",args.out)
+
+	print(f"\nResults written to {args.out}")
+
+	if args.compare:
+		BASELINE = open(args.compare,"r")
+		baseline = json.load(BASELINE)
+		BASELINE.close()
+		if baseline.get("settings") != results["settings"]:
+			print(f"\n[W]  Settings differ from the baseline: {baseline.get('settings')}")
+		regressions = compare(results,baseline,args.tolerance,args.min_seconds)
+		if regressions:
+			exit(f"\n[E]  {len(regressions)} stage(s) slower than {args.compare}: "+", ".join([f"{stage} ({scale})" for scale, stage in regressions])+"\n")
+		print(f"\nNo regressions compared to {args.compare}\n")
@@ -0,0 +1,61 @@
+name = "synthetic_hits.py"
+version = "0.1.0"
+updated = "2026-10-17"
+
+## Hits shared by the stand-in tools: each query gets a reproducible set of targets (about
+## $QUEGO_STANDIN_HITS per query, 5 by default) and scores, whatever order queries run in
+
+import zlib
+import random
+from os import environ
+
+def density():
+
+	return float(environ.get("QUEGO_STANDIN_HITS","5"))
+
+def targets_for(query,targets):
+
+	rng = random.Random(zlib.crc32(query.encode()))
+	count = min(rng.randint(0,int(round(2*density()))),len(targets))
+	return rng, [targets[index] for index in sorted(rng.sample(range(len(targets)),count))]
+
+def alignment(rng,length=50):
+
+	## Columns common to Foldseek (easy-search default) and DIAMOND (--outfmt 6) after the
+	## query and target: identity, length, mismatches, gap openings, ranges, e-value, bits
+	alnlen = rng.randint(max(length//2,1),length)
+	fident = rng.uniform(0.1,0.95)
+	mismatch = int(alnlen*(1-fident))
+	gapopen = rng.randint(0,3)
+	qstart = rng.randint(1,length-alnlen+1)
+	tstart = rng.randint(1,length-alnlen+1)
+	exponent = rng.uniform(1,40)
+	bits = int(3.3*exponent)+rng.randint(20,40)
+	return [fident,alnlen,mismatch,gapopen,qstart,qstart+alnlen-1,tstart,tstart+alnlen-1,10**-exponent,bits]
+
+def read_list(file):
+
+	LIST = open(file,"r")
+	names = [line.rstrip("\n") for line in LIST if line.strip()]
+	LIST.close()
+	return names
+
+def write_list(file,names,mode="w"):
+
+	LIST = open(file,mode)
+	LIST.write("".join([f"{item}\n" for item in names]))
+	LIST.close()
+
+def positional(arguments,flags=()):
+
+	## Command line arguments other than options and their values (i.e., --threads 4)
+	values = []
+	skip = False
+	for argument in arguments:
+		if skip:
+			skip = False
+		elif argument.startswith("-"):
+			skip = ("=" not in argument) and (argument not in flags)
+		else:
+			values.append(argument)
+	return values
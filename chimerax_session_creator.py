@@ -1,13 +1,13 @@
 #!/usr/bin/python
 from chimerax.core.commands import run
-from sys import argv
+from sys import argv, stderr
 import argparse
 import re
 import os
 
 name = 'chimerax_session_creator.py'
-version = '0.4.0'
-updated = '2022-08-31'
+version = '0.5.0'
+updated = '2026-10-17'
 
 usage = f'''
 NAME		{name}
@@ -19,10 +19,16 @@ SYNOPSIS	This script is used to align a reference .pdb to a predicted .pdb,
 		chains, and saves the result as a ChimeraX session, .cxs file. This version
 		is tested and functional as of ChimeraX 1.3.1.
 
+		With a manifest, all alignments listed are saved from this ChimeraX session,
+		closing the models between alignments, so ChimeraX is started only once.
+
 COMMAND		{name} \\
 			-p ...preference \\
 			-r ...reference
 
+		{name} \\
+			-j manifest.tsv
+
 OPTIONS
 
 -p (--provided_pdb)		Predicted .pdb file
@@ -30,6 +36,8 @@ OPTIONS
 -m (--match)	RCSB match name
 -c (--chain)	RCSB matched chain
 -o (--outdir)	Output directory for .cxs files [Default: ./3D_Visualizations]
+-j (--manifest)	Tab-delimited list of alignments to save: provided .pdb, match .pdb, .cxs file;
+		existing .cxs files are skipped
 '''
 
 if len(argv) < 2:
@@ -37,45 +45,76 @@ if len(argv) < 2:
 	exit()
 
 parser = argparse.ArgumentParser(usage=usage)
-parser.add_argument('-p','--provided_pdb',type=str,required=True)
-parser.add_argument('-m','--match_pdb',type=str,required=True)
+parser.add_argument('-p','--provided_pdb',type=str)
+parser.add_argument('-m','--match_pdb',type=str)
 parser.add_argument('-o','--outdir',type=str,default="./3D_Visualizations")
+parser.add_argument('-j','--manifest',type=str)
 parser.add_argument('--nogui')
 
 args = parser.parse_args()
-provided_pdb = args.provided_pdb
-match_pdb = args.match_pdb
+if not (args.manifest or (args.provided_pdb and args.match_pdb)):
+	parser.error("either --manifest or both --provided_pdb and --match_pdb are required")
 if(args.outdir):
 	outdir = args.outdir
 
-provided_pdb_name = (os.path.splitext(os.path.basename(provided_pdb))[0]).replace(".temp","")
-match_pdb_name = (os.path.splitext(os.path.basename(match_pdb))[0]).replace(".temp","")
+def pdb_name(pdb_file):
+
+	return (os.path.splitext(os.path.basename(pdb_file))[0]).replace(".temp","")
+
+def create_session(provided_pdb,match_pdb,cxs_file):
+
+	## Load pdb files
+	model_provided_pdb = run(session,f"open {provided_pdb}")[0]
+	model_provided_pdb_name = (model_provided_pdb.id_string)
+
+	model_rcsb = run(session,f"open {match_pdb}")[0]
+	model_rcsb_name = (model_rcsb.id_string)
+
+
+	## Prepare file for display by hiding everything
+	run(session,"hide atoms")
+	run(session,"hide ribbons")
+
+	match = run(session,f"match #{model_provided_pdb_name} to #{model_rcsb_name}")
 
-## Load pdb files
-model_provided_pdb = run(session,f"open {provided_pdb}")[0]
-model_provided_pdb_name = (model_provided_pdb.id_string)
+	## Color reference structure a diferrent color
+	run(session,f"color #{model_rcsb_name} #00FFFF ribbons")
 
-model_rcsb = run(session,f"open {match_pdb}")[0]
-model_rcsb_name = (model_rcsb.id_string)
+	## Show only matching chains
+	run(session,f"show #{model_provided_pdb_name} ribbons")
+	run(session,f"show #{model_rcsb_name} ribbons")
 
+	## Orient the chain to view
+	run(session,"view")
 
-## Prepare file for display by hiding everything
-run(session,"hide atoms")
-run(session,"hide ribbons")
+	## Save match as a new file; renamed once complete, so an interrupted save is not skipped later
+	run(session,f"save {cxs_file}.part.cxs format session")
+	os.replace(f"{cxs_file}.part.cxs",cxs_file)
 
-match = run(session,f"match #{model_provided_pdb_name} to #{model_rcsb_name}")
+if args.manifest:
 
-## Color reference structure a diferrent color
-run(session,f"color #{model_rcsb_name} #00FFFF ribbons")
+	MANIFEST = open(args.manifest,"r")
+	jobs = [line.rstrip("\n").split("\t") for line in MANIFEST if line.strip()]
+	MANIFEST.close()
 
-## Show only matching chains
-run(session,f"show #{model_provided_pdb_name} ribbons")
-run(session,f"show #{model_rcsb_name} ribbons")
+	saved = 0
+	failed = 0
+	for provided_pdb, match_pdb, cxs_file in jobs:
+		if os.path.isfile(cxs_file):
+			print(f"  Alignment between {pdb_name(provided_pdb)} and {pdb_name(match_pdb)} found. Skipping alignment...")
+			continue
+		try:
+			create_session(provided_pdb,match_pdb,cxs_file)
+			saved += 1
+		except Exception as error:
+			print(f"[E]  Unable to align {provided_pdb} to {match_pdb}: {error}",file=stderr)
+			failed += 1
+		## Models of the next alignment are opened as #1 and #2 in an empty session
+		run(session,"close session")
 
-## Orient the chain to view
-run(session,"view")
+	print(f"  {saved} sessions saved, {failed} failed, {len(jobs)-saved-failed} skipped ({args.manifest})")
 
-## Save match as a new file
-run(session,f"save {outdir}/{provided_pdb_name}_{match_pdb_name}.cxs format session")
+else:
+	create_session(args.provided_pdb,args.match_pdb,f"{outdir}/{pdb_name(args.provided_pdb)}_{pdb_name(args.match_pdb)}.cxs")
 
-quit()
\ No newline at end of file
+quit()
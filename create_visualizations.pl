@@ -1,15 +1,19 @@
 #!/usr/bin/perl
 
 my $name = "create_visualizations.pl";
-my $version = "0.7.6";
-my $updated = "2022-09-03";
+my $version = "0.9.0";
+my $updated = "2026-10-17";
 
 use strict;
 use warnings;
 use Getopt::Long qw(GetOptions);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Pack qw(read_pack_index pack_structure);
 use File::Basename;
 use Cwd qw(abs_path);
-use File::Path qw(make_path);
+use File::Path qw(make_path remove_tree);
+use POSIX qw(ceil);
 
 my $usage = << "EXIT";
 NAME	${name}
@@ -29,6 +33,11 @@ OPTIONS
 -p (--prov)	Directory containing provided .pdb files
 -u (--uni)	Directory containing UniProt scrap .pdb files
 -o (--outdir)	Output directory for ChimeraX sessions [Default: ./3D_Visualizations]
+-k (--pack)	Read structures from packs of the structure sets (structure_pack.py), built or
+		updated in OUTDIR/PACKS, instead of decompressing them for every match
+-s (--sessions)	Number of ChimeraX sessions run in parallel [Default: 4]
+-b (--batch)	Maximum number of alignments saved per ChimeraX session [Default: 250]
+-c (--chimerax)	ChimeraX executable [Default: chimerax]
 EXIT
 die "\n\n$usage\n\n" unless @ARGV;
 
@@ -36,16 +45,25 @@ my $match_file;
 my @provided_struct;
 my $uniprot_struct;
 my $outdir = './3D_Visualizations';
+my $pack;
+my $sessions = 4;
+my $batch_size = 250;
+my $chimerax = 'chimerax';
 
 GetOptions(
 	'm|match=s' => \$match_file,
 	'p|prov=s@{1,}' => \@provided_struct,
 	'u|uni=s' => \$uniprot_struct,
 	'o|out=s' => \$outdir,
+	'k|pack' => \$pack,
+	's|sessions=i' => \$sessions,
+	'b|batch=i' => \$batch_size,
+	'c|chimerax=s' => \$chimerax,
 );
 
 my ($filename,$dir) = fileparse($0);
 my $script = "$dir/chimerax_session_creator.py";
+my $pack_script = "$dir/structure_pack.py";
 
 unless (-d $outdir){
 	make_path($outdir,{mode => 0755}) or die "\n[ERROR]\tUnable to create $outdir: $!\n";
@@ -57,6 +75,18 @@ foreach my $provided (@provided_struct){
 	$provided_struct{$dirname} = $provided;
 }
 
+## Structure directory => pack; packs are only rebuilt when their structure set has changed
+my %packs;
+if ($pack){
+	my $pack_dir = "$outdir/PACKS";
+	make_path($pack_dir,{mode => 0755}) unless (-d $pack_dir);
+	my %sets = (UNIPROT_PDBs => $uniprot_struct, %provided_struct);
+	foreach my $set (sort(keys(%sets))){
+		system ("$pack_script build -i $sets{$set} -o $pack_dir/$set.pack") == 0 or die "\n[ERROR]\tUnable to pack $sets{$set}\n";
+		$packs{$sets{$set}} = read_pack_index("$pack_dir/$set.pack");
+	}
+}
+
 ##
 my %results;
 open IN, "<", $match_file or die "Unable to read from $match_file: $!\n";
@@ -95,49 +125,154 @@ while (my $line = <IN>){
 }
 close IN;
 
-foreach my $protein (keys(%results)){
+## Alignments still to save
+my @jobs;
+my %queued;
+foreach my $protein (sort(keys(%results))){
 	print ("Working on visualizations for $protein...\n");
 	foreach my $match ((@{$results{$protein}})){
 		my ($db_loc,$provided_pdb,$match_pdb) = @{$match};
-		my $temp_provided_pdb = "$outdir/$protein/$provided_pdb.temp.pdb";
-		# print($temp_provided_file."\n");
-		my $provided_pdbs = `ls $db_loc/$provided_pdb*.pdb*`;
-		my @provided_pdbs = split("\n",$provided_pdbs);
-		if ($provided_pdbs[0] =~ /\.gz$/){
-			system ("zcat $db_loc/$provided_pdb* > $temp_provided_pdb");
+		my $cxs_name = "$outdir/$protein/${provided_pdb}_${match_pdb}.cxs";
+		if (-e $cxs_name) { print "  Alignment between $provided_pdb and $match_pdb found. Skipping alignment...\n"; }
+		elsif (!$queued{$cxs_name}++) { push(@jobs,[$db_loc,$provided_pdb,$match_pdb,$cxs_name]); }
+	}
+}
+
+## ChimeraX startup outweighs a single alignment: each session saves a batch of alignments
+## listed in a manifest (chimerax_session_creator.py --manifest), with up to $sessions
+## sessions running at once. Structures are written per batch and removed once it is done.
+$sessions = 1 if ($sessions < 1);
+$batch_size = 1 if ($batch_size < 1);
+if (@jobs && (ceil(scalar(@jobs)/$sessions) < $batch_size)){
+	$batch_size = ceil(scalar(@jobs)/$sessions);
+}
+
+my $batch_dir = "$outdir/.batches";
+my %running;
+my $batch = 0;
+my $saved = 0;
+my $total = scalar(@jobs);
+print "\nAligning $total pairs with ChimeraX in batches of $batch_size ($sessions sessions)\n" if ($total);
+
+while (@jobs || %running){
+
+	if (@jobs && (scalar(keys(%running)) < $sessions)){
+		$batch++;
+		my @batch = splice(@jobs,0,$batch_size);
+		my $manifest = write_batch("$batch_dir/batch_$batch",\@batch);
+		unless ($manifest){
+			remove_tree("$batch_dir/batch_$batch");
+			next;
 		}
-		else{
-			system ("cat $db_loc/$provided_pdb* > $temp_provided_pdb");
+		my $pid = fork();
+		die "\n[ERROR]\tUnable to fork: $!\n" unless (defined $pid);
+		if ($pid == 0){
+			# ChimeraX API calling
+			exec ("$chimerax 1>/dev/null --nogui $script --manifest $manifest");
+			die "\n[ERROR]\tUnable to run $chimerax: $!\n";
 		}
+		$running{$pid} = [$batch,\@batch];
+		next;
+	}
 
-		my $temp_match_pdb = "$outdir/$protein/$match_pdb.temp.pdb";
-		my $match_pdbs = `ls $uniprot_struct/$match_pdb*.pdb*`;
-		my @match_pdbs = split("\n",$match_pdbs);
-		if ($match_pdbs[0] =~ /\.gz$/){
-			system ("zcat $uniprot_struct/$match_pdb*.pdb* > $temp_match_pdb");
-		}
-		else{
-			system ("cat $uniprot_struct/$match_pdb*.pdb* > $temp_match_pdb");
+	my $pid = wait();
+	my ($done_batch,$done_jobs) = @{delete $running{$pid}};
+	checksig() if ($? != 0);
+	my $done = scalar(grep { -e $_->[3] } @{$done_jobs});
+	$saved += $done;
+	print "  Batch $done_batch: $done of ".scalar(@{$done_jobs})." alignments saved ($saved/$total)\n";
+	remove_tree("$batch_dir/batch_$done_batch");
+
+}
+
+rmdir($batch_dir) if (-d $batch_dir);
+
+### Subroutine(s)
+sub write_batch {
+
+	## Writes the structures of a batch and its manifest (provided .pdb, match .pdb, .cxs file);
+	## structures shared by several alignments of the batch are written once. Returns nothing
+	## if none of the alignments can be made
+	my ($dir,$batch) = @_;
+	my %written;
+	my $listed = 0;
+
+	make_path($dir,{mode => 0755});
+	my $manifest = "$dir/manifest.tsv";
+	open MANIFEST, ">", $manifest or die "\n[ERROR]\tUnable to write to $manifest: $!\n";
+	foreach my $job (@{$batch}){
+		my ($db_loc,$provided_pdb,$match_pdb,$cxs_name) = @{$job};
+
+		## Sets are kept apart, as the same locus can be found in several of them
+		my $set = basename($db_loc);
+		make_path("$dir/$set",{mode => 0755}) unless (-d "$dir/$set");
+		my $temp_provided_pdb = "$dir/$set/$provided_pdb.temp.pdb";
+		$written{$temp_provided_pdb} //= copy_structure($db_loc,$provided_pdb,$temp_provided_pdb);
+
+		my $temp_match_pdb = "$dir/$match_pdb.temp.pdb";
+		$written{$temp_match_pdb} //= copy_structure($uniprot_struct,$match_pdb,$temp_match_pdb);
+
+		unless ($written{$temp_provided_pdb} && $written{$temp_match_pdb}){
+			print STDERR "  [W] Structures of $provided_pdb or $match_pdb not found. Skipping alignment...\n";
+			next;
 		}
+		print MANIFEST join("\t",$temp_provided_pdb,$temp_match_pdb,$cxs_name)."\n";
+		$listed++;
+	}
+	close MANIFEST;
 
-		my $cxs_name = "$outdir/$protein/${provided_pdb}_${match_pdb}.cxs";
-		if (-e $cxs_name) { print "  Alignment between $provided_pdb and $match_pdb found. Skipping alignment...\n"; }
-		else {
-			# ChimeraX API calling
-			print "  Aligning $provided_pdb to $match_pdb with ChimeraX\n";
-			system (
-				"chimerax 1>/dev/null --nogui $script \\
-				  -p $temp_provided_pdb \\
-				  -m $temp_match_pdb \\
-				  -o $outdir/$protein\n
-			") == 0 or checksig();
+	return $listed ? $manifest : undef;
+}
+
+sub copy_structure {
+
+	## From its pack, or from the structure directory; returns 0 if the structure is not found
+	my ($struct_dir,$prefix,$temp_file) = @_;
+	return 1 if ($pack && write_structure($struct_dir,$prefix,$temp_file));
+
+	my $pdbs = `ls $struct_dir/$prefix*.pdb* 2>/dev/null`;
+	my @pdbs = split("\n",$pdbs);
+	return 0 unless (@pdbs);
+	if ($pdbs[0] =~ /\.gz$/){
+		system ("zcat $struct_dir/$prefix*.pdb* > $temp_file");
+	}
+	else{
+		system ("cat $struct_dir/$prefix*.pdb* > $temp_file");
+	}
+	return 1;
+}
+
+sub write_structure {
+
+	## Writes a structure read from its pack; the most recently used structures are kept
+	## decompressed, as the same UniProt structures match many loci
+	my ($struct_dir,$prefix,$temp_file) = @_;
+	our %decoded;
+	our $decoded_tick;
+	my $decoded_max = 32;
+
+	my $structure_pack = $packs{$struct_dir};
+	return 0 unless ($structure_pack);
+
+	my $key = "$struct_dir\t$prefix";
+	$decoded_tick++;
+	unless ($decoded{$key}){
+		my $structure = pack_structure($structure_pack,$prefix,1);
+		return 0 unless (defined $structure);
+		$decoded{$key} = [$structure,$decoded_tick];
+		if (scalar(keys(%decoded)) > $decoded_max){
+			my ($oldest) = sort { $decoded{$a}[1] <=> $decoded{$b}[1] } keys(%decoded);
+			delete $decoded{$oldest};
 		}
 	}
+	$decoded{$key}[1] = $decoded_tick;
 
-	system ("rm $outdir/$protein/*.temp.pdb");
+	open TEMP, ">", $temp_file or die "\n[ERROR]\tUnable to write to $temp_file: $!\n";
+	print TEMP $decoded{$key}[0];
+	close TEMP;
+	return 1;
 }
 
-### Subroutine(s)
 sub checksig {
 
 	my $exit_code = $?;
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+
+name = "download_cache.py"
+version = "0.1.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Machine-wide cache of FASTA and structure files shared between QueGO runs.
+		Files are stored once by content hash and looked up by accession/PDB ID;
+		runs link to the cached files instead of downloading or copying them.
+		Used by uniprot_scraper.py, can be run on its own to inspect or trim the cache.
+
+COMMAND		{name} \\
+		  -c /media/Data_2/QUEGO_CACHE \\
+		  -e \\
+		  -s 50 \\
+		  -a 90
+
+OPTIONS
+-c (--cache)		Cache directory [Default = $QUEGO_CACHE]
+-i (--info)		Print the number of entries and the size of the cache
+-e (--evict)		Evict least recently used files according to --max_size and --max_age
+-s (--max_size)		Maximum size of the cache in GB
+-a (--max_age)		Remove files that have not been used in this many days
+
+"""
+
+import shutil
+import sqlite3
+import hashlib
+import threading
+from os import path, makedirs, listdir, link, remove, replace, getpid, environ
+from time import time
+
+class DownloadCache:
+
+	def __init__(self,cache_dir,max_size=None,max_age=None):
+
+		self.cache_dir = path.abspath(cache_dir)
+		self.max_size = max_size
+		self.max_age = max_age
+		self.lock = threading.Lock()
+
+		makedirs(f"{self.cache_dir}/objects",exist_ok=True)
+
+		## Several runs can share the cache; SQLite serializes their writes
+		self.db = sqlite3.connect(f"{self.cache_dir}/index.sqlite",timeout=600,check_same_thread=False)
+		self.db.execute("""
+			CREATE TABLE IF NOT EXISTS entries (
+				key TEXT PRIMARY KEY,
+				hash TEXT NOT NULL,
+				size INTEGER NOT NULL,
+				created REAL NOT NULL,
+				accessed REAL NOT NULL
+			)
+		""")
+		self.db.execute("CREATE INDEX IF NOT EXISTS entries_hash ON entries(hash)")
+		self.db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+		self.db.commit()
+
+	def object_path(self,digest):
+
+		return f"{self.cache_dir}/objects/{digest[0:2]}/{digest}"
+
+	##############################################################################################
+	## Lookups and insertions
+	##############################################################################################
+
+	def fetch(self,key,dest):
+
+		## Link a cached file to dest; returns False if the key is unknown
+		with self.lock:
+			row = self.db.execute("SELECT hash FROM entries WHERE key = ?",(key,)).fetchone()
+			if not row:
+				return False
+			cached = self.object_path(row[0])
+			if not path.isfile(cached):
+				self.db.execute("DELETE FROM entries WHERE key = ?",(key,))
+				self.db.commit()
+				return False
+			self.db.execute("UPDATE entries SET accessed = ? WHERE key = ?",(time(),key))
+			self.db.commit()
+
+		link_file(cached,dest)
+		return True
+
+	def store(self,key,source):
+
+		## Add a file to the cache; files with identical content are only stored once
+		digest = file_hash(source)
+		cached = self.object_path(digest)
+
+		if not path.isfile(cached):
+			makedirs(path.dirname(cached),exist_ok=True)
+			temp = f"{cached}.{getpid()}.{threading.get_ident()}.part"
+			try:
+				link(source,temp)
+			except OSError:
+				shutil.copyfile(source,temp)
+			replace(temp,cached)
+
+		now = time()
+		with self.lock:
+			self.db.execute("""
+				INSERT INTO entries (key,hash,size,created,accessed) VALUES (?,?,?,?,?)
+				ON CONFLICT(key) DO UPDATE SET hash = excluded.hash, size = excluded.size, accessed = excluded.accessed
+			""",(key,digest,path.getsize(cached),now,now))
+			self.db.commit()
+
+	##############################################################################################
+	## Eviction
+	##############################################################################################
+
+	def info(self):
+
+		with self.lock:
+			entries, = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()
+			objects, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size),0) FROM (SELECT DISTINCT hash, size FROM entries)").fetchone()
+		return entries, objects, size
+
+	def evict(self):
+
+		removed = 0
+
+		with self.lock:
+
+			## Drop entries that have not been used for max_age days
+			if self.max_age is not None:
+				self.db.execute("DELETE FROM entries WHERE accessed < ?",(time()-self.max_age*24*60*60,))
+
+			## Drop least recently used files until the cache fits in max_size
+			if self.max_size is not None:
+				rows = self.db.execute("SELECT hash, MAX(size), MAX(accessed) FROM entries GROUP BY hash ORDER BY MAX(accessed)").fetchall()
+				total = sum(row[1] for row in rows)
+				for digest, size, accessed in rows:
+					if total <= self.max_size*1e9:
+						break
+					self.db.execute("DELETE FROM entries WHERE hash = ?",(digest,))
+					total -= size
+
+			self.db.commit()
+
+			## Remove objects no longer referenced; runs linked to them keep their own hard link
+			known = {row[0] for row in self.db.execute("SELECT DISTINCT hash FROM entries")}
+
+		for cached in _objects(self.cache_dir):
+			if path.basename(cached) not in known:
+				remove(cached)
+				removed += 1
+
+		return removed
+
+	def close(self):
+
+		if (self.max_size is not None) or (self.max_age is not None):
+			self.evict()
+		self.db.close()
+
+def _objects(cache_dir):
+
+	for prefix in listdir(f"{cache_dir}/objects"):
+		if path.isdir(f"{cache_dir}/objects/{prefix}"):
+			for item in listdir(f"{cache_dir}/objects/{prefix}"):
+				if not item.endswith(".part"):
+					yield f"{cache_dir}/objects/{prefix}/{item}"
+
+def file_hash(file):
+
+	digest = hashlib.sha256()
+	FILE = open(file,"rb")
+	while True:
+		chunk = FILE.read(1 << 20)
+		if not chunk:
+			break
+		digest.update(chunk)
+	FILE.close()
+	return digest.hexdigest()
+
+def link_file(source,dest):
+
+	## Hard links cost no space and survive eviction; fall back to copies (i.e., across file
+	## systems), as symbolic links would be left dangling once the cached file is evicted
+	if path.lexists(dest):
+		remove(dest)
+	try:
+		link(source,dest)
+	except OSError:
+		shutil.copyfile(source,dest)
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-c","--cache",default=environ.get("QUEGO_CACHE"))
+	parser.add_argument("-i","--info",action='store_true')
+	parser.add_argument("-e","--evict",action='store_true')
+	parser.add_argument("-s","--max_size",type=float)
+	parser.add_argument("-a","--max_age",type=float)
+
+	args = parser.parse_args()
+
+	if not args.cache:
+		exit("\n[E]  Please provide a cache directory with --cache or $QUEGO_CACHE\n")
+
+	cache = DownloadCache(args.cache,max_size=args.max_size,max_age=args.max_age)
+
+	if args.evict:
+		print(f"\nEvicted {cache.evict()} files from {args.cache}")
+
+	entries, objects, size = cache.info()
+	print(f"\n{args.cache}\n\t{entries} entries\n\t{objects} files\n\t{size/1e9:.2f} GB\n")
+
+	cache.db.close()
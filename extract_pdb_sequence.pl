@@ -2,13 +2,15 @@
 ## Pombert Lab
 
 my $name = 'extract_pdb_sequence.pl';
-my $version = '0.1.2';
-my $updated = '2022-07-24';
+my $version = '0.2.0';
+my $updated = '2026-10-17';
 
 use strict;
 use warnings;
 use Getopt::Long qw(GetOptions);
 use File::Path qw(make_path);
+use File::Basename;
+use POSIX qw(_exit);
 use PerlIO::gzip;
 
 my $usage = <<"EXIT";
@@ -21,62 +23,250 @@ USAGE		${name} \\
 		  -p 1be3.pdb \\
 		  -o EXTRACTED_FASTAS
 
+		${name} \\
+		  -d PREDICTIONS/SET_1 PREDICTIONS/SET_2 \\
+		  -f proteins.faa \\
+		  -t 8
+
 OPTIONS
 -p (--pdb)	PDB files to extract (supports gzipped files)
 -o (--out)	Directory to store extracted FASTA files [Default: EXTRACTED_FASTAS]
+
+MULTI-FASTA OPTIONS
+-d (--dirs)	Directories of PDB files (*.pdb, *.pdb.gz) to extract into a single FASTA file
+-f (--fasta)	Multi-FASTA file to write; indexed in FASTA.fai. Structures whose size and
+		modification time are unchanged since the last extraction (FASTA.state) are not read again
+-t (--threads)	Number of worker processes [Default: 1]
 EXIT
 
 die "\n$usage\n" unless @ARGV;
 
 my @pdbs;
 my $outdir = 'EXTRACTED_FASTAS';
+my @dirs;
+my $multi_fasta;
+my $threads = 1;
 
 GetOptions(
 	'p|pdb=s{1,}' => \@pdbs,
 	'o|out=s' => \$outdir,
+	'd|dirs=s{1,}' => \@dirs,
+	'f|fasta=s' => \$multi_fasta,
+	't|threads=i' => \$threads,
 );
 
-unless (-d $outdir){
-	make_path($outdir,{mode=>0755});
-}
-
 my %AAs;
 
 initialize();
 
+if (@dirs){
+	die "\n[E]  --dirs requires --fasta\n\n" unless ($multi_fasta);
+	extract_multi_fasta();
+	exit;
+}
+
+unless (-d $outdir){
+	make_path($outdir,{mode=>0755});
+}
+
 foreach my $file (@pdbs){
 
+	my $filename = sequence_name($file);
+
 	unless (-f "$outdir/$filename.faa"){
-		my $gzip = "";
-		if ($file =~ /\.gz$/){
-			$gzip = ":gzip";
+
+		my $fasta = extract_sequence($file);
+		my @fasta = unpack("(A60)*",$fasta);
+
+		open OUT, ">", "$outdir/$filename.faa" or die("Unable to write to $file: $!\n");
+
+		print OUT ">$filename\n";
+
+		while (my $line = shift(@fasta)){
+			print OUT $line."\n";
 		}
 
-		open IN, "<$gzip", $file or die("Unable to read from $file: $!\n");
+		close OUT;
+	}
+}
+
+sub sequence_name {
+
+	## 1be3.pdb and 1be3.pdb.gz => 1be3
+	my ($file) = @_;
+	(my $basename = basename($file)) =~ s/\.gz$//;
+	my ($filename) = $basename =~ /(\w+)(?:\-\w+)?(?:\.\w+)$/;
+	return $filename;
+}
+
+sub extract_sequence {
+
+	## C-alpha records, read line by line
+	my ($file) = @_;
+
+	my $gzip = "";
+	if ($file =~ /\.gz$/){
+		$gzip = ":gzip";
+	}
+
+	open IN, "<$gzip", $file or die("Unable to read from $file: $!\n");
+
+	my $fasta = "";
+
+	while (my $line = <IN>){
+		if($line =~ /^ATOM.{9}CA\s{2}(\w{3})/){
+			$fasta .= $AAs{$1} // "";
+		}
+	}
+
+	close IN;
+
+	return $fasta;
+}
+
+sub extract_multi_fasta {
+
+	my $fasta_dir = dirname($multi_fasta);
+	unless (-d $fasta_dir){
+		make_path($fasta_dir,{mode=>0755});
+	}
+
+	my $fai = "$multi_fasta.fai";
+	my $state_file = "$multi_fasta.state";
+	my $scratch = "$multi_fasta.workers";
 
-		my $fasta = "";
+	## Structure files, read from the directories (no shell glob, so no argument list limit)
+	my @files;
+	foreach my $dir (@dirs){
+		opendir (DIR, $dir) or die "Unable to open $dir: $!\n";
+		push(@files, map { "$dir/$_" } sort(grep { /\.pdb(?:\.gz)?$/ && -f "$dir/$_" } readdir(DIR)));
+		closedir DIR;
+	}
 
-		while (my $line = <IN>){
+	## Sequences from the last extraction, for structures whose size and mtime are unchanged
+	my %previous;
+	my %sequences;
+	if ((-f $state_file) && (-f $multi_fasta) && (-f $fai)){
+		open STATE, "<", $state_file or die "Unable to read $state_file: $!\n";
+		while (my $line = <STATE>){
 			chomp($line);
-			if($line =~ /^ATOM.{9}CA\s{2}(\w{3})/){
-				$fasta .= $AAs{$1};
+			my ($file,$size,$mtime,$seq_name) = split("\t",$line);
+			$previous{$file} = [$size,$mtime,$seq_name];
+		}
+		close STATE;
+		%sequences = %{read_multi_fasta($multi_fasta)};
+	}
+
+	my @todo;
+	my %stat;
+	foreach my $file (@files){
+		my ($size,$mtime) = (stat($file))[7,9];
+		$stat{$file} = [$size,$mtime];
+		my $entry = $previous{$file};
+		unless ($entry && ($entry->[0] == $size) && ($entry->[1] == $mtime) && (defined $sequences{$entry->[2]})){
+			push(@todo,$file);
+		}
+	}
+
+	print "\n\t".scalar(@files)." structures, ".scalar(@todo)." to extract (".(scalar(@files)-scalar(@todo))." unchanged)\n";
+
+	## Spread the structures over the workers; each worker writes its sequences to its own file
+	my %extracted;
+	if (@todo){
+		make_path($scratch,{mode=>0755});
+		my $workers = $threads;
+		$workers = scalar(@todo) if (scalar(@todo) < $workers);
+		$workers = 1 if ($workers < 1);
+
+		my @children;
+		for my $worker (0..$workers-1){
+			my $pid = fork();
+			die "Unable to fork: $!\n" unless (defined $pid);
+			if ($pid == 0){
+				open SEQS, ">", "$scratch/worker_$worker.tsv" or die "Cannot write to $scratch/worker_$worker.tsv: $!\n";
+				for (my $index = $worker; $index < scalar(@todo); $index += $workers){
+					print SEQS "$todo[$index]\t".extract_sequence($todo[$index])."\n";
+				}
+				close SEQS;
+				_exit(0);
 			}
+			push(@children,[$pid,$worker]);
 		}
 
-		close IN;
+		foreach my $child (@children){
+			my ($pid,$worker) = @{$child};
+			waitpid($pid,0);
+			die "Sequence extraction worker $worker failed\n" if ($? != 0);
+			open SEQS, "<", "$scratch/worker_$worker.tsv" or die "Cannot read sequences from worker $worker: $!\n";
+			while (my $line = <SEQS>){
+				chomp($line);
+				my ($file,$sequence) = split("\t",$line,2);
+				$extracted{$file} = $sequence;
+			}
+			close SEQS;
+			unlink("$scratch/worker_$worker.tsv");
+		}
+		rmdir($scratch);
+	}
 
-		my @fasta = unpack("(A60)*",$fasta);
-		
-		my ($filename) = $file =~ /(\w+)(?:\-\w+)?(?:\.\w+)$/;
-		
-		open OUT, ">", "$outdir/$filename.faa" or die("Unable to write to $file: $!\n");
-		
-		print OUT ">$filename\n";
-		
-		while (my $line = shift(@fasta)){
-			print OUT $line."\n";
+	## FASTA, index and state are written next to their final location, then renamed
+	open FASTA, ">", "$multi_fasta.tmp" or die "Unable to write to $multi_fasta.tmp: $!\n";
+	open FAI, ">", "$fai.tmp" or die "Unable to write to $fai.tmp: $!\n";
+	open STATE, ">", "$state_file.tmp" or die "Unable to write to $state_file.tmp: $!\n";
+
+	my %written;
+	my $offset = 0;
+	foreach my $file (@files){
+		my $seq_name = sequence_name($file);
+		my $sequence = exists $extracted{$file} ? $extracted{$file} : $sequences{$previous{$file}[2]};
+
+		if ($written{$seq_name}){
+			print STDERR "[W]  $file: sequence $seq_name already extracted from $written{$seq_name}; skipping\n";
+			next;
 		}
+		$written{$seq_name} = $file;
+
+		my $record = ">$seq_name\n";
+		$record .= join("",map { "$_\n" } unpack("(A60)*",$sequence));
+
+		## name, length, offset of the sequence, bases per line, bytes per line (samtools faidx)
+		print FAI join("\t",$seq_name,length($sequence),$offset+length(">$seq_name\n"),60,61)."\n";
+		print FASTA $record;
+		print STATE join("\t",$file,@{$stat{$file}},$seq_name)."\n";
+		$offset += length($record);
 	}
+
+	close FASTA;
+	close FAI;
+	close STATE;
+
+	rename("$multi_fasta.tmp",$multi_fasta) or die "Unable to write to $multi_fasta: $!\n";
+	rename("$fai.tmp",$fai) or die "Unable to write to $fai: $!\n";
+	rename("$state_file.tmp",$state_file) or die "Unable to write to $state_file: $!\n";
+
+	print "\t".scalar(keys(%written))." sequences written to $multi_fasta\n\n";
+}
+
+sub read_multi_fasta {
+
+	my ($file) = @_;
+	my %sequences;
+	my $seq_name;
+
+	open FASTA, "<", $file or die "Unable to read $file: $!\n";
+	while (my $line = <FASTA>){
+		chomp($line);
+		if ($line =~ /^>(\S+)/){
+			$seq_name = $1;
+			$sequences{$seq_name} = "";
+		}
+		elsif (defined $seq_name){
+			$sequences{$seq_name} .= $line;
+		}
+	}
+	close FASTA;
+
+	return \%sequences;
 }
 
 sub initialize {
@@ -103,4 +293,4 @@ sub initialize {
 			'TYR' => 'Y',
 			'GLX' => 'Z'
 	);
-}
\ No newline at end of file
+}
@@ -0,0 +1,283 @@
+#!/usr/bin/python
+
+name = "file_downloader.py"
+version = "0.2.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Downloads files with a bounded pool of workers, reusing keep-alive connections
+		per host. Used by uniprot_scraper.py, but can be run on its own with a list
+		of links.
+
+COMMAND		{name} \\
+		  -l links.tsv \\
+		  -w 8
+
+OPTIONS
+-l (--links)		Tab-delimited file with one URL and destination file per line
+-w (--workers)		Number of concurrent downloads [Default = 8]
+-p (--per_host)		Maximum concurrent downloads from a single host [Default = 4]
+-r (--retries)		Number of attempts per file [Default = 4]
+-e (--errors)		File to append download errors to [Default = download.error]
+
+"""
+
+import threading
+import http.client
+from os import path, replace, remove, getpid
+from time import sleep, time
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait
+
+## Server answers worth retrying; anything else (i.e., 404) fails right away
+retry_status = {408,429,500,502,503,504}
+redirect_status = {301,302,303,307,308}
+
+class Downloader:
+
+	def __init__(self,workers=8,per_host=4,retries=4,backoff=1.0,timeout=300,errors=None):
+
+		self.pool = ThreadPoolExecutor(max_workers=workers)
+		self.per_host = per_host
+		self.retries = retries
+		self.backoff = backoff
+		self.timeout = timeout
+		self.errors = errors
+
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.host_slots = {}
+		self.jobs = {}
+		self.futures = []
+
+		self.start = time()
+		self.downloaded = 0
+		self.failed = 0
+		self.bytes = 0
+
+	##############################################################################################
+	## Queueing
+	##############################################################################################
+
+	def submit(self,url,dest,callback=None,fallback=None):
+
+		## Files requested more than once share a single download; callbacks run once it is written,
+		## fallbacks (i.e., downloading another format) if it fails
+		with self.lock:
+			job = self.jobs.get(dest)
+			if job is None:
+				job = {"callbacks":[],"fallbacks":[],"finished":False,"ok":False}
+				self.jobs[dest] = job
+				self.futures.append(self.pool.submit(self._run,url,dest,job))
+			if not job["finished"]:
+				if callback:
+					job["callbacks"].append(callback)
+				if fallback:
+					job["fallbacks"].append(fallback)
+			elif callback and job["ok"]:
+				self.futures.append(self.pool.submit(callback))
+			elif fallback and not job["ok"]:
+				self.futures.append(self.pool.submit(fallback))
+
+	def run(self,callback,*args):
+
+		## Work that does not need a download (i.e., processing files from a previous run)
+		with self.lock:
+			self.futures.append(self.pool.submit(callback,*args))
+
+	def close(self):
+
+		while True:
+			with self.lock:
+				pending = [future for future in self.futures if not future.done()]
+			if not pending:
+				break
+			wait(pending)
+
+		self.pool.shutdown()
+
+		## Surface exceptions raised by callbacks
+		for future in self.futures:
+			future.result()
+
+	def report(self):
+
+		elapsed = max(time()-self.start,1e-6)
+		return (f"{self.downloaded} files downloaded ({self.bytes/1e6:.2f} MB in {elapsed:.1f} s; "
+			f"{self.bytes/1e6/elapsed:.2f} MB/s; {self.downloaded/elapsed:.2f} files/s), {self.failed} failed")
+
+	##############################################################################################
+	## Workers
+	##############################################################################################
+
+	def _run(self,url,dest,job):
+
+		ok = self._fetch(url,dest)
+
+		try:
+			while True:
+				with self.lock:
+					callbacks = job["callbacks"] if ok else job["fallbacks"]
+					job["callbacks"] = []
+					job["fallbacks"] = []
+					if not callbacks:
+						job["finished"] = True
+						job["ok"] = ok
+						break
+				for callback in callbacks:
+					callback()
+		finally:
+			## A callback that raises still ends the job, so later requests for the same file are
+			## answered from its outcome instead of waiting on callbacks that will never run
+			with self.lock:
+				job["finished"] = True
+				job["ok"] = ok
+
+	def _slot(self,host):
+
+		with self.lock:
+			if host not in self.host_slots:
+				self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+			return self.host_slots[host]
+
+	def _connection(self,scheme,host):
+
+		## Each worker keeps one keep-alive connection per host
+		if not hasattr(self.local,"connections"):
+			self.local.connections = {}
+		if (scheme,host) not in self.local.connections:
+			if scheme == "https":
+				self.local.connections[(scheme,host)] = http.client.HTTPSConnection(host,timeout=self.timeout)
+			else:
+				self.local.connections[(scheme,host)] = http.client.HTTPConnection(host,timeout=self.timeout)
+		return self.local.connections[(scheme,host)]
+
+	def _drop(self,scheme,host):
+
+		connection = getattr(self.local,"connections",{}).pop((scheme,host),None)
+		if connection:
+			connection.close()
+
+	def _fetch(self,url,dest):
+
+		temp = f"{dest}.{getpid()}.{threading.get_ident()}.part"
+		error = ""
+
+		for attempt in range(self.retries):
+
+			if attempt:
+				sleep(self.backoff*(2**(attempt-1)))
+
+			link = url
+			try:
+				## Follow redirects (they may point to another host)
+				for redirect in range(5):
+					parts = urlsplit(link)
+					target = parts.path + (f"?{parts.query}" if parts.query else "")
+					with self._slot(parts.netloc):
+						connection = self._connection(parts.scheme,parts.netloc)
+						try:
+							connection.request("GET",target,headers={"User-Agent":"QueGO","Connection":"keep-alive"})
+							response = connection.getresponse()
+						except Exception:
+							## A kept-alive connection may have been closed by the server; reconnect once
+							self._drop(parts.scheme,parts.netloc)
+							connection = self._connection(parts.scheme,parts.netloc)
+							connection.request("GET",target,headers={"User-Agent":"QueGO","Connection":"keep-alive"})
+							response = connection.getresponse()
+
+						if response.status in redirect_status:
+							response.read()
+							link = response.getheader("Location")
+							if link.startswith("/"):
+								link = f"{parts.scheme}://{parts.netloc}{link}"
+							continue
+
+						if response.status != 200:
+							response.read()
+							error = f"HTTP {response.status}"
+							if response.status in retry_status:
+								break
+							self._failed(url,error)
+							return False
+
+						## Write to a temporary file and rename it once complete
+						expected = response.getheader("Content-Length")
+						size = 0
+						OUT = open(temp,"wb")
+						while True:
+							chunk = response.read(1 << 16)
+							if not chunk:
+								break
+							OUT.write(chunk)
+							size += len(chunk)
+						OUT.close()
+
+						if response.getheader("Connection","").lower() == "close":
+							self._drop(parts.scheme,parts.netloc)
+
+						if (expected is not None) and (int(expected) != size):
+							error = f"expected {expected} bytes, received {size}"
+							break
+
+						replace(temp,dest)
+						with self.lock:
+							self.downloaded += 1
+							self.bytes += size
+						return True
+				else:
+					error = "too many redirects"
+
+			except Exception as exception:
+				error = str(exception) or type(exception).__name__
+				parts = urlsplit(link)
+				self._drop(parts.scheme,parts.netloc)
+
+			if path.exists(temp):
+				remove(temp)
+
+		self._failed(url,error)
+		return False
+
+	def _failed(self,url,error):
+
+		with self.lock:
+			self.failed += 1
+			if self.errors:
+				ERR = open(self.errors,"a")
+				ERR.write(f"{url}\t{error}\n")
+				ERR.close()
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-l","--links",required=True)
+	parser.add_argument("-w","--workers",type=int,default=8)
+	parser.add_argument("-p","--per_host",type=int,default=4)
+	parser.add_argument("-r","--retries",type=int,default=4)
+	parser.add_argument("-e","--errors",default="download.error")
+
+	args = parser.parse_args()
+
+	downloader = Downloader(workers=args.workers,per_host=args.per_host,retries=args.retries,errors=args.errors)
+
+	LINKS = open(args.links,"r")
+	for line in LINKS:
+		line = line.rstrip("\n")
+		if line:
+			link, dest = line.split("\t")[0:2]
+			if not path.exists(dest):
+				downloader.submit(link,dest)
+	LINKS.close()
+
+	downloader.close()
+	print(downloader.report())
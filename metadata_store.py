@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+name = "metadata_store.py"
+version = "0.1.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	SQLite store of the UniProt metadata acquired by uniprot_scraper.py. Each accession
+		is committed on its own, so an interrupted scrap resumes at the next accession, and
+		accessions are looked up through the primary key instead of parsing metadata.log.
+		metadata.log (read by organize_results.pl) is exported from the store, written
+		next to its final location then renamed. A metadata.log from an earlier version is
+		imported when the store is created.
+
+COMMAND		{name} import -d UNIPROT_SCRAP_RESULTS/metadata.sqlite -l UNIPROT_SCRAP_RESULTS/metadata.log
+		{name} export -d UNIPROT_SCRAP_RESULTS/metadata.sqlite -l metadata.log -a accessions.list
+		{name} get -d UNIPROT_SCRAP_RESULTS/metadata.sqlite -a P12345 Q67890
+
+OPTIONS
+-d (--db)		Metadata store (SQLite)
+-l (--log)		metadata.log to import or export
+-a (--accessions)	Accessions (or a file listing them) to export/get [Default = all]
+
+"""
+
+import sqlite3
+from os import path, replace
+
+schema = """
+CREATE TABLE IF NOT EXISTS accessions (
+	accession TEXT PRIMARY KEY,
+	protein_name TEXT,
+	organism_name TEXT,
+	features TEXT
+);
+CREATE TABLE IF NOT EXISTS structures (
+	accession TEXT,
+	rank INTEGER,
+	pdb TEXT,
+	chain TEXT,
+	method TEXT,
+	link TEXT,
+	PRIMARY KEY (accession, rank)
+);
+CREATE INDEX IF NOT EXISTS structures_pdb ON structures (pdb);
+"""
+
+def read_log(log_file):
+
+	## metadata.log => {accession: {section: [lines]}}, in file order
+	records = {}
+	accession = None
+	section = None
+	LOG = open(log_file,"r")
+	for line in LOG:
+		line = line.rstrip("\n")
+		if not line:
+			continue
+		if line[0] == ">":
+			accession = line[1:]
+			records[accession] = {}
+		elif (line[0:2] == "\t\t") and (accession is not None) and section:
+			records[accession][section].append(line[2:])
+		elif (line[0] == "\t") and (accession is not None):
+			section = line.strip()
+			records[accession].setdefault(section,[])
+	LOG.close()
+	return records
+
+class MetadataStore:
+
+	def __init__(self,db_file,import_log=None):
+
+		new = not path.isfile(db_file)
+		self.db = sqlite3.connect(db_file)
+		## Each commit is durable without flushing the whole database (write-ahead log)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("PRAGMA synchronous=NORMAL")
+		self.db.executescript(schema)
+
+		if new and import_log and path.isfile(import_log):
+			self.import_log(import_log)
+
+	def __contains__(self,accession):
+
+		return self.db.execute("SELECT 1 FROM accessions WHERE accession = ?",(accession,)).fetchone() is not None
+
+	def __len__(self):
+
+		return self.db.execute("SELECT COUNT(*) FROM accessions").fetchone()[0]
+
+	def accessions(self):
+
+		return [row[0] for row in self.db.execute("SELECT accession FROM accessions ORDER BY accession")]
+
+	def _put(self,accession,prot_name,org_name,features,structures):
+
+		self.db.execute("DELETE FROM structures WHERE accession = ?",(accession,))
+		self.db.execute("INSERT OR REPLACE INTO accessions VALUES (?,?,?,?)",(accession,prot_name,org_name,"\n".join(features)))
+		self.db.executemany("INSERT INTO structures VALUES (?,?,?,?,?,?)",[(accession,rank,*structure) for rank, structure in enumerate(structures)])
+
+	def put(self,accession,prot_name,org_name,features,structures):
+
+		## features: ["HELIX:12", ...] or ["None Available"]
+		## structures: [[pdb, chain, method, link], ...]; committed together with the accession
+		with self.db:
+			self._put(accession,prot_name,org_name,features,structures)
+
+	def get(self,accession):
+
+		## [protein name, organism name, [features], [[pdb, chain, method, link], ...]], or None
+		row = self.db.execute("SELECT protein_name, organism_name, features FROM accessions WHERE accession = ?",(accession,)).fetchone()
+		if row is None:
+			return None
+		structures = [list(structure) for structure in self.db.execute("SELECT pdb, chain, method, link FROM structures WHERE accession = ? ORDER BY rank",(accession,))]
+		return [row[0],row[1],row[2].split("\n") if row[2] else [],structures]
+
+	def import_log(self,log_file):
+
+		## Single transaction; lines of STRUCTURES that are not structures (NONE) are dropped
+		records = read_log(log_file)
+		with self.db:
+			for accession, record in records.items():
+				structures = [line.split("\t") for line in record.get("STRUCTURES",[])]
+				structures = [structure[0:4] for structure in structures if len(structure) >= 4]
+				self._put(accession,"".join(record.get("PROTEIN_NAME",[""])[0:1]),"".join(record.get("ORGANISM_NAME",[""])[0:1]),record.get("FEATURES",[]),structures)
+		return len(records)
+
+	def record(self,accession):
+
+		## metadata.log block of an accession
+		prot_name, org_name, features, structures = self.get(accession)
+		block = f">{accession}\n"
+		block += f"\tPROTEIN_NAME\n\t\t{prot_name}\n"
+		block += f"\tORGANISM_NAME\n\t\t{org_name}\n"
+		block += f"\tFEATURES\n"
+		block += "".join([f"\t\t{feature}\n" for feature in (features or ["None Available"])])
+		block += f"\tSTRUCTURES\n"
+		if structures:
+			block += "".join(["\t\t"+"\t".join(structure)+"\n" for structure in structures])
+		else:
+			block += f"\t\tNONE\n"
+		return block
+
+	def export(self,log_file,accessions=None):
+
+		## Accessions in the order given [Default = all, sorted]; returns the number written
+		if accessions is None:
+			accessions = self.accessions()
+		written = 0
+		LOG = open(f"{log_file}.tmp","w")
+		for accession in accessions:
+			if accession in self:
+				LOG.write(self.record(accession))
+				written += 1
+		LOG.close()
+		replace(f"{log_file}.tmp",log_file)
+		return written
+
+	def close(self):
+
+		self.db.close()
+
+if __name__ == "__main__":
+
+	from sys import argv, stdout
+	import argparse
+
+	if (len(argv) < 2) or (argv[1] not in ("import","export","get")):
+		exit(f"{usage}")
+
+	command = argv[1]
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-d","--db",required=True)
+	parser.add_argument("-l","--log")
+	parser.add_argument("-a","--accessions",nargs="+")
+	args = parser.parse_args(argv[2:])
+
+	accessions = args.accessions
+	if accessions and (len(accessions) == 1) and path.isfile(accessions[0]):
+		LIST = open(accessions[0],"r")
+		accessions = [line.strip() for line in LIST if line.strip()]
+		LIST.close()
+
+	store = MetadataStore(args.db)
+
+	if command == "import":
+		if not args.log:
+			exit("[E]  import requires --log")
+		print(f"\t{store.import_log(args.log)} accessions imported from {args.log}")
+	elif command == "export":
+		if not args.log:
+			exit("[E]  export requires --log")
+		print(f"\t{store.export(args.log,accessions)} accessions written to {args.log}")
+	else:
+		for accession in (accessions or store.accessions()):
+			if accession in store:
+				stdout.write(store.record(accession))
+			else:
+				print(f"[W]  {accession} not found in {args.db}")
+
+	store.close()
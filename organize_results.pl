@@ -2,13 +2,14 @@
 ## Pombert Lab 2022
 
 my $name = 'organize_results.pl';
-my $version = '1.7.0';
-my $updated = '2022-08-31';
+my $version = '1.8.1';
+my $updated = '2026-10-17';
 
 use strict;
 use warnings;
 use Getopt::Long qw(GetOptions);
 use File::Path qw(make_path);
+use Scalar::Util qw(looks_like_number);
 
 my $usage = <<"EXIT";
 NAME		${name}
@@ -192,7 +193,8 @@ if ($seqnc_file){
 			if ($line =~ /^## (\w+)/){
 				$accession = $1;
 			}
-			else{
+			## Accessions missing from the metadata (i.e., searched for another keyword of a batch) are left out
+			elsif ($metadata{$accession}){
 
 				## Data is going to be sorted by protein name to reduce entries; get it from metadata using accession
 				my $prot_name = uc($metadata{$accession}[0]);
@@ -263,17 +265,19 @@ foreach my $hom_tool (sort(keys(%struct_files))){
 							
 							## Use only the best hit per locus
 							if ($hom_tool eq "FOLDSEEK"){
+								## Hits not rescored by run_MICAN.pl --cascade (NA) add nothing to the score
+								my $tmscore = looks_like_number($data[13]) ? $data[13] : 0;
 								if ($all_results{$prot_name}{$locus}){
 									unless ($all_results{$prot_name}{$locus}{"FOLDSEEK"}){
 										@{$all_results{$prot_name}{$locus}{"FOLDSEEK"}} = (@data,$model);
 										@{$struct_results{$hom_tool}{$prot_name}{$locus}} = (@data,$model);
-										$all_results{$prot_name}{$locus}{"SCORE"} += $data[13];
+										$all_results{$prot_name}{$locus}{"SCORE"} += $tmscore;
 										$loci_count{"stc"}{$locus} ++;
 									}
 								}
 								else{
 									@{$all_results{$prot_name}{$locus}{"FOLDSEEK"}} = (@data,$model);
-									$all_results{$prot_name}{$locus}{"SCORE"} = $data[13];
+									$all_results{$prot_name}{$locus}{"SCORE"} = $tmscore;
 									$loci_count{"stc"}{$locus} ++;
 								}
 							}
@@ -350,7 +354,13 @@ foreach my $hom_tool (keys(%struct_results)){
 		print OUT "### LOCUS\tANNOTATION\tACCESSION\tPDB\tSOURCE\tMODEL #\tFIDENT\tALNLEN\tMISMATCH\tGAPOPEN\tQSTART\tQEND\tTSTART\tTEND\tEVALUE\tBITS\tTMSCORE\n\n";
 		foreach my $prot (sort(keys(%{$struct_results{$hom_tool}}))){
 			print OUT "## $prot\n";
-			foreach my $locus (sort{$struct_results{$hom_tool}{$prot}{$b}[13] <=> $struct_results{$hom_tool}{$prot}{$a}[13]}(keys(%{$struct_results{$hom_tool}{$prot}}))){
+			## By TM-score; hits not rescored (NA) last, by bit score
+			my %rank;
+			foreach my $locus (keys(%{$struct_results{$hom_tool}{$prot}})){
+				my ($bits,$tmscore) = @{$struct_results{$hom_tool}{$prot}{$locus}}[12,13];
+				$rank{$locus} = looks_like_number($tmscore) ? [1,$tmscore] : [0,$bits];
+			}
+			foreach my $locus (sort{$rank{$b}[0] <=> $rank{$a}[0] || $rank{$b}[1] <=> $rank{$a}[1]}(keys(%{$struct_results{$hom_tool}{$prot}}))){
 				if ($annotations{$locus}){
 					print OUT $locus."\t".$annotations{$locus}."\t";
 				}
@@ -2,8 +2,8 @@
 ## Pombert Lab 2022
 
 my $name = "parse_3D_homology_results.pl";
-my $version = "0.2.3";
-my $updated = "2022-08-31";
+my $version = "0.4.0";
+my $updated = "2026-10-17";
 
 use strict;
 use warnings;
@@ -11,12 +11,17 @@ use Getopt::Long qw(GetOptions);
 use File::Basename;
 use File::Path qw(make_path);
 use PerlIO::gzip;
+use Scalar::Util qw(looks_like_number);
 
 my $usage = <<"EXIT";
 NAME		${name}
 VERSION		${version}
 UPDATED		${updated}
-SYNOPSIS	
+SYNOPSIS	Keeps the best GESAMT (by Q-score) and FoldSeek (by TM-score) matches of each query
+		structure. Result files are streamed one query at a time, so memory use depends on
+		--best rather than on the size of the archives searched. FoldSeek hits not rescored
+		by run_MICAN.pl --cascade (TM-score NA) are kept after the rescored hits, ranked by
+		their FoldSeek bit score, with NA as TM-score.
 
 USAGE		${name} \\
 			  -g Queri3D/RESULTS/ALPHAFOLD Queri3D/RESULTS/RAPTORX
@@ -54,140 +59,200 @@ unless(-d $outdir){
 	make_path($outdir,{mode=>0755}) or die("Unable to create directory $outdir: $!\n");
 }
 
-my %results;
-foreach my $predictor (keys(%result_dirs)){
-	if (($predictor eq "GESAMT") && ($result_dirs{$predictor})){
-		if (-d $result_dirs{$predictor}){
-			opendir(ODOR,$result_dirs{$predictor}) or die "Unable to access $result_dirs{$predictor}: $!";
-			foreach my $directory (readdir(ODIR)){
-				if (-d $result_dirs{$predictor}."/".$directory && $directory !~ /^\./){
-					opendir(DIR,$result_dirs{$predictor}."/".$directory);
-					my @source = split(/\//,$directory);
-					my $pred_struct_source = $source[-1];
-
-					while(my $file = readdir(DIR)){
-						
-						unless(-d $result_dirs{$predictor}."/".$directory."/".$file){
-
-							my $query_struct;
-							my $gzip="";
-
-							if ($file =~ /(\w+).normal.gesamt.gz$/){
-								$query_struct = $1;
-								$gzip = ":gzip";
-							}
-							elsif ($file =~ /(\w+).normal.gesamt$/){
-								$query_struct = $1;
-							}
-
-							open IN, "<", $result_dirs{$predictor}."/".$directory."/".$file;
-							while(my $line = <IN>){
-								chomp($line);
-								unless(($line =~ /^\#/)||($line eq '')){
-									# print($line."\n");
-									my @data = split('\s+',$line);
-
-									my ($qscore,$rmsd,$seq_id,$n_align,$nRes,$predicted_file) = @data[($#data-5)..$#data];
-
-									my ($predicted_structure,$model_number) = $predicted_file =~ /^(\w+)(?:-(m\d+))*(?:-\w+)*\.pdb(?:\.gz)*$/;
-									if($qscore >= $qscore_cut){
-										push(@{$results{$predictor}{$query_struct}{$predicted_structure}},($model_number,$pred_struct_source,$qscore,$rmsd,$seq_id,$n_align,$nRes));
-									}
-								}
-							}
-						}
-					}
-				}
+###################################################################################################
+## Listing result files per query; a query can have results in several structure sets
+###################################################################################################
+
+my %patterns = (
+	"GESAMT" => qr/^(\w+)\.normal\.gesamt(\.gz)?$/,
+	"FoldSeek" => qr/^(\w+)_w_tmscore\.fseek(\.gz)?$/,
+);
+
+foreach my $predictor (sort(keys(%result_dirs))){
+
+	my $outfile = "$outdir/${predictor}_parsed_results.matches";
+
+	## Results of an earlier run are not left behind for tools without matches
+	unless (($result_dirs{$predictor}) && (-d $result_dirs{$predictor})){
+		unlink($outfile) if (-e $outfile);
+		next;
+	}
+
+	my %files;
+	opendir(ODIR,$result_dirs{$predictor}) or die "Unable to access directory $result_dirs{$predictor}: $!\n";
+	foreach my $directory (sort(readdir(ODIR))){
+		next unless ((-d $result_dirs{$predictor}."/".$directory) && ($directory !~ /^\./));
+		my @source = split(/\//,$directory);
+		my $pred_struct_source = $source[-1];
+		opendir(DIR,$result_dirs{$predictor}."/".$directory) or die "Unable to access directory $result_dirs{$predictor}/$directory: $!\n";
+		foreach my $file (sort(readdir(DIR))){
+			next if (-d $result_dirs{$predictor}."/".$directory."/".$file);
+			if ($file =~ $patterns{$predictor}){
+				my $gzip = $2 ? ":gzip" : "";
+				push(@{$files{$1}},[$result_dirs{$predictor}."/".$directory."/".$file,$pred_struct_source,$gzip]);
 			}
-			close ODIR;
 		}
+		closedir(DIR);
 	}
-	elsif(($predictor eq "FoldSeek") && ($result_dirs{$predictor})){
-		if (-d $result_dirs{$predictor}){
-			opendir(ODIR,$result_dirs{$predictor}) or die "Unable to access directory $result_dirs{$predictor}: $!\n";
-			foreach my $directory (readdir(ODIR)){
-				if ((-d $result_dirs{$predictor}."/".$directory) && ($directory !~ /^\./)){
-					opendir(DIR,$result_dirs{$predictor}."/".$directory);
-					my @source = split(/\//,$directory);
-					my $pred_struct_source = $source[-1];
-					while(my $file = readdir(DIR)){
-						unless(-d $result_dirs{$predictor}."/".$directory."/".$file || ($file eq "error.log")){
-							my $query_struct;
-							my $gzip="";
-
-							if ($file =~ /(\w+)_w_tmscore.fseek.gz$/){
-								$query_struct = $1;
-								$gzip = ":gzip";
-							}
-							elsif ($file =~ /(\w+)_w_tmscore.fseek$/){
-								$query_struct = $1;
-							}
-
-							open IN, "<$gzip", $result_dirs{$predictor}."/".$directory."/".$file or die "Unable to open $result_dirs{$predictor}/$directory/$file: $!";
-							while(my $line = <IN>){
-								chomp($line);
-								unless(($line =~ /^\#/)||($line eq '')){
-									my @data = split('\s+',$line);
-									my ($predicted_structure,$model_number) = $data[1] =~ /^(\w+)(?:-(m\d+))*(?:-\w+)*\.pdb(?:\.gz)*$/;
-									if ($data[$#data] >= $tm_cut){
-										push(@{$results{$predictor}{$query_struct}{$predicted_structure}},($model_number,$pred_struct_source,@data[2..12]));
-									}
-								}
-							}
-						}
+	closedir(ODIR);
+
+	###############################################################################################
+	## Streaming each query's hits through a top-K heap and writing its block right away
+	###############################################################################################
+
+	my $opened;
+
+	foreach my $query_struct (sort(keys(%files))){
+
+		my %top = (heap => [], pos => {}, limit => ($all ? undef : $best));
+
+		foreach my $result (@{$files{$query_struct}}){
+			my ($file,$pred_struct_source,$gzip) = @{$result};
+			open IN, "<$gzip", $file or die "Unable to open $file: $!";
+			while(my $line = <IN>){
+				chomp($line);
+				next if (($line =~ /^\#/)||($line eq ''));
+				my @data = split('\s+',$line);
+
+				if ($predictor eq "GESAMT"){
+					my ($qscore,$rmsd,$seq_id,$n_align,$nRes,$predicted_file) = @data[($#data-5)..$#data];
+					next unless ($qscore >= $qscore_cut);
+					my ($predicted_structure,$model_number) = $predicted_file =~ /^(\w+)(?:-(m\d+))*(?:-\w+)*\.pdb(?:\.gz)*$/;
+					next unless (defined $predicted_structure);
+					offer(\%top,[[1,$qscore],$predicted_structure,$model_number,$pred_struct_source,$qscore,$rmsd,$seq_id,$n_align,$nRes]);
+				}
+				else {
+					my $tmscore = $data[12];
+					next unless (defined $tmscore);
+					my $rank;
+					if (looks_like_number($tmscore)){
+						next unless ($tmscore >= $tm_cut);
+						$rank = [1,$tmscore];
 					}
+					## Not rescored (run_MICAN.pl --cascade); the TM-score cut-off does not apply
+					elsif (($tmscore eq 'NA') && looks_like_number($data[11])){
+						$rank = [0,$data[11]];
+					}
+					else {
+						next;
+					}
+					my ($predicted_structure,$model_number) = $data[1] =~ /^(\w+)(?:-(m\d+))*(?:-\w+)*\.pdb(?:\.gz)*$/;
+					next unless (defined $predicted_structure);
+					offer(\%top,[$rank,$predicted_structure,$model_number,$pred_struct_source,@data[2..12]]);
 				}
 			}
-			close ODOR;
+			close IN;
+		}
+
+		next unless (@{$top{heap}});
+
+		## Output files are only created for tools with matches above the cut-off
+		unless ($opened){
+			print($predictor."\n");
+			open ALL, ">", $outfile or die "Unable to write to $outfile: $!";
+			print "$outfile\n";
+			if ($predictor eq "GESAMT"){
+				print ALL ("### Locus\tModel #\tSource\tQ-Score\tr.m.s.d\tSeq. Id.\tNalign\tnRes\n\n");
+			}
+			else {
+				print ALL ("### Locus\tModel #\tSource\tfident\talnlen\tmismatch.\tgapopen\tqstart\tqend\ttstart\ttend\teval\tbits\ttmscore\n\n");
+			}
+			$opened = 1;
+		}
+
+		print ALL ("## $query_struct\n");
+		foreach my $entry (sort { ranked_before($a,$b) ? -1 : 1 } @{$top{heap}}){
+			my (undef,$predicted_structure,$model_number,@fields) = @{$entry};
+			unless($model_number){
+				$model_number = '-';
+			}
+			print ALL join("\t",$predicted_structure,$model_number,@fields)."\n";
 		}
+		print ALL ("\n");
 	}
+
+	close ALL if ($opened);
+	unlink($outfile) if ((!$opened) && (-e $outfile));
 }
 
-foreach my $predictor (keys(%results)){
-	print($predictor."\n");
-	open ALL, ">", "$outdir/${predictor}_parsed_results.matches" or die "Unable to write to $outdir/${predictor}_parsed_results.matches: $!";
-	print "$outdir/${predictor}_parsed_results.matches\n";
-	if ($predictor eq "GESAMT"){
-		print ALL ("### Locus\tModel #\tSource\tQ-Score\tr.m.s.d\tSeq. Id.\tNalign\tnRes\n\n");
-		foreach my $query_struct (sort(keys(%{$results{$predictor}}))){
-			print ALL ("## $query_struct\n");
-			my $query_count = 0;
-			foreach my $predicted_structure (sort{$results{$predictor}{$query_struct}{$b}[1] <=> $results{$predictor}{$query_struct}{$a}[1]}(keys(%{$results{$predictor}{$query_struct}}))){
-				my ($model_number,$pred_struct_source,$qscore,$rmsd,$seq_id,$n_align,$nRes) = @{$results{$predictor}{$query_struct}{$predicted_structure}};
-				unless($model_number){
-					$model_number = '-';
-				}
-				if($all){
-					print ALL ("$predicted_structure\t$model_number\t$pred_struct_source\t$qscore\t$rmsd\t$seq_id\t$n_align\t$nRes\n");
-				}
-				elsif($query_count < $best){
-					print ALL ("$predicted_structure\t$model_number\t$pred_struct_source\t$qscore\t$rmsd\t$seq_id\t$n_align\t$nRes\n");
-				}
-				$query_count++;
-			}
-			print ALL ("\n");
+###################################################################################################
+## Subroutines
+###################################################################################################
+
+## Entries are [[tier, score], predicted structure, fields...]; scored hits (tier 1) rank before
+## FoldSeek hits not rescored (tier 0, by bit score), then higher scores first, ties by name
+sub ranked_before {
+	my ($x,$y) = @_;
+	foreach my $key (0,1){
+		return 1 if ($x->[0][$key] > $y->[0][$key]);
+		return 0 if ($x->[0][$key] < $y->[0][$key]);
+	}
+	return ($x->[1] lt $y->[1]) ? 1 : 0;
+}
+
+## Min-heap of the best matches (worst on top); each predicted structure is kept once with
+## its best score. A structure dropped from the heap cannot come back with a lower score,
+## so only structures in the heap need to be remembered.
+sub offer {
+	my ($top,$entry) = @_;
+	my $heap = $top->{heap};
+	my $pos = $top->{pos};
+	my $structure = $entry->[1];
+
+	if (exists $pos->{$structure}){
+		my $index = $pos->{$structure};
+		if (ranked_before($entry,$heap->[$index])){
+			$heap->[$index] = $entry;
+			sift_down($top,$index);
 		}
+		return;
 	}
-	elsif($predictor eq "FoldSeek"){
-		print ALL ("### Locus\tModel #\tSource\tfident\talnlen\tmismatch.\tgapopen\tqstart\tqend\ttstart\ttend\teval\tbits\ttmscore\n\n");
-		foreach my $query_struct (sort(keys(%{$results{$predictor}}))){
-			print ALL ("## $query_struct\n");
-			my $query_count = 0;
-			foreach my $predicted_structure (sort{$results{$predictor}{$query_struct}{$b}[11] <=> $results{$predictor}{$query_struct}{$a}[11]}(keys(%{$results{$predictor}{$query_struct}}))){
-				my ($model_number,$pred_struct_source,$fident,$alnlen,$mismatch,$gapopen,$qstart,$qend,$tstart,$tend,$eval,$bits,$tmscore) = @{$results{$predictor}{$query_struct}{$predicted_structure}};
-				unless($model_number){
-					$model_number = '-';
-				}
-				if($all){
-					print ALL ("$predicted_structure\t$model_number\t$pred_struct_source\t$fident\t$alnlen\t$mismatch\t$gapopen\t$qstart\t$qend\t$tstart\t$tend\t$eval\t$bits\t$tmscore\n");
-				}
-				elsif($query_count < $best){
-					print ALL ("$predicted_structure\t$model_number\t$pred_struct_source\t$fident\t$alnlen\t$mismatch\t$gapopen\t$qstart\t$qend\t$tstart\t$tend\t$eval\t$bits\t$tmscore\n");
-				}
-				$query_count++;
+
+	if ((!defined $top->{limit}) || (scalar(@{$heap}) < $top->{limit})){
+		push(@{$heap},$entry);
+		$pos->{$structure} = $#{$heap};
+		sift_up($top,$#{$heap});
+	}
+	elsif (($top->{limit} > 0) && ranked_before($entry,$heap->[0])){
+		delete $pos->{$heap->[0][1]};
+		$heap->[0] = $entry;
+		$pos->{$structure} = 0;
+		sift_down($top,0);
+	}
+}
+
+sub sift_up {
+	my ($top,$index) = @_;
+	my $heap = $top->{heap};
+	while ($index > 0){
+		my $parent = int(($index-1)/2);
+		last unless (ranked_before($heap->[$parent],$heap->[$index]));
+		swap($top,$index,$parent);
+		$index = $parent;
+	}
+}
+
+sub sift_down {
+	my ($top,$index) = @_;
+	my $heap = $top->{heap};
+	my $size = scalar(@{$heap});
+	while (1){
+		my $worst = $index;
+		foreach my $child (2*$index+1, 2*$index+2){
+			if (($child < $size) && ranked_before($heap->[$worst],$heap->[$child])){
+				$worst = $child;
 			}
-			print ALL ("\n");
 		}
+		last if ($worst == $index);
+		swap($top,$index,$worst);
+		$index = $worst;
 	}
-	close ALL;
-}
\ No newline at end of file
+}
+
+sub swap {
+	my ($top,$i,$j) = @_;
+	my $heap = $top->{heap};
+	@{$heap}[$i,$j] = @{$heap}[$j,$i];
+	$top->{pos}{$heap->[$i][1]} = $i;
+	$top->{pos}{$heap->[$j][1]} = $j;
+}
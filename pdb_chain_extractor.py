@@ -0,0 +1,353 @@
+#!/usr/bin/python
+
+name = "pdb_chain_extractor.py"
+version = "0.1.2"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Extracts protein chains from PDB or mmCIF entries (gzipped or not) in a single pass,
+		writing only the chains wanted straight to gzipped PDB files ({{prefix}}_{{chain}}.pdb.gz).
+		Entries are processed by a pool of worker processes. Chains can be listed on the
+		command line or taken from the STRUCTURES of a metadata.log (uniprot_scraper.py).
+		Replaces split_PDB.pl followed by mv and gzip.
+
+COMMAND		{name} \\
+		  -p 1abc.pdb 2xyz.cif.gz \\
+		  -c A \\
+		  -o PDBs
+
+		{name} \\
+		  -m UNIPROT_SCRAP_RESULTS/metadata.log \\
+		  -d UNIPROT_SCRAP_RESULTS/PDBs \\
+		  -w 8
+
+OPTIONS
+-p (--pdb)		PDB/mmCIF entries (.pdb, .ent, .cif; may be gzipped)
+-c (--chains)		Chains to extract from each entry [Default = all protein chains]
+-m (--metadata)		metadata.log listing the chains wanted for each entry (replaces -p/-c)
+-d (--entry_dir)	Directory containing the entries listed in the metadata [Default = metadata dir/PDBs]
+-o (--outdir)		Output directory [Default = entry directory]
+-w (--workers)		Number of worker processes [Default = number of CPUs]
+-r (--remove)		Remove entries once their chains have been extracted
+
+"""
+
+import re
+import gzip
+import multiprocessing
+from os import path, replace, remove, makedirs, cpu_count
+from sys import stderr
+from concurrent.futures import ProcessPoolExecutor
+
+## Same records as split_PDB.pl: header lines, and ATOM/TER lines of amino acid chains. As in
+## split_PDB.pl, only HEADER is anchored, so other lines naming these records (i.e.,
+## REMARK 200  RADIATION SOURCE) are kept in the header too.
+header_record = re.compile(r"^HEADER|TITLE|SOURCE|KEYWDS|EXPDTA|REVDAT|JRNL")
+protein_atom = re.compile(r"^ATOM.{13}\w{3}\s(\w)")
+
+## mmCIF values, quoted or not (i.e., "O5'")
+cif_token = re.compile(r"""'(?:[^']|'(?=\S))*'|"(?:[^"]|"(?=\S))*"|\S+""")
+
+entry_extensions = (".pdb",".ent",".cif")
+
+def entry_prefix(entry):
+
+	## 1abc.pdb.gz => 1abc, like split_PDB.pl
+	return re.match(r"^(\w+)",path.basename(entry)).group(1)
+
+def is_cif(entry):
+
+	return re.sub(r"\.gz$","",entry).endswith(".cif")
+
+def open_entry(entry):
+
+	if entry.endswith(".gz"):
+		return gzip.open(entry,"rt")
+	return open(entry,"r")
+
+class ChainWriter:
+
+	## Gzipped chain files, opened when their first atom is seen and renamed once complete
+	def __init__(self,outdir,prefix,header):
+
+		self.outdir = outdir
+		self.prefix = prefix
+		self.header = header
+		self.files = {}
+
+	def write(self,chain,line):
+
+		if chain not in self.files:
+			OUT = gzip.open(f"{self.outdir}/{self.prefix}_{chain}.pdb.gz.part","wt",compresslevel=6)
+			OUT.write("".join([f"{record}\n" for record in self.header]))
+			self.files[chain] = OUT
+		self.files[chain].write(f"{line}\n")
+
+	def close(self,complete=True):
+
+		for chain, OUT in self.files.items():
+			OUT.close()
+			part = f"{self.outdir}/{self.prefix}_{chain}.pdb.gz.part"
+			if complete:
+				replace(part,part[:-5])
+			else:
+				remove(part)
+		return sorted(self.files.keys())
+
+def pdb_chains(ENTRY,chains,writer):
+
+	current = None
+	protein = False
+	for line in ENTRY:
+		line = line.rstrip("\n")
+		if header_record.search(line):
+			writer.header.append(line)
+			continue
+		match = protein_atom.match(line)
+		if match:
+			protein = True
+			current = match.group(1)
+			if (chains is None) or (current in chains):
+				writer.write(current,line)
+		elif line.startswith("ATOM"):
+			## Nucleotides and other polymers
+			protein = False
+			current = None
+		elif line.startswith("TER") and protein and (current is not None):
+			if (chains is None) or (current in chains):
+				writer.write(current,line)
+
+def cif_value(value):
+
+	if value[0] in "'\"":
+		value = value[1:-1]
+	return "" if value in ("?",".") else value
+
+def cif_atom(row,columns,serial):
+
+	def field(*names):
+		for column in names:
+			if column in columns:
+				value = cif_value(row[columns[column]])
+				if value:
+					return value
+		return ""
+
+	atom = field("auth_atom_id","label_atom_id")
+	element = field("type_symbol")
+	## Atom names shorter than 4 characters start in column 14 when their element has one letter
+	if (len(atom) < 4) and (len(element) < 2):
+		atom = f" {atom}"
+	residue = field("auth_comp_id","label_comp_id")
+	chain = field("auth_asym_id","label_asym_id")
+	number = int(field("auth_seq_id","label_seq_id") or 0)
+	occupancy = float(field("occupancy") or 1)
+	bfactor = float(field("B_iso_or_equiv") or 0)
+	x, y, z = [float(field(f"Cartn_{axis}")) for axis in "xyz"]
+
+	## Chains with identifiers longer than the PDB format allows (large assemblies) keep their
+	## full identifier in the file name; the chain column gets its first character
+	return f"ATOM  {serial % 100000:>5} {atom:<4}{field('label_alt_id')[0:1]:1}{residue:>3} {chain[0:1]:1}{number % 10000:>4}{field('pdbx_PDB_ins_code')[0:1]:1}   {x:>8.3f}{y:>8.3f}{z:>8.3f}{occupancy:>6.2f}{bfactor:>6.2f}          {element[0:2]:>2}"
+
+def cif_chains(ENTRY,chains,writer):
+
+	## Header lines from single line items; atoms from the _atom_site loop (one row per line)
+	columns = {}
+	in_loop = False
+	in_atoms = False
+	serial = 0
+	previous = None
+	last_atom = ""
+
+	def terminate():
+		## TER records repeat the residue name, chain and number of the last atom of a chain
+		if (previous is not None) and ((chains is None) or (previous in chains)):
+			writer.write(previous,f"TER   {serial+1:>5}      {last_atom[17:27]}")
+
+	for line in ENTRY:
+		line = line.rstrip("\n")
+		if line.startswith("loop_"):
+			in_loop = True
+			in_atoms = False
+			columns = {}
+			continue
+		if line.startswith("_"):
+			if in_loop and line.startswith("_atom_site."):
+				columns[line.split()[0].split(".",1)[1]] = len(columns)
+				in_atoms = True
+				continue
+			in_loop = False
+			in_atoms = False
+			tokens = cif_token.findall(line)
+			if len(tokens) > 1:
+				if tokens[0] == "_struct.title":
+					writer.header.append(f"TITLE     {cif_value(' '.join(tokens[1:]))}")
+				elif tokens[0] == "_exptl.method":
+					writer.header.append(f"EXPDTA    {cif_value(' '.join(tokens[1:]))}")
+			continue
+		if line.startswith("#") or line.startswith("data_"):
+			in_loop = False
+			in_atoms = False
+			continue
+		if not (in_atoms and line.strip()):
+			continue
+
+		row = cif_token.findall(line)
+		if (len(row) != len(columns)) or (row[columns["group_PDB"]] != "ATOM"):
+			continue
+		chain = cif_value(row[columns["auth_asym_id" if "auth_asym_id" in columns else "label_asym_id"]])
+		name = cif_value(row[columns["auth_comp_id" if "auth_comp_id" in columns else "label_comp_id"]])
+
+		if chain != previous:
+			terminate()
+			previous = None
+		## Only amino acid chains (three-letter residues), like PDB files
+		if not re.match(r"^\w{3}$",name):
+			continue
+
+		serial += 1
+		previous = chain
+		last_atom = cif_atom(row,columns,serial)
+		if (chains is None) or (chain in chains):
+			writer.write(chain,last_atom)
+
+	terminate()
+
+def extract_chains(entry,chains=None,outdir=None,prefix=None):
+
+	## Returns the chains written; chains not found in the entry are not written
+	outdir = outdir or path.dirname(entry) or "."
+	prefix = prefix or entry_prefix(entry)
+	if chains is not None:
+		chains = set(chains)
+
+	writer = ChainWriter(outdir,prefix,[])
+	ENTRY = open_entry(entry)
+	try:
+		if is_cif(entry):
+			cif_chains(ENTRY,chains,writer)
+		else:
+			pdb_chains(ENTRY,chains,writer)
+	except Exception:
+		writer.close(complete=False)
+		raise
+	finally:
+		ENTRY.close()
+
+	return writer.close()
+
+def find_entry(entry_dir,code):
+
+	for extension in entry_extensions:
+		for suffix in ("",".gz"):
+			if path.isfile(f"{entry_dir}/{code}{extension}{suffix}"):
+				return f"{entry_dir}/{code}{extension}{suffix}"
+	return None
+
+def metadata_chains(metadata):
+
+	## Experimental structures listed in metadata.log: {pdb_code: {chains}}
+	wanted = {}
+	structures = False
+	META = open(metadata,"r")
+	for line in META:
+		line = line.rstrip("\n")
+		if line.startswith(">"):
+			structures = False
+		elif line.startswith("\t\t"):
+			data = line[2:].split("\t")
+			if structures and (len(data) >= 3) and (data[2] != "Predicted"):
+				wanted.setdefault(data[0],set()).add(data[1])
+		elif line.startswith("\t"):
+			structures = (line.strip() == "STRUCTURES")
+	META.close()
+	return wanted
+
+class ChainExtractor:
+
+	def __init__(self,workers=None):
+
+		## Workers are forked right away, before the caller starts threads of its own
+		self.pool = ProcessPoolExecutor(max_workers=workers or cpu_count(),mp_context=multiprocessing.get_context("fork"))
+		self.pool.submit(int).result()
+		self.futures = {}
+		self.errors = []
+
+	def submit(self,entry,chains=None,outdir=None,callback=None,prefix=None):
+
+		## Each entry and set of chains is extracted once; callback receives the chains written
+		key = (entry,tuple(sorted(chains)) if chains else None,outdir,prefix)
+		if key not in self.futures:
+			self.futures[key] = self.pool.submit(extract_chains,entry,chains,outdir,prefix)
+		if callback:
+			self.futures[key].add_done_callback(lambda future: future.exception() or callback(future.result()))
+		return self.futures[key]
+
+	def close(self):
+
+		self.pool.shutdown(wait=True)
+		written = 0
+		for (entry, chains, outdir, prefix), future in self.futures.items():
+			if future.exception():
+				self.errors.append(f"{entry}\t{future.exception()}")
+			else:
+				written += len(future.result())
+		return written
+
+	def report(self):
+
+		return f"{len(self.futures)} entries processed, {len(self.errors)} failed"
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-p","--pdb",nargs="+",default=[])
+	parser.add_argument("-c","--chains",nargs="+")
+	parser.add_argument("-m","--metadata")
+	parser.add_argument("-d","--entry_dir")
+	parser.add_argument("-o","--outdir")
+	parser.add_argument("-w","--workers",type=int,default=cpu_count())
+	parser.add_argument("-r","--remove",action='store_true')
+
+	args = parser.parse_args()
+
+	jobs = [(entry,args.chains) for entry in args.pdb]
+	if args.metadata:
+		entry_dir = args.entry_dir or f"{path.dirname(args.metadata) or '.'}/PDBs"
+		for code, chains in sorted(metadata_chains(args.metadata).items()):
+			entry = find_entry(entry_dir,code)
+			if entry:
+				jobs.append((entry,sorted(chains)))
+			else:
+				print(f"[W]  No entry found for {code} in {entry_dir}",file=stderr)
+
+	if args.outdir:
+		makedirs(args.outdir,exist_ok=True)
+
+	extractor = ChainExtractor(args.workers)
+	for entry, chains in jobs:
+		extractor.submit(entry,chains,args.outdir)
+	written = extractor.close()
+
+	for error in extractor.errors:
+		print(f"[E]  {error}",file=stderr)
+
+	if args.remove:
+		failed = {error.split("\t")[0] for error in extractor.errors}
+		for entry, chains in jobs:
+			if entry not in failed:
+				remove(entry)
+
+	print(f"\n\t{written} chains written from {len(jobs)} entries ({len(extractor.errors)} failed)\n")
+
+	if extractor.errors:
+		exit(1)
@@ -2,13 +2,17 @@
 ## Pombert Lab, 2022
 
 my $name = 'perform_sequence_search.pl';
-my $version = '0.0.2';
-my $updated = '2022-07-22';
+my $version = '0.1.3';
+my $updated = '2026-10-17';
 
 use strict;
 use warnings;
 use Getopt::Long qw(GetOptions);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Trace qw(traced);
 use File::Path qw(make_path);
+use File::Basename;
 
 my $usage = <<"EXIT";
 
@@ -19,6 +23,7 @@ OPTIONS
 -t (--threads)	Threads [Default: 4]
 -e (--eval)		E-value cutoff [Default: 1e-10]
 -o (--outdir)	Output directory [Default: SEQUENCE_SEARCH]
+-b (--batch)	Search all pending UniProt FASTAs with a single DIAMOND run [Default: off]
 
 EXIT
 
@@ -29,6 +34,7 @@ my $queries;
 my $threads = 4;
 my $eval = "1e-10";
 my $outdir = "SEQUENCE_SEARCH";
+my $batch;
 
 GetOptions(
 	'f|faa=s{1,}' => \@subs,
@@ -36,10 +42,13 @@ GetOptions(
 	't|threads=s' => \$threads,
 	'e|eval=s' => \$eval,
 	'o|outdir=s' => \$outdir,
+	'b|batch' => \$batch,
 );
 
 my $results_dir = $outdir."/"."RESULTS";
 
+my ($script,$pipeline_dir) = fileparse($0);
+
 my @dirs = ($outdir,$results_dir);
 
 foreach my $dir (@dirs){
@@ -49,42 +58,136 @@ foreach my $dir (@dirs){
 }
 
 unless (-f $outdir."/DB.dmnd"){
-	system("diamond makedb --in @subs --db $outdir/DB");
+	system(traced("diamond makedb","DB","diamond makedb --in @subs --db $outdir/DB"));
 }
 
+## Queries still missing results
+my @pending;
 opendir(DIR,$queries) or die "Unable to access directory $queries: $!\n";
-foreach my $item (readdir(DIR)){
+foreach my $item (sort(readdir(DIR))){
 	unless (-d $queries."/".$item){
 		my ($accession) = $item =~ /(\w+)\.fasta$/;
+		next unless ($accession);
 		unless (-f $results_dir."/".$accession.".diamond.6"){
-			system("
-				diamond \\
-				blastp \\
-				--threads $threads \\
-				--db $outdir/DB \\
-				--out $results_dir/$accession.diamond.6 \\
-				--outfmt 6\\
-				--query $queries/$item \\
-				--evalue $eval \\
-				1>/dev/null 2>$outdir/diamond.errors
-			")
+			push(@pending,[$accession,$item]);
 		}
 	}
 }
+closedir(DIR);
 
-open OUT, ">", $outdir."/All_sequence_results.tsv" or die "Unable to access file $outdir/All_sequence_results.tsv: $!\n";
-opendir(DIR,$results_dir) or die "Unable to access directory $results_dir: $!\n";
-foreach my $item (readdir(DIR)){
-	unless(-d $results_dir."/".$item){
-		my ($accession) = $item =~ /(\w+).diamond.6/;
-		open IN, "<", $results_dir."/".$item or die "Unable to access file $results_dir/$item: $!\n";
-		print OUT "## $accession\n";
+## Hits of the accessions searched by a batch run, kept to write the combined results
+my %hits;
+my %searched;
+
+if ($batch){
+
+	if (@pending){
+
+		## Combine all pending queries, keeping track of which accession each sequence belongs to
+		my %accessions;
+		open BATCH, ">", $outdir."/batch_queries.faa" or die "Unable to write to $outdir/batch_queries.faa: $!\n";
+		foreach my $query (@pending){
+			my ($accession,$item) = @{$query};
+			open IN, "<", $queries."/".$item or die "Unable to access file $queries/$item: $!\n";
+			while (my $line = <IN>){
+				if ($line =~ /^>(\S+)/){
+					$accessions{$1} = $accession;
+				}
+				print BATCH $line;
+			}
+			close IN;
+		}
+		close BATCH;
+
+		system(traced("diamond blastp",scalar(@pending)." queries","
+			diamond \\
+			blastp \\
+			--threads $threads \\
+			--db $outdir/DB \\
+			--out $outdir/batch_results.diamond.6 \\
+			--outfmt 6\\
+			--query $outdir/batch_queries.faa \\
+			--evalue $eval \\
+			1>/dev/null 2>$outdir/diamond.errors
+		")) == 0 or die "DIAMOND search failed; see $outdir/diamond.errors\n";
+
+		## Group hits by accession; the sequences of an accession may be reported apart
+		open IN, "<", $outdir."/batch_results.diamond.6" or die "Unable to access file $outdir/batch_results.diamond.6: $!\n";
 		while (my $line = <IN>){
-			chomp($line);
-			my @data = split("\t",$line);
-			shift(@data);
-			print OUT join("\t",@data)."\n";
+			my ($qseqid) = split("\t",$line);
+			my $accession = $accessions{$qseqid};
+			next unless (defined $accession);
+			push(@{$hits{$accession}},$line);
 		}
-		print OUT "\n";
+		close IN;
+
+		foreach my $query (@pending){
+			my ($accession) = @{$query};
+			$searched{$accession} = 1;
+			open RES, ">", $results_dir."/".$accession.".diamond.6.tmp" or die "Unable to write to $results_dir/$accession.diamond.6.tmp: $!\n";
+			print RES @{$hits{$accession} // []};
+			close RES;
+			rename($results_dir."/".$accession.".diamond.6.tmp",$results_dir."/".$accession.".diamond.6");
+		}
+
+		unlink($outdir."/batch_queries.faa",$outdir."/batch_results.diamond.6");
 	}
-}
\ No newline at end of file
+}
+else {
+	foreach my $query (@pending){
+		my ($accession,$item) = @{$query};
+		system(traced("diamond blastp",$accession,"
+			diamond \\
+			blastp \\
+			--threads $threads \\
+			--db $outdir/DB \\
+			--out $results_dir/$accession.diamond.6 \\
+			--outfmt 6\\
+			--query $queries/$item \\
+			--evalue $eval \\
+			1>/dev/null 2>$outdir/diamond.errors
+		"))
+	}
+}
+
+## One block per accession, sorted; only the results of accessions not searched by this batch
+## run are read back from their files
+open OUT, ">", $outdir."/All_sequence_results.tsv.tmp" or die "Unable to access file $outdir/All_sequence_results.tsv.tmp: $!\n";
+opendir(DIR,$results_dir) or die "Unable to access directory $results_dir: $!\n";
+foreach my $item (sort(readdir(DIR))){
+	if ($item =~ /^(\w+)\.diamond\.6$/){
+		if ($searched{$1}){
+			print_block($1,$hits{$1} // []);
+		}
+		else {
+			print_results($1,$results_dir."/".$item);
+		}
+	}
+}
+closedir(DIR);
+close OUT;
+rename($outdir."/All_sequence_results.tsv.tmp",$outdir."/All_sequence_results.tsv");
+
+sub print_results {
+
+	my ($accession,$file) = @_;
+
+	open IN, "<", $file or die "Unable to access file $file: $!\n";
+	my @lines = <IN>;
+	close IN;
+	print_block($accession,\@lines);
+}
+
+sub print_block {
+
+	my ($accession,$lines) = @_;
+
+	print OUT "## $accession\n";
+	foreach my $line (@{$lines}){
+		chomp(my $hit = $line);
+		my @data = split("\t",$hit);
+		shift(@data);
+		print OUT join("\t",@data)."\n";
+	}
+	print OUT "\n";
+}
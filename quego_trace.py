@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+name = "quego_trace.py"
+version = "0.1.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Execution trace of QueGO runs. Each external tool call made by the pipeline scripts
+		is run through this script when $QUEGO_TRACE is set (see run_QueGO.pl --trace),
+		adding one JSON line with its wall time, user/system CPU time, peak memory (RSS),
+		exit status, stage, tool and item (query, structure pair, archive) to the trace.
+		Stages are added by run_QueGO.pl. Traces can be exported to the Chrome trace
+		format (chrome://tracing, ui.perfetto.dev) and summarized.
+
+COMMAND		{name} exec -t foldseek -i 1abc_A -c "foldseek easy-search ..."
+		{name} export -i QueGO_Results/trace.jsonl -o QueGO_Results/trace.json
+		{name} summary -i QueGO_Results/trace.jsonl -n 20
+
+EXEC OPTIONS
+-c (--command)		Shell command to run; its exit status is returned
+-t (--tool)		Tool name (i.e., foldseek, mican, diamond)
+-i (--item)		Item the command works on (i.e., query structure)
+-s (--stage)		Pipeline stage [Default = $QUEGO_STAGE]
+-o (--trace)		JSON-lines trace file [Default = $QUEGO_TRACE]
+
+EXPORT/SUMMARY OPTIONS
+-i (--input)		JSON-lines trace file(s)
+-o (--out)		Chrome trace file (export) [Default = stdout]
+-n (--top)		Number of items listed by summary [Default = 20]
+
+"""
+
+import os
+import json
+import signal
+import socket
+import subprocess
+from sys import stdout
+from time import time
+
+def record(trace_file,event):
+
+	## One write per event; O_APPEND keeps lines from concurrent processes whole
+	line = (json.dumps(event,separators=(",",":"))+"\n").encode()
+	descriptor = os.open(trace_file,os.O_WRONLY|os.O_APPEND|os.O_CREAT,0o644)
+	try:
+		os.write(descriptor,line)
+	finally:
+		os.close(descriptor)
+
+def run(command,tool=None,item=None,stage=None,trace_file=None):
+
+	## Runs a shell command, waiting on it with wait4() to get its resource usage (children
+	## of the shell, i.e. a pipeline, are included once they have been waited for)
+	start = time()
+	process = subprocess.Popen(command,shell=True)
+	## Like system(), Ctrl+C and Ctrl+\ are left to the command while waiting on it
+	handlers = {number: signal.signal(number,signal.SIG_IGN) for number in (signal.SIGINT,signal.SIGQUIT)}
+	pid, status, usage = os.wait4(process.pid,0)
+	process.returncode = os.waitstatus_to_exitcode(status)
+	end = time()
+	for number, handler in handlers.items():
+		signal.signal(number,handler)
+
+	## Shells report commands killed by a signal as 128 + signal
+	exit_status = process.returncode if process.returncode >= 0 else 128-process.returncode
+
+	if trace_file:
+		record(trace_file,{
+			"type": "tool",
+			"stage": stage,
+			"tool": tool,
+			"item": item,
+			"start": round(start,6),
+			"end": round(end,6),
+			"wall": round(end-start,6),
+			"user": round(usage.ru_utime,6),
+			"sys": round(usage.ru_stime,6),
+			"max_rss_kb": usage.ru_maxrss,
+			"status": exit_status,
+			"pid": pid,
+			"ppid": os.getppid(),
+			"host": socket.gethostname(),
+			"command": " ".join(command.split()),
+		})
+
+	return exit_status
+
+def read_trace(files):
+
+	events = []
+	for file in files:
+		TRACE = open(file,"r")
+		for line in TRACE:
+			line = line.strip()
+			if not line:
+				continue
+			try:
+				events.append(json.loads(line))
+			except ValueError:
+				## Last line of a trace still being written
+				continue
+		TRACE.close()
+	return events
+
+def chrome_trace(events):
+
+	## Complete ("X") events in microseconds. Calls are grouped in rows by the process making
+	## them, so the tool calls of a stage appear under it and parallel workers side by side.
+	trace = []
+	names = {}
+	for event in sorted(events,key=lambda event: event["start"]):
+		row = event["pid"] if event.get("type") == "stage" else event.get("ppid",event["pid"])
+		label = event.get("tool") or event.get("stage") or "step"
+		if event.get("item"):
+			label = f"{label} {event['item']}"
+		trace.append({
+			"name": label,
+			"cat": event.get("type","tool"),
+			"ph": "X",
+			"ts": int(event["start"]*1e6),
+			"dur": max(int(event["wall"]*1e6),1),
+			"pid": 1,
+			"tid": row,
+			"args": {key: event.get(key) for key in ("stage","tool","item","user","sys","max_rss_kb","status","command") if event.get(key) is not None},
+		})
+		names.setdefault(row,event.get("stage") or event.get("tool") or str(row))
+
+	for row, label in names.items():
+		trace.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": row, "args": {"name": f"{label} ({row})"}})
+	trace.append({"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "QueGO"}})
+
+	return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+def summary(events,top=20):
+
+	lines = []
+
+	def fmt_rss(kb):
+		return "NA" if kb is None else f"{kb/1024:.1f} MB"
+
+	stages = [event for event in events if event.get("type") == "stage"]
+	tools = [event for event in events if event.get("type") != "stage"]
+
+	if events:
+		begin = min(event["start"] for event in events)
+		end = max(event["end"] for event in events)
+		lines.append(f"\nTrace\t\t{len(stages)} stages, {len(tools)} tool calls over {end-begin:.1f} s")
+
+	failed = [event for event in events if event.get("status")]
+	if failed:
+		lines.append(f"Failed\t\t{len(failed)} calls/stages with a nonzero exit status")
+
+	if stages:
+		lines.append("\n## Stages\nStage\tWall (s)\tCPU (s)\tStatus")
+		for event in sorted(stages,key=lambda event: -event["wall"]):
+			lines.append(f"{event.get('stage')}\t{event['wall']:.1f}\t{event['user']+event['sys']:.1f}\t{event.get('status')}")
+
+	## Totals per stage and tool, including the calls made outside of stages
+	totals = {}
+	for event in tools:
+		key = (event.get("stage") or "-",event.get("tool") or "-")
+		total = totals.setdefault(key,{"calls": 0, "wall": 0.0, "cpu": 0.0, "rss": 0, "failed": 0})
+		total["calls"] += 1
+		total["wall"] += event["wall"]
+		total["cpu"] += event["user"]+event["sys"]
+		total["rss"] = max(total["rss"],event.get("max_rss_kb") or 0)
+		total["failed"] += 1 if event.get("status") else 0
+
+	if totals:
+		lines.append("\n## Tools\nStage\tTool\tCalls\tWall (s)\tCPU (s)\tPeak RSS\tFailed")
+		for (stage, tool), total in sorted(totals.items(),key=lambda item: -item[1]["wall"]):
+			lines.append(f"{stage}\t{tool}\t{total['calls']}\t{total['wall']:.1f}\t{total['cpu']:.1f}\t{fmt_rss(total['rss'])}\t{total['failed']}")
+
+		lines.append(f"\n## Slowest items\nStage\tTool\tItem\tWall (s)\tCPU (s)\tPeak RSS\tStatus")
+		for event in sorted(tools,key=lambda event: -event["wall"])[0:top]:
+			lines.append(f"{event.get('stage') or '-'}\t{event.get('tool') or '-'}\t{event.get('item') or '-'}\t{event['wall']:.2f}\t{event['user']+event['sys']:.2f}\t{fmt_rss(event.get('max_rss_kb'))}\t{event.get('status')}")
+
+	return "\n".join(lines)+"\n"
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) < 2) or (argv[1] not in ("exec","export","summary")):
+		exit(f"{usage}")
+
+	command = argv[1]
+	parser = argparse.ArgumentParser(usage=usage)
+
+	if command == "exec":
+		parser.add_argument("-c","--command",required=True)
+		parser.add_argument("-t","--tool")
+		parser.add_argument("-i","--item")
+		parser.add_argument("-s","--stage",default=os.environ.get("QUEGO_STAGE"))
+		parser.add_argument("-o","--trace",default=os.environ.get("QUEGO_TRACE"))
+		args = parser.parse_args(argv[2:])
+		exit_status = run(args.command,args.tool,args.item,args.stage,args.trace)
+		## A command killed by a signal kills the wrapper the same way, so callers checking
+		## for signals (i.e., checksig() in run_foldseek.pl) see the same status as without it
+		if exit_status > 128:
+			signal.signal(exit_status-128,signal.SIG_DFL)
+			os.kill(os.getpid(),exit_status-128)
+		exit(exit_status)
+
+	parser.add_argument("-i","--input",nargs="+",required=True)
+	parser.add_argument("-o","--out")
+	parser.add_argument("-n","--top",type=int,default=20)
+	args = parser.parse_args(argv[2:])
+
+	events = read_trace(args.input)
+
+	if command == "export":
+		OUT = open(args.out,"w") if args.out else stdout
+		json.dump(chrome_trace(events),OUT)
+		if args.out:
+			OUT.close()
+			print(f"\n\t{len(events)} events written to {args.out}\n")
+	else:
+		print(summary(events,args.top))
@@ -0,0 +1,378 @@
+#!/usr/bin/python
+
+name = "results_store.py"
+version = "0.2.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Typed columnar store for the QueGO sequence, structure and compiled results. Each
+		table is a directory of NumPy arrays (one per column) sharing a sorted string
+		dictionary, with indexes by locus, accession and protein name. Arrays are memory
+		mapped, so loading and filtering a genome-scale result set does not parse any text.
+		The text of numeric fields is kept in the dictionary as well, so the tab-delimited
+		files exported back from the store are identical to the inputs.
+
+COMMAND		{name} build \\
+		  -o RESULTS/results_store \\
+		  -s SEQUENCE_HOMOLOGY/All_sequence_results.tsv \\
+		  -f RESULTS/FoldSeek_parsed_results.matches \\
+		  -g RESULTS/GESAMT_parsed_results.matches \\
+		  -c RESULTS/compiled_results.tsv
+
+		{name} query -d RESULTS/results_store -t compiled -l LOCUS_0001
+		{name} export -d RESULTS/results_store -t sequence -o All_sequence_results.tsv
+
+BUILD OPTIONS
+-o (--outdir)		Store directory
+-s (--sequence)		All_sequence_results.tsv from perform_sequence_search.pl
+-f (--foldseek)		FoldSeek_parsed_results.matches from parse_3D_homology_results.pl
+-g (--gesamt)		GESAMT_parsed_results.matches from parse_3D_homology_results.pl
+-c (--compiled)		compiled_results.tsv from organize_results.pl
+
+QUERY/EXPORT OPTIONS
+-d (--db)		Store directory
+-t (--table)		Table: {", ".join(["sequence","foldseek","gesamt","compiled"])}
+-l (--locus)		Rows for this locus
+-a (--accession)	Rows for this UniProt accession or PDB structure
+-p (--protein)		Rows for this protein name
+-o (--out)		Output file [Default = stdout]
+
+"""
+
+import json
+from os import path, makedirs, replace, listdir, remove
+from sys import stdout
+
+import numpy as np
+
+## Columns of each table, in file order; the block column holds the text of the '## ' line
+## the row belongs to. Types: str (dictionary codes), float, int
+tables = {
+	"sequence": {
+		"block": "accession",
+		"columns": [("locus","str"),("pident","float"),("length","int"),("mismatch","int"),("gapopen","int"),
+			("qstart","int"),("qend","int"),("sstart","int"),("send","int"),("evalue","float"),("bitscore","float")],
+	},
+	"foldseek": {
+		"block": "accession",
+		"columns": [("locus","str"),("model","str"),("source","str"),("fident","float"),("alnlen","int"),
+			("mismatch","int"),("gapopen","int"),("qstart","int"),("qend","int"),("tstart","int"),("tend","int"),
+			("evalue","float"),("bits","float"),("tmscore","float")],
+	},
+	"gesamt": {
+		"block": "accession",
+		"columns": [("locus","str"),("model","str"),("source","str"),("qscore","float"),("rmsd","float"),
+			("seqid","float"),("nalign","int"),("nres","int")],
+	},
+	"compiled": {
+		"block": "protein",
+		"columns": [("locus","str"),("annotation","str"),("seq_evalue","float"),("seq_accession","str"),
+			("foldseek_tmscore","float"),("foldseek_pdb","str"),("foldseek_db","str"),("foldseek_model","str"),
+			("gesamt_qscore","float"),("gesamt_pdb","str"),("gesamt_db","str"),("gesamt_model","str")],
+	},
+}
+
+## Columns indexed for fast lookups
+indexed = ("locus","accession","protein","seq_accession")
+
+## Missing values ('-', 'NA', empty) are stored as NaN for floats and -1 for integers; which
+## of them it was, like the formatting of numbers (0.950, 2.10e-35), is kept in {column}_text
+missing = {"","-","NA","N/A"}
+int_missing = -1
+
+##################################################################################################
+## Reading the tab-delimited results
+##################################################################################################
+
+def read_blocks(file,table):
+
+	## Returns the header line, the list of block texts and the rows (block number, fields)
+	header = None
+	blocks = []
+	rows = []
+	width = len(tables[table]["columns"])
+
+	TSV = open(file,"r")
+	for line in TSV:
+		line = line.rstrip("\n")
+		if not line:
+			continue
+		if line.startswith("###"):
+			header = line
+		elif line.startswith("## "):
+			blocks.append(line[3:])
+		elif blocks:
+			fields = line.split("\t")
+			if len(fields) < width:
+				fields += [""]*(width-len(fields))
+			rows.append((len(blocks)-1,fields[0:width]))
+	TSV.close()
+
+	return header, blocks, rows
+
+def block_key(table,text):
+
+	## compiled_results.tsv blocks carry the 3D features after the protein name
+	if table == "compiled":
+		return text.split("\t")[0]
+	return text
+
+def to_float(value):
+
+	if value in missing:
+		return np.nan
+	try:
+		return float(value)
+	except ValueError:
+		return np.nan
+
+def to_int(value):
+
+	if value in missing:
+		return int_missing
+	try:
+		return int(value)
+	except ValueError:
+		return int_missing
+
+##################################################################################################
+## Building the store
+##################################################################################################
+
+def build(outdir,sources):
+
+	## sources: {table: file}
+	parsed = {}
+	strings = set()
+
+	for table, file in sources.items():
+		if not (file and path.isfile(file)):
+			continue
+		header, blocks, rows = read_blocks(file,table)
+		parsed[table] = (header,blocks,rows)
+		strings.update(blocks)
+		strings.update(block_key(table,block) for block in blocks)
+		for column in range(len(tables[table]["columns"])):
+			strings.update(fields[column] for block, fields in rows)
+
+	## A sorted dictionary lets strings be looked up by binary search without building a hash
+	dictionary = np.array(sorted(strings),dtype=str)
+	if not len(dictionary):
+		dictionary = np.array([""],dtype=str)
+
+	makedirs(outdir,exist_ok=True)
+	save(f"{outdir}/strings.npy",dictionary)
+
+	metadata = {"version":version,"tables":{}}
+
+	for table, (header, blocks, rows) in parsed.items():
+		table_dir = f"{outdir}/{table}"
+		makedirs(table_dir,exist_ok=True)
+		for item in listdir(table_dir):
+			remove(f"{table_dir}/{item}")
+
+		block_codes = np.searchsorted(dictionary,np.array(blocks,dtype=str)) if blocks else np.zeros(0,dtype=np.int64)
+		key_codes = np.searchsorted(dictionary,np.array([block_key(table,block) for block in blocks],dtype=str)) if blocks else np.zeros(0,dtype=np.int64)
+		row_blocks = np.array([block for block, fields in rows],dtype=np.int32)
+
+		save(f"{table_dir}/_block.npy",row_blocks)
+		save(f"{table_dir}/_block_text.npy",block_codes.astype(np.int32))
+		columns = {tables[table]["block"]: key_codes[row_blocks].astype(np.int32) if len(rows) else np.zeros(0,dtype=np.int32)}
+
+		for column, (column_name, kind) in enumerate(tables[table]["columns"]):
+			values = [fields[column] for block, fields in rows]
+			text = np.searchsorted(dictionary,np.array(values,dtype=str)).astype(np.int32) if values else np.zeros(0,dtype=np.int32)
+			if kind == "str":
+				array = text
+			else:
+				if kind == "float":
+					array = np.array([to_float(value) for value in values],dtype=np.float64)
+				else:
+					array = np.array([to_int(value) for value in values],dtype=np.int64)
+				columns[f"{column_name}_text"] = text
+			columns[column_name] = array
+
+		for column_name, array in columns.items():
+			save(f"{table_dir}/{column_name}.npy",array)
+
+		## CSR indexes: rows of string code c are order[offsets[c]:offsets[c+1]]
+		for column_name in indexed:
+			if column_name in columns:
+				codes = columns[column_name]
+				order = np.argsort(codes,kind="stable").astype(np.int32)
+				offsets = np.searchsorted(codes[order],np.arange(len(dictionary)+1)).astype(np.int64)
+				save(f"{table_dir}/_index_{column_name}_order.npy",order)
+				save(f"{table_dir}/_index_{column_name}_offsets.npy",offsets)
+
+		metadata["tables"][table] = {"header":header,"rows":len(rows),"blocks":len(blocks)}
+
+	temp = f"{outdir}/store.json.tmp"
+	with open(temp,"w") as JSON:
+		json.dump(metadata,JSON,indent=1)
+	replace(temp,f"{outdir}/store.json")
+
+	return metadata
+
+def save(file,array):
+
+	## Written under a temporary name so readers never see a partial array
+	temp = f"{file}.tmp.npy"
+	np.save(temp,array)
+	replace(temp,file)
+
+##################################################################################################
+## Reading the store
+##################################################################################################
+
+class ResultsStore:
+
+	def __init__(self,store_dir):
+
+		self.store_dir = store_dir
+		with open(f"{store_dir}/store.json") as JSON:
+			self.metadata = json.load(JSON)
+		self.strings = np.load(f"{store_dir}/strings.npy",mmap_mode="r")
+
+	def tables(self):
+
+		return list(self.metadata["tables"])
+
+	def column(self,table,column_name):
+
+		return np.load(f"{self.store_dir}/{table}/{column_name}.npy",mmap_mode="r")
+
+	def code(self,value):
+
+		position = int(np.searchsorted(self.strings,value))
+		if (position < len(self.strings)) and (self.strings[position] == value):
+			return position
+		return None
+
+	def rows(self,table,**filters):
+
+		## Row numbers matching all filters (i.e., locus="LOCUS_0001", protein="TELOMERASE"),
+		## in file order; without filters, all rows
+		selected = None
+		for column_name, value in filters.items():
+			if value is None:
+				continue
+			code = self.code(value)
+			if code is None:
+				return np.zeros(0,dtype=np.int64)
+			index_file = f"{self.store_dir}/{table}/_index_{column_name}_order.npy"
+			if path.isfile(index_file):
+				order = np.load(index_file,mmap_mode="r")
+				offsets = np.load(f"{self.store_dir}/{table}/_index_{column_name}_offsets.npy",mmap_mode="r")
+				matches = np.array(order[offsets[code]:offsets[code+1]],dtype=np.int64)
+			else:
+				matches = np.flatnonzero(self.column(table,column_name) == code)
+			selected = matches if selected is None else np.intersect1d(selected,matches)
+
+		if selected is None:
+			return np.arange(self.metadata["tables"][table]["rows"])
+		return np.sort(selected)
+
+	def records(self,table,rows):
+
+		## Rows as lists of strings, in the column order of the original file
+		columns = []
+		for column_name, kind in tables[table]["columns"]:
+			if kind != "str" and path.isfile(f"{self.store_dir}/{table}/{column_name}_text.npy"):
+				column_name, kind = f"{column_name}_text", "str"
+			values = np.asarray(self.column(table,column_name))[rows]
+			if kind == "str":
+				columns.append([str(value) for value in np.asarray(self.strings)[values]])
+			## Stores built by earlier versions only have the values of numeric columns
+			elif kind == "float":
+				columns.append(["-" if np.isnan(value) else format_float(value) for value in values])
+			else:
+				columns.append(["-" if value == int_missing else str(value) for value in values])
+		return [list(record) for record in zip(*columns)]
+
+	def export(self,table,OUT):
+
+		## Same layout as the tab-delimited results: header, then one '## ' block per key
+		header = self.metadata["tables"][table]["header"]
+		if header:
+			OUT.write(f"{header}\n\n")
+
+		block_of_row = np.asarray(np.load(f"{self.store_dir}/{table}/_block.npy",mmap_mode="r"))
+		block_text = np.asarray(self.strings)[np.load(f"{self.store_dir}/{table}/_block_text.npy")]
+		records = self.records(table,np.arange(len(block_of_row)))
+
+		## Rows are stored block after block; blocks without rows (i.e., accessions without hits) are kept
+		starts = np.searchsorted(block_of_row,np.arange(len(block_text)+1))
+		for block, text in enumerate(block_text):
+			OUT.write(f"## {text}\n")
+			for record in records[starts[block]:starts[block+1]]:
+				OUT.write("\t".join(record)+"\n")
+			OUT.write("\n")
+
+def format_float(value):
+
+	## Shortest text giving back the same value (i.e., 1e-10, 0.83)
+	text = repr(float(value))
+	if text.endswith(".0"):
+		text = text[:-2]
+	return text
+
+if __name__ == "__main__":
+
+	from sys import argv
+	import argparse
+
+	if (len(argv) < 2) or (argv[1] not in ("build","query","export")):
+		exit(f"{usage}")
+
+	command = argv[1]
+	parser = argparse.ArgumentParser(usage=usage)
+
+	if command == "build":
+		parser.add_argument("-o","--outdir",required=True)
+		parser.add_argument("-s","--sequence")
+		parser.add_argument("-f","--foldseek")
+		parser.add_argument("-g","--gesamt")
+		parser.add_argument("-c","--compiled")
+		args = parser.parse_args(argv[2:])
+		metadata = build(args.outdir,{"sequence":args.sequence,"foldseek":args.foldseek,"gesamt":args.gesamt,"compiled":args.compiled})
+		for table, info in metadata["tables"].items():
+			print(f"\t{table}\t{info['rows']} rows\t{info['blocks']} blocks")
+
+	else:
+		parser.add_argument("-d","--db",required=True)
+		parser.add_argument("-t","--table",required=True,choices=list(tables))
+		parser.add_argument("-l","--locus")
+		parser.add_argument("-a","--accession")
+		parser.add_argument("-p","--protein")
+		parser.add_argument("-o","--out")
+		args = parser.parse_args(argv[2:])
+
+		store = ResultsStore(args.db)
+		if args.table not in store.tables():
+			exit(f"\n[E]  Table {args.table} is not in {args.db}\n")
+
+		OUT = open(args.out,"w") if args.out else stdout
+
+		if command == "export":
+			store.export(args.table,OUT)
+		else:
+			filters = {"locus":args.locus}
+			key = tables[args.table]["block"]
+			if args.accession:
+				## Compiled results are grouped by protein; their accession is the sequence hit
+				filters["seq_accession" if args.table == "compiled" else key] = args.accession
+			if args.protein:
+				if key != "protein":
+					exit(f"\n[E]  Table {args.table} is not grouped by protein name\n")
+				filters["protein"] = args.protein
+			rows = store.rows(args.table,**filters)
+			key_values = np.asarray(store.strings)[np.asarray(store.column(args.table,key))[rows]]
+			OUT.write("\t".join([key]+[column_name for column_name, kind in tables[args.table]["columns"]])+"\n")
+			for value, record in zip(key_values,store.records(args.table,rows)):
+				OUT.write("\t".join([str(value)]+record)+"\n")
+
+		if args.out:
+			OUT.close()
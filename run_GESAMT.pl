@@ -1,18 +1,24 @@
 #!/usr/bin/perl
 ## Pombert Lab 2020
-my $version = '0.5f';
+my $version = '0.6.2';
 my $name = 'run_GESAMT.pl';
-my $updated = '2021-12-21';
+my $updated = '2026-10-17';
 
 use strict;
 use warnings;
 use File::Find;
 use File::Basename;
-use POSIX 'strftime';
+use POSIX qw(strftime _exit);
+use IO::Compress::Gzip qw(gzip $GzipError);
 use Getopt::Long qw(GetOptions);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Trace qw(traced);
 
 my @command = @ARGV; ## Keeping track of command line for log
 
+my ($script,$pipeline_dir) = fileparse($0);
+
 ## Usage definition
 my $USAGE = <<"OPTIONS";
 NAME		${name}
@@ -24,7 +30,7 @@ REQUIREMENTS	PDB files downloaded from RCSB PDB; e.g. pdb2zvl.ent.gz
 
 CREATE DB	${name} -cpu 10 -make -arch /media/Data_2/GESAMT_ARCHIVE -pdb /media/Data_2/PDB/
 UPDATE DB	${name} -cpu 10 -update -arch /media/Data_2/GESAMT_ARCHIVE -pdb /media/Data_2/PDB/
-QUERY DB	${name} -cpu 10 -query -arch /media/Data_2/GESAMT_ARCHIVE -input *.pdb -o ./ -mode normal 
+QUERY DB	${name} -cpu 10 -jobs 5 -query -arch /media/Data_2/GESAMT_ARCHIVE -input *.pdb -o ./ -mode normal 
 
 OPTIONS:
 -c (--cpu)	CPU threads [Default: 10]
@@ -42,6 +48,7 @@ OPTIONS:
 -o (--outdir)	Output directory [Default: ./]
 -d (--mode)	Query mode: normal of high [Default: normal]
 -z (--gzip) Compress output files [Default: off]
+-j (--jobs)	Number of queries to run at once; CPU threads are split between them [Default: 1]
 
 ## References
 1) Enhanced fold recognition using efficient short fragment clustering.
@@ -64,6 +71,7 @@ my @input;
 my $outdir = './';
 my $mode = 'normal';
 my $gnuzip;
+my $jobs = 1;
 GetOptions(
 	'c|cpu=i' => \$cpu,
 	'a|arch=s' => \$arch,
@@ -75,7 +83,8 @@ GetOptions(
 	'i|input=s@{1,}' => \@input,
 	'o|outdir=s' => \$outdir,
 	'd|mode=s' => \$mode,
-	'z|gzip' => \$gnuzip
+	'z|gzip' => \$gnuzip,
+	'j|jobs=i' => \$jobs
 );
 
 ## Creating log
@@ -104,16 +113,16 @@ unless (-d $arch){
 }
 
 if ($update){
-	system "gesamt \\
+	system traced("gesamt update-archive",basename($arch),"gesamt \\
 	  --update-archive $arch \\
 	  -pdb $pdb \\
-	  -nthreads=$cpu";
+	  -nthreads=$cpu");
 }
 elsif ($make){
-	system "gesamt \\
+	system traced("gesamt make-archive",basename($arch),"gesamt \\
 	  --make-archive $arch \\
 	  -pdb $pdb \\
-	  -nthreads=$cpu";
+	  -nthreads=$cpu");
 }
 
 ## Running GESAMT queries/Skipping previously done searches
@@ -127,33 +136,76 @@ find (sub {push @gsm, $File::Find::name unless -d}, $outdir);
 
 while (my $gsm = shift(@gsm)){
 	my ($result, $folder) = fileparse($gsm);
+	## Results of gzipped queries were named X.pdb.gz.MODE.gesamt before version 0.6;
+	## they are renamed to X.MODE.gesamt so they are not searched again
+	if ($result =~ /^(.+)\.pdb\.gz\.(\w+\.gesamt(?:\.gz)?)$/){
+		my $renamed = "$1.$2";
+		unless (-e "$folder$renamed"){
+			rename ($gsm, "$folder$renamed") or die "Can't rename $gsm: $!\n";
+			print "Renamed $result to $renamed\n";
+		}
+		$result = $renamed;
+	}
 	if ($gnuzip){ $result =~ s/\.\w+\.gesamt.gz$//; }
 	else { $result =~ s/\.\w+\.gesamt$//; }
 	$results{$result} = 'done';
 }
 
 if ($query){
+
+	## Listing queries without results
+	my @queue;
 	while (my $file = shift(@input)){
 		my ($pdb, $dir) = fileparse($file);
-		$pdb =~ s/.pdb$//;
+		$pdb =~ s/\.pdb(?:\.gz)?$//;
 		unless (exists $results{$pdb}){
-			system "gesamt $file \\
-			  -archive $arch \\
-			  -nthreads=$cpu \\
-			  -$mode \\
-			  -o $outdir/$pdb.$mode.gesamt";
-			
-			if ($gnuzip){
-				## Compressing data with GZIP to save some space
-				print "\nCompressing $outdir/$pdb.$mode.gesamt with GZIP ...\n";
-				system "gzip $outdir/$pdb.$mode.gesamt";
-			}
+			push (@queue, [$file, $pdb]);
 		}
 		## Searches can take a while, best to skip if done previously
 		else { 
 			print "Skipping PDB file: $pdb => GESAMT result found in output directory $outdir\n";
 		}
 	}
+
+	## GESAMT does not scale linearly with -nthreads; running several queries
+	## at once with fewer threads each keeps large machines busy
+	$jobs = 1 if ($jobs < 1);
+	$jobs = scalar(@queue) if (scalar(@queue) < $jobs && scalar(@queue) > 0);
+	my $nthreads = int($cpu/$jobs);
+	$nthreads = 1 if ($nthreads < 1);
+
+	my $total = scalar(@queue);
+	my $done = 0;
+	my $qstart = time;
+	my %running;
+
+	while (@queue || %running){
+
+		while (@queue && (scalar(keys %running) < $jobs)){
+			my ($file, $pdb) = @{shift(@queue)};
+			my $pid = fork();
+			die "Can't fork: $!\n" unless (defined $pid);
+			if ($pid == 0){
+				_exit(search($file, $pdb, $nthreads));
+			}
+			$running{$pid} = $pdb;
+		}
+
+		my $pid = wait();
+		last if ($pid == -1);
+		my $pdb = delete $running{$pid};
+		next unless (defined $pdb);
+		if ($? != 0){
+			print "\n[W] GESAMT search failed on $pdb\n";
+			print LOG "GESAMT search failed on $pdb\n";
+		}
+
+		## Progress
+		$done++;
+		my $elapsed = time - $qstart;
+		my $eta = ($total - $done) * $elapsed / $done;
+		printf ("  [%d/%d] %s done - elapsed %s - ETA %s\n", $done, $total, $pdb, hms($elapsed), hms($eta));
+	}
 }
 
 my $end = localtime();
@@ -161,4 +213,39 @@ my $endtime = (time - $tstart)/60;
 $endtime = sprintf ("%.2f", $endtime);
 print LOG "Completed on: $end\n";
 print LOG "Total run time: $endtime minutes\n";
-close LOG;
\ No newline at end of file
+close LOG;
+
+sub search {
+
+	my ($file, $pdb, $nthreads) = @_;
+
+	## Results are written under temporary names and renamed once complete,
+	## so interrupted searches are rerun instead of being skipped
+	my $result = "$outdir/$pdb.$mode.gesamt";
+	my $quiet = '';
+	$quiet = '1>/dev/null' if ($jobs > 1);
+
+	system (traced("gesamt",$pdb,"gesamt $file \\
+	  -archive $arch \\
+	  -nthreads=$nthreads \\
+	  -$mode \\
+	  -o $result.part $quiet")) == 0 or return 1;
+
+	if ($gnuzip){
+		## Compressing data with GZIP to save some space
+		gzip("$result.part" => "$result.gz.part") or return 1;
+		rename ("$result.gz.part", "$result.gz") or return 1;
+		unlink ("$result.part");
+	}
+	else {
+		rename ("$result.part", $result) or return 1;
+	}
+
+	return 0;
+}
+
+sub hms {
+
+	my $seconds = int(shift);
+	return sprintf ("%02d:%02d:%02d", int($seconds/3600), int(($seconds % 3600)/60), $seconds % 60);
+}
@@ -2,146 +2,528 @@
 ## Pombert Lab 2022
 
 my $name = "run_MICAN.pl";
-my $version = "0.1.2";
-my $updated = "2022-07-24";
+my $version = "0.4.3";
+my $updated = "2026-10-17";
 
 use strict;
 use warnings;
 use PerlIO::gzip;
 use File::Basename;
 use File::Path qw(make_path);
+use File::Temp qw(tempdir);
+use POSIX qw(_exit);
+use IO::Compress::Gzip qw(gzip $GzipError);
 use Getopt::Long qw(GetOptions);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Trace qw(traced);
+use QueGO::Pack qw(read_pack_index pack_structure);
 
 my $usage = <<"EXIT";
 NAME		${name}
 VERSION		${version}
 UPDATED		${updated}
 SYNOPSIS	Calculates template model (TM) score with MICAN on structural
-		matches identified with foldseek or GESAMT
+		matches identified with foldseek or GESAMT; the in-process NumPy engine
+		(tmscore_engine.py) can be used instead of MICAN. With --cascade, only the best
+		Foldseek hits of each result file (query and structure set) are rescored; other
+		hits are kept with their Foldseek scores and NA as TM-score
 
-USAGE
+USAGE		${name} \\
+		  -r STRUCTURE_HOMOLOGY/RESULTS \\
+		  -u UNIPROT_SCRAP_RESULTS/PDBs \\
+		  -p ALPHAFOLD_3D_PARSED \\
+		  -t 8
 
 OPTIONS
 -r (--results_dir)	RESULTS directory within STRUCTURAL_HOMOLOGY created by run_QueGO.pl
 -u (--uniprot_pdb)	PDB directory withing UNIPROT_SCRAP_RESULTS created by run_QueGO.pl
 -p (--predict_dir)	Directory(s) containing predicted structures
-
+-t (--threads)		Number of MICAN alignments to run in parallel [Default: 4]
+-c (--chunk)		Number of pairs scored between writing results [Default: 5000]
+-b (--backend)		Rescoring backend: mican or numpy [Default: mican]
+-n (--norm)		Length used to normalize TM-scores with the numpy backend: target, query, min or max [Default: target]
+-s (--score_cache)	Persistent cache of pair scores shared between runs [Default: \$QUEGO_CACHE/scores.sqlite]
+-k (--pack)		Read structures from packs of the UniProt and predicted structure sets (structure_pack.py),
+			built or updated in RESULTS_DIR/PACKS, instead of decompressing files for every pair
+-x (--cascade)		Rescore only the best 'X' Foldseek hits per result file, ranked by e-value then bit score
+			[Default: 0 = rescore all]; parse_3D_homology_results.pl ranks the other hits after the
+			rescored ones, by bit score
+-a (--cascade_bits)	With --cascade, also rescore hits with a Foldseek bit score of at least 'X'
 EXIT
 
+die("\n$usage\n") unless(@ARGV);
+
 my $results_dir;
 my $uniprot_dir;
 my @predicted_dirs;
+my $threads = 4;
+my $chunk = 5000;
+my $backend = 'mican';
+my $norm = 'target';
+my $score_cache;
+$score_cache = "$ENV{QUEGO_CACHE}/scores.sqlite" if ($ENV{QUEGO_CACHE});
+my $pack;
+my $cascade = 0;
+my $cascade_bits;
 
 GetOptions(
 	'r|results_dir=s' => \$results_dir,
 	'u|uniprot_pdb=s' => \$uniprot_dir,
 	'p|predict_dir=s{1,}' => \@predicted_dirs,
+	't|threads=i' => \$threads,
+	'c|chunk=i' => \$chunk,
+	'b|backend=s' => \$backend,
+	'n|norm=s' => \$norm,
+	's|score_cache=s' => \$score_cache,
+	'k|pack' => \$pack,
+	'x|cascade=i' => \$cascade,
+	'a|cascade_bits=s' => \$cascade_bits,
 );
 
+$threads = 1 if ($threads < 1);
+
+$backend = lc($backend);
+unless (($backend eq 'mican') || ($backend eq 'numpy')){
+	die "\n[E]  Unrecognized backend: $backend. Please use mican or numpy\n\n";
+}
+
+my ($script,$pipeline_dir) = fileparse($0);
+my $engine_script = $pipeline_dir."/tmscore_engine.py";
+my $cache_script = $pipeline_dir."/score_cache.py";
+my $pack_script = $pipeline_dir."/structure_pack.py";
+
+## Cached scores are only reused with the same scorer and version
+my $scorer;
+if ($backend eq 'numpy'){
+	my $engine_version = 'unknown';
+	open ENGINE, "<", $engine_script or die "Cannot read $engine_script: $!\n";
+	while (my $line = <ENGINE>){
+		if ($line =~ /^version\s*=\s*"([^"]+)"/){
+			$engine_version = $1;
+			last;
+		}
+	}
+	close ENGINE;
+	$scorer = "tmscore_engine:$engine_version:$norm";
+}
+else {
+	my $mican_version = 'unknown';
+	if (`mican -h 2>&1 </dev/null` =~ /version\s*:?\s*(\S+)/i){
+		$mican_version = $1;
+	}
+	$scorer = "mican:$mican_version";
+}
+
 my %predicted_dirs;
 foreach my $dir (@predicted_dirs){
 	my @data = split(/\//,$dir);
 	$predicted_dirs{$data[-1]} = $dir;
 }
 
-unless (-d "temp"){
-	make_path("temp",{mode=>0755});
-}
+## Each run and each worker gets its own scratch space, so runs can share a working directory
+my $scratch = tempdir("MICAN_XXXXXX", TMPDIR => 1, CLEANUP => 1);
+
+###################################################################################################
+## Listing result files still needing TM-scores
+###################################################################################################
+
+my @jobs;
 
 opendir(ODIR,$results_dir) or die "Cannot access $results_dir: $!\n";
 while (my $hom_tool_dir = readdir(ODIR)){
 	if ((-d $results_dir."/".$hom_tool_dir) && ($hom_tool_dir eq "FOLDSEEK")){
 		opendir(MDIR,$results_dir."/".$hom_tool_dir) or die "Cannot access $results_dir/$hom_tool_dir: $!\n";;
-		while (my $structure_set_dir = readdir(MDIR)){
+		foreach my $structure_set_dir (sort(readdir(MDIR))){
 			if ((-d $results_dir."/".$hom_tool_dir."/".$structure_set_dir) && ($structure_set_dir !~ /^\./)){
 				unless (-d $results_dir."/".$hom_tool_dir."_w_MICAN/".$structure_set_dir){
 					make_path($results_dir."/".$hom_tool_dir."_w_MICAN/".$structure_set_dir,{mode=>0755});
 				}
 				opendir(IDIR,$results_dir."/".$hom_tool_dir."/".$structure_set_dir) or die "Cannot access $results_dir/$hom_tool_dir/$structure_set_dir";
-				
-				my $file_count = () = readdir(IDIR);
-				rewinddir(IDIR);
-				my $file_counter = 0;
-				
-				while (my $file = readdir(IDIR)){
-					if ((-f $results_dir."/".$hom_tool_dir."/".$structure_set_dir."/".$file) && ($file ne "error.log")){
+				foreach my $file (sort(readdir(IDIR))){
+					if ((-f $results_dir."/".$hom_tool_dir."/".$structure_set_dir."/".$file) && ($file ne "error.log") && ($file =~ /\.fseek(?:\.gz)?$/)){
 						my ($outfile) = $file =~ /^(\w+)/;
-						$file_counter++;
-
-						my $done = int(($file_counter/($file_count-3))*100);
-						my $remaining = 100-$done;
-
-						my $bar = "\t[".("|"x$done).("."x$remaining)."]\t($file_counter/".($file_count-3).")\n";
-
-						print($bar."Working on $outfile...\n");
-
-						unless (-f "$results_dir/${hom_tool_dir}_w_MICAN/$structure_set_dir/${outfile}_w_tmscore.fseek.gz"){
-							my $gzip = "";
-							if ($file =~ /\.gz$/){
-								$gzip = ":gzip"
-							}
-							open IN, "<$gzip", $results_dir."/".$hom_tool_dir."/".$structure_set_dir."/".$file;
-							my @results;
-							while (my $line = <IN>){
-								my $target_pdb = $uniprot_dir."/";
-								my $pred_pdb = $predicted_dirs{$structure_set_dir}."/";
-								chomp($line);
-								if ($hom_tool_dir eq "FOLDSEEK"){
-									my @data = split("\t",$line);
-
-									$target_pdb .= ("/".$data[0]);
-									my $temp_target = "temp/target.pdb";
-									system "zcat -f $target_pdb > $temp_target";
-									$pred_pdb .= ("/".$data[1]);
-									my $temp_pred = "temp/pred.pdb";
-									system "zcat -f $pred_pdb > $temp_pred";
-
-									my $mican_result = `mican -s $temp_target $temp_pred -n 1`;
-									
-									my @mican_data = split("\n",$mican_result);
-
-									my $grab;
-									my $rank;
-									my $sTMscore;
-									my $TMscore;
-									my $Dali_Z;
-									my $SPscore;
-									my $Length;
-									my $RMSD;
-									my $Seq_Id;
-									foreach my $line (@mican_data){
-										chomp($line);
-										if ($line =~ /Rank\s+sTMscore/){
-											$grab = 1;
-										}
-										if (($grab) && ($line =~ /^\s+(1.*)/)){
-											undef($grab);
-											($rank,$sTMscore,$TMscore,$Dali_Z,$SPscore,$Length,$RMSD,$Seq_Id) = split(/\s+/,$1);
-											push(@data,$TMscore);
-											push(@results,[@data]);
-										}
-									}
-								}
-							# 	elsif ($hom_tool_dir eq "GESAMT"){
-
-							# 	}
-							}
-							close IN;
-							open OUT, ">", "$results_dir/${hom_tool_dir}_w_MICAN/$structure_set_dir/${outfile}_w_tmscore.fseek";
-							foreach my $line (sort{@{$b}[-1] <=> @{$a}[-1]}@results){
-								print OUT (join("\t",@{$line})."\n");
-							}
-							close OUT;
-							system "gzip $results_dir/${hom_tool_dir}_w_MICAN/$structure_set_dir/${outfile}_w_tmscore.fseek";
+						my $output = "$results_dir/${hom_tool_dir}_w_MICAN/$structure_set_dir/${outfile}_w_tmscore.fseek.gz";
+						unless (-f $output){
+							push(@jobs,[$results_dir."/".$hom_tool_dir."/".$structure_set_dir."/".$file,$output,$structure_set_dir,$outfile]);
 						}
 					}
 				}
-				close IDIR;
+				closedir(IDIR);
 			}
 		}
-		close MDIR;
+		closedir(MDIR);
 	}
 }
 close ODIR;
 
-system("rm -r temp");
\ No newline at end of file
+###################################################################################################
+## Packing structure sets
+###################################################################################################
+
+## Structure directory => pack; structures are read from the packs by the MICAN workers and the
+## NumPy engine. Packs are only rebuilt when their structure set has changed.
+my %packs;
+if ($pack && @jobs){
+	my $pack_dir = "$results_dir/PACKS";
+	make_path($pack_dir,{mode=>0755}) unless (-d $pack_dir);
+	my %sets = (UNIPROT_PDBs => $uniprot_dir, %predicted_dirs);
+	foreach my $set (sort(keys(%sets))){
+		system (traced("structure_pack",$set,"$pack_script build -i $sets{$set} -o $pack_dir/$set.pack")) == 0 or die "Cannot pack $sets{$set} into $pack_dir/$set.pack\n";
+		$packs{normal_dir($sets{$set})} = read_pack_index("$pack_dir/$set.pack");
+	}
+}
+
+###################################################################################################
+## Scoring pairs in chunks of files
+###################################################################################################
+
+my $file_counter = 0;
+my $file_count = scalar(@jobs);
+
+## Hits read, and hits rescored by rank and by bit score in cascade mode
+my %cascade_stats = (hits => 0, ranked => 0, bits => 0);
+
+while (@jobs){
+
+	## Read result files until the chunk is full; a file is never split between chunks
+	my @chunk_jobs;
+	my @pairs;
+	while (@jobs && (scalar(@pairs) < $chunk || !@chunk_jobs)){
+		my $job = shift(@jobs);
+		my ($input,$output,$structure_set_dir) = @{$job};
+		my $gzip = "";
+		if ($input =~ /\.gz$/){
+			$gzip = ":gzip"
+		}
+		my @hits;
+		open IN, "<$gzip", $input or die "Cannot read $input: $!\n";
+		while (my $line = <IN>){
+			chomp($line);
+			next if ($line eq '');
+			push(@hits,[split("\t",$line)]);
+		}
+		close IN;
+
+		my $rescored = cascade(\@hits);
+		my @lines;
+		foreach my $position (0..$#hits){
+			my @data = @{$hits[$position]};
+			## Hits left out by the cascade have no pair to score
+			unless ($rescored->[$position]){
+				push(@lines,[undef,@data]);
+				next;
+			}
+			## Alignment ranges (qstart, qend, tstart, tend) are used by the numpy backend
+			push(@pairs,[$uniprot_dir."//".$data[0],$predicted_dirs{$structure_set_dir}."//".$data[1],@data[6..9]]);
+			push(@lines,[scalar(@pairs)-1,@data]);
+		}
+		push(@chunk_jobs,[@{$job},\@lines]);
+	}
+
+	my $scores = cached_scores(\@pairs);
+
+	foreach my $job (@chunk_jobs){
+		my ($input,$output,$structure_set_dir,$outfile,$lines) = @{$job};
+		$file_counter++;
+		print("\t($file_counter/$file_count)\tWorking on $outfile...\n");
+		my @results;
+		foreach my $line (@{$lines}){
+			my ($index,@data) = @{$line};
+			if (!defined($index)){
+				push(@results,[@data,'NA']);
+			}
+			elsif (defined($scores->[$index])){
+				push(@results,[@data,$scores->[$index]]);
+			}
+		}
+		write_results($output,\@results);
+	}
+}
+
+if ($cascade > 0){
+	my $rescored = $cascade_stats{ranked} + $cascade_stats{bits};
+	my $saved = $cascade_stats{hits} - $rescored;
+	my $percent = $cascade_stats{hits} ? sprintf("%.1f",100*$saved/$cascade_stats{hits}) : "0.0";
+	print("\tCascade: $rescored of $cascade_stats{hits} Foldseek hits rescored ($cascade_stats{ranked} in the best $cascade per file");
+	print(", $cascade_stats{bits} with a bit score of at least $cascade_bits") if (defined $cascade_bits);
+	print("); $saved alignments saved ($percent%), written with NA as TM-score\n");
+}
+
+###################################################################################################
+## Subroutines
+
+sub cascade {
+
+	## Flags the hits to rescore: the best $cascade by e-value (then bit score, then Foldseek
+	## order) and, with $cascade_bits, any hit above that bit score; all hits without --cascade
+	my ($hits) = @_;
+	my @rescored = (1) x scalar(@{$hits});
+	return \@rescored unless ($cascade > 0);
+
+	$cascade_stats{hits} += scalar(@{$hits});
+	@rescored = (0) x scalar(@{$hits});
+	my @ranked = sort {
+		$hits->[$a][10] <=> $hits->[$b][10] || $hits->[$b][11] <=> $hits->[$a][11] || $a <=> $b
+	} (0..$#{$hits});
+
+	foreach my $rank (0..$#ranked){
+		my $position = $ranked[$rank];
+		if ($rank < $cascade){
+			$rescored[$position] = 1;
+			$cascade_stats{ranked}++;
+		}
+		elsif ((defined $cascade_bits) && ($hits->[$position][11] >= $cascade_bits)){
+			$rescored[$position] = 1;
+			$cascade_stats{bits}++;
+		}
+	}
+
+	return \@rescored;
+}
+
+sub cached_scores {
+
+	## Pairs found in the score cache are not scored again; new scores are added in one batch.
+	## NumPy scores depend on the Foldseek alignment, so its ranges are part of the key.
+	my ($pairs) = @_;
+	my @scores;
+	my $key_columns = ($backend eq 'numpy') ? 5 : 1;
+
+	if ($score_cache){
+		open PAIRS, ">", "$scratch/lookup.tsv" or die "Cannot write to $scratch/lookup.tsv: $!\n";
+		foreach my $pair (@{$pairs}){
+			print PAIRS join("\t",@{$pair}[0..$key_columns])."\n";
+		}
+		close PAIRS;
+		system (traced("score_cache lookup",scalar(@{$pairs})." pairs","$cache_script \\
+			  --db $score_cache \\
+			  --scorer $scorer \\
+			  --lookup $scratch/lookup.tsv \\
+			  --out $scratch/cached.tsv
+		")) == 0 or die "Cannot read scores from $score_cache\n";
+		open CACHED, "<", "$scratch/cached.tsv" or die "Cannot read $scratch/cached.tsv: $!\n";
+		while (my $line = <CACHED>){
+			chomp($line);
+			my ($index,$tmscore) = split("\t",$line);
+			$scores[$index] = $tmscore;
+		}
+		close CACHED;
+	}
+
+	my @pending = grep { !defined($scores[$_]) } (0..$#{$pairs});
+	my $cached = scalar(@{$pairs}) - scalar(@pending);
+	print("\tScoring ".scalar(@pending)." pairs (".$cached." found in the score cache)...\n");
+	return \@scores unless (@pending);
+
+	my $new_scores;
+	if ($backend eq 'numpy'){
+		$new_scores = engine_scores([@{$pairs}[@pending]]);
+	}
+	else {
+		$new_scores = score_pairs([@{$pairs}[@pending]]);
+	}
+
+	my @inserts;
+	for my $position (0..$#pending){
+		my $tmscore = $new_scores->[$position];
+		next unless (defined $tmscore);
+		$scores[$pending[$position]] = $tmscore;
+		push(@inserts,join("\t",@{$pairs->[$pending[$position]]}[0..$key_columns],$tmscore)."\n");
+	}
+
+	if ($score_cache && @inserts){
+		open NEW, ">", "$scratch/new_scores.tsv" or die "Cannot write to $scratch/new_scores.tsv: $!\n";
+		print NEW @inserts;
+		close NEW;
+		system (traced("score_cache insert",scalar(@inserts)." scores","$cache_script \\
+			  --db $score_cache \\
+			  --scorer $scorer \\
+			  --insert $scratch/new_scores.tsv
+		")) == 0 or print STDERR "[W]  Cannot add scores to $score_cache\n";
+	}
+
+	return \@scores;
+}
+
+sub score_pairs {
+
+	## Spread the pairs over the workers; each worker writes its scores to its own file
+	my ($pairs) = @_;
+	my @scores;
+	my @children;
+
+	my $workers = $threads;
+	$workers = scalar(@{$pairs}) if (scalar(@{$pairs}) < $workers);
+
+	for my $worker (0..$workers-1){
+		my $pid = fork();
+		die "Unable to fork: $!\n" unless (defined $pid);
+		if ($pid == 0){
+			## Errors must not unwind the worker: its copy of File::Temp would remove the scratch
+			## space the parent and the other workers are still using. Leave it to the parent
+			my $done = eval {
+				my $worker_dir = "$scratch/worker_$worker";
+				make_path($worker_dir,{mode=>0755});
+				open SCORES, ">", "$worker_dir/scores.tsv" or die "Cannot write to $worker_dir/scores.tsv: $!\n";
+				for (my $index = $worker; $index < scalar(@{$pairs}); $index += $workers){
+					my ($target_pdb,$pred_pdb) = @{$pairs->[$index]};
+					my $tmscore = mican_score($target_pdb,$pred_pdb,$worker_dir);
+					if (defined $tmscore){
+						print SCORES "$index\t$tmscore\n";
+					}
+				}
+				close SCORES or die "Cannot write to $worker_dir/scores.tsv: $!\n";
+				1;
+			};
+			unless ($done){
+				print STDERR "[E]  MICAN worker $worker: $@";
+				_exit(1);
+			}
+			_exit(0);
+		}
+		push(@children,[$pid,$worker]);
+	}
+
+	foreach my $child (@children){
+		my ($pid,$worker) = @{$child};
+		waitpid($pid,0);
+		die "MICAN worker $worker failed\n" if ($? != 0);
+		open SCORES, "<", "$scratch/worker_$worker/scores.tsv" or die "Cannot read MICAN scores from worker $worker: $!\n";
+		while (my $line = <SCORES>){
+			chomp($line);
+			my ($index,$tmscore) = split("\t",$line);
+			$scores[$index] = $tmscore;
+		}
+		close SCORES;
+	}
+
+	return \@scores;
+}
+
+sub engine_scores {
+
+	## Scores the whole chunk in a single process; coordinates are loaded once per structure
+	my ($pairs) = @_;
+	my @scores;
+
+	open PAIRS, ">", "$scratch/pairs.tsv" or die "Cannot write to $scratch/pairs.tsv: $!\n";
+	foreach my $pair (@{$pairs}){
+		print PAIRS join("\t",@{$pair})."\n";
+	}
+	close PAIRS;
+
+	my $pack_flags = "";
+	if (%packs){
+		$pack_flags = "--packs ".join(" ",map { "$_=$packs{$_}{file}" } sort(keys(%packs)));
+	}
+
+	system (traced("tmscore_engine",scalar(@{$pairs})." pairs","$engine_script \\
+		  --pairs $scratch/pairs.tsv \\
+		  --norm $norm \\
+		  $pack_flags \\
+		  --out $scratch/scores.tsv
+	")) == 0 or die "TM-score engine failed on $scratch/pairs.tsv\n";
+
+	open SCORES, "<", "$scratch/scores.tsv" or die "Cannot read $scratch/scores.tsv: $!\n";
+	while (my $line = <SCORES>){
+		chomp($line);
+		my ($index,$tmscore) = split("\t",$line);
+		$scores[$index] = $tmscore;
+	}
+	close SCORES;
+
+	return \@scores;
+}
+
+sub mican_score {
+
+	my ($target_pdb,$pred_pdb,$worker_dir) = @_;
+
+	my $temp_target = structure_file($target_pdb,$worker_dir);
+	my $temp_pred = structure_file($pred_pdb,$worker_dir);
+
+	my $mican = traced("mican",basename($target_pdb)." ".basename($pred_pdb),"mican -s $temp_target $temp_pred -n 1");
+	my $mican_result = `$mican`;
+
+	my @mican_data = split("\n",$mican_result);
+
+	my $grab;
+	foreach my $line (@mican_data){
+		chomp($line);
+		if ($line =~ /Rank\s+sTMscore/){
+			$grab = 1;
+		}
+		if (($grab) && ($line =~ /^\s+(1.*)/)){
+			my ($rank,$sTMscore,$TMscore,$Dali_Z,$SPscore,$Length,$RMSD,$Seq_Id) = split(/\s+/,$1);
+			return $TMscore;
+		}
+	}
+
+	return;
+}
+
+sub structure_file {
+
+	## Structures are decompressed once per worker (from their pack, or with zcat) and kept in
+	## the worker's scratch space; the least recently used are removed past $decoded_max
+	my ($file,$worker_dir) = @_;
+	our %decoded;
+	our $decoded_tick;
+	my $decoded_max = 64;
+
+	$decoded_tick++;
+	if ($decoded{$file}){
+		$decoded{$file}[1] = $decoded_tick;
+		return $decoded{$file}[0];
+	}
+
+	my $temp = "$worker_dir/structure_$decoded_tick.pdb";
+	my ($name,$dir) = fileparse($file);
+	my $structure_pack = $packs{normal_dir($dir)};
+	my $structure = $structure_pack ? pack_structure($structure_pack,$name) : undef;
+	if (defined $structure){
+		open TEMP, ">", $temp or die "Cannot write to $temp: $!\n";
+		print TEMP $structure;
+		close TEMP;
+	}
+	else {
+		system "zcat -f $file > $temp";
+	}
+
+	$decoded{$file} = [$temp,$decoded_tick];
+	if (scalar(keys(%decoded)) > $decoded_max){
+		my ($oldest) = sort { $decoded{$a}[1] <=> $decoded{$b}[1] } keys(%decoded);
+		unlink($decoded{$oldest}[0]);
+		delete $decoded{$oldest};
+	}
+
+	return $temp;
+}
+
+sub normal_dir {
+
+	my ($dir) = @_;
+	$dir =~ s/\/+/\//g;
+	$dir =~ s/(.)\/$/$1/;
+	return $dir;
+}
+
+sub write_results {
+
+	## Sorted by TM-score, hits not rescored (NA) last; ties keep the Foldseek order so reruns
+	## produce identical files
+	my ($output,$results) = @_;
+
+	my @scored = grep { $_->[-1] ne 'NA' } @{$results};
+	my @unscored = grep { $_->[-1] eq 'NA' } @{$results};
+
+	my $content = "";
+	foreach my $line ((sort{@{$b}[-1] <=> @{$a}[-1]}@scored),@unscored){
+		$content .= join("\t",@{$line})."\n";
+	}
+
+	## Written under a temporary name so interrupted runs do not leave partial results
+	gzip(\$content => "$output.tmp") or die "Cannot write to $output.tmp: $GzipError\n";
+	rename("$output.tmp",$output) or die "Cannot rename $output.tmp: $!\n";
+}
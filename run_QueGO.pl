@@ -1,22 +1,36 @@
 #!/usr/bin/perl
 ## Pombert Lab 2022
 my $name = "run_QueGO.pl";
-my $version = "0.8.4";
-my $updated = "2022-08-23";
+my $version = "0.16.7";
+my $updated = "2026-10-17";
 
 use strict;
 use warnings;
 use Getopt::Long qw(GetOptions);
-use File::Path qw(make_path);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Trace qw(traced);
+use File::Path qw(make_path remove_tree);
 use File::Basename;
+use File::Find;
 use Cwd qw(abs_path);
+use Digest::MD5;
+use JSON::PP;
+use Time::HiRes ();
+use PerlIO::gzip;
+use IO::Compress::Gzip qw(gzip $GzipError);
+use IO::Handle;
 use Term::ANSIColor;
 
 my $usage = <<"EXIT";
 NAME		$name
 VERSION		$version
 UPDATED		$updated
-SYNOPSIS	This script runs the QueGO pipeline from start to finish.
+SYNOPSIS	This script runs the QueGO pipeline from start to finish. Stages run as soon as their
+		inputs are ready (i.e., archives are built while UniProt is being scraped). Each stage
+		records a fingerprint of its parameters, tools and inputs in OUTDIR/.fingerprints;
+		on reruns, stages and items (queries, accessions) whose fingerprint is unchanged are
+		skipped, and stages interrupted by a previous run are redone.
 
 USAGE		$name \\
 		  -k "telomere" \\
@@ -32,6 +46,17 @@ USAGE		$name \\
 -n (--need_3D)	Require genes to have 3D structure
 -m (--method)		Method used to obtain structure [Default = All] (X-ray, NMR, Predicted)
 -u (--uniprot)		Previously performed UNIPROT_SCRAP_RESULTS
+-x (--rest)		Acquire UniProt metadata with bulk REST queries instead of crawling accession pages
+-y (--cache)		Shared cache for downloaded FASTA and structure files and TM-scores [Default: \$QUEGO_CACHE]
+--cache_max_size	Evict least recently used files from the cache beyond this size (GB)
+--cache_max_age		Evict files from the cache that have not been used in this many days
+-l (--offline)		Search a local UniProt index (uniprot_offline_index.py build) instead of uniprot.org
+-p (--pdb_mirror)	Local PDB mirror to extract chains from when searching offline
+-b (--af_mirror)	Local directory of AlphaFold models to copy predicted structures from when searching offline
+-i (--batch_list)	File listing several searches, one per line: a GO keyword or a UniProt query, optionally
+			preceded by a name and a tab. UniProt is scraped once per search into a single
+			UNIPROT_SCRAP_RESULTS, which is searched once; results are then compiled for each
+			search in OUTDIR/KEYWORDS/NAME/RESULTS
 
 ## SEQUENCE HOMOLOGY OPTIONS ##
 -f (--fastas)		Files containing protein sequences (FASTAs extracted automatically from provided predicted structures if ignored)
@@ -43,11 +68,21 @@ USAGE		$name \\
 -r (--homology_arch)	3D homology archives (Archive must be compatible with --hom_tool)
 -t (--tmscore)		TM-score cut-off for FoldSeek [Default: 0.3]
 -q (--qscore)		Q-score cut-off for GESAMT [Default: 0.3]
+-g (--tm_backend)	Backend used to rescore FoldSeek hits: mican or numpy [Default: mican]
+-d (--cascade)		Rescore only the best 'X' FoldSeek hits per query and structure set [Default: 0 = all];
+			other hits are kept after the rescored ones, ranked by bit score, with NA as TM-score
+--cascade_bits		With --cascade, also rescore hits with a FoldSeek bit score of at least 'X'
+--pack			Read structures from packs of the structure sets (structure_pack.py) when rescoring
+			FoldSeek hits, instead of decompressing files for every pair
 
 ## GENERAL OPTIONS ##
 -a (--annot)		TSV file containing existing annotations for predicted proteins
--w (--threads)		Number of threads to use [Default = 4]
+-w (--threads)		Number of threads shared by the stages running at the same time [Default = 4]
 -o (--outdir)		Output directory [Default = QueGO_Results]
+-z (--rerun)		Stages to run again even if their fingerprint is unchanged (i.e., uniprot to refresh a scrape)
+-j (--trace)		Record the wall time, CPU time, peak memory and exit status of each stage and tool call
+			in OUTDIR/trace.jsonl, exported to OUTDIR/trace.json (chrome://tracing, ui.perfetto.dev)
+			and summarized in OUTDIR/trace_summary.txt (see quego_trace.py)
 EXIT
 
 die("\n$usage\n") unless(@ARGV);
@@ -67,6 +102,14 @@ my $verified_only;
 my $need_3D;
 my @method;
 my $uniprot;
+my $rest;
+my $cache = $ENV{QUEGO_CACHE};
+my $cache_max_size;
+my $cache_max_age;
+my $offline;
+my $pdb_mirror;
+my $af_mirror;
+my $batch_list;
 
 my @prot_fasta;
 my $seq_eval = 1e-10;
@@ -76,19 +119,35 @@ my $hom_tool = "FOLDSEEK";
 my @archives;
 my $fs_tm = 0.3;
 my $qscore = 0.3;
+my $tm_backend = "mican";
+my $cascade = 0;
+my $cascade_bits;
+my $pack;
 
 my $annot_file;
 my $threads = 4;
 my $outdir = "QueGO_Results";
+my @rerun;
+my $trace;
 
 my $custom;
 
+my @stages;
+
 GetOptions(
 	'k|go_keyword=s' => \$go_keyword,
 	'v|verfied_only' => \$verified_only,
 	'n|need_3D' => \$need_3D,
 	'm|method=s{1,}' => \@method,
 	'u|uniprot=s' => \$uniprot,
+	'x|rest' => \$rest,
+	'y|cache=s' => \$cache,
+	'cache_max_size=s' => \$cache_max_size,
+	'cache_max_age=s' => \$cache_max_age,
+	'l|offline=s' => \$offline,
+	'p|pdb_mirror=s' => \$pdb_mirror,
+	'b|af_mirror=s' => \$af_mirror,
+	'i|batch_list=s' => \$batch_list,
 
 	'f|fastas=s{1,}' => \@prot_fasta,
 	'e|eval=s' => \$seq_eval,
@@ -98,10 +157,16 @@ GetOptions(
 	'r|homology_arch=s{1,}' => \@archives,
 	't|tmscore=s' => \$fs_tm,
 	'q|qscore=s' => \$qscore,
+	'g|tm_backend=s' => \$tm_backend,
+	'd|cascade=i' => \$cascade,
+	'cascade_bits=s' => \$cascade_bits,
+	'pack' => \$pack,
 
 	'a|annot=s' => \$annot_file,
 	'w|threads=s' => \$threads,
 	'o|outdir=s' => \$outdir,
+	'z|rerun=s{1,}' => \@rerun,
+	'j|trace' => \$trace,
 
 	'c|custom=s' => \$custom, ## shhh, this is a secret tool for debugging purposes
 );
@@ -116,6 +181,9 @@ my $mican_script = $pipeline_dir."/run_MICAN.pl";
 my $gesamt_script = $pipeline_dir."/run_GESAMT.pl";
 my $parser_script = $pipeline_dir."/parse_3D_homology_results.pl";
 my $metadata_script = $pipeline_dir."/organize_results.pl";
+my $store_script = $pipeline_dir."/results_store.py";
+my $trace_script = $pipeline_dir."/quego_trace.py";
+my $metadata_store_script = $pipeline_dir."/metadata_store.py";
 
 ## Setup directory variables
 my $uniprot_dir = $outdir."/UNIPROT_SCRAP_RESULTS";
@@ -130,6 +198,10 @@ my $struct_res_dir = $struct_hom_dir."/RESULTS";
 
 my $results_dir = $outdir."/RESULTS";
 
+my $batch_dir = $outdir."/KEYWORDS";
+
+my $fingerprint_dir = $outdir."/.fingerprints";
+
 my @dirs = (
 	$outdir,
 
@@ -143,7 +215,9 @@ my @dirs = (
 	$arch_dir,
 	$struct_res_dir,
 
-	$results_dir
+	$results_dir,
+
+	$fingerprint_dir
 );
 
 print "\n\nSetting up working enviroment\n\n";
@@ -160,11 +234,19 @@ foreach my $dir (@dirs){
 	}
 }
 
+## Tool calls of all scripts are added to the same trace
+if ($trace){
+	$ENV{QUEGO_TRACE} = abs_path($outdir)."/trace.jsonl";
+}
+
 ###################################################################################################
 ## Setting up log file
 ###################################################################################################
 
 open LOG, ">>", "$outdir/run_QueGO.log";
+## Stages are forked; unflushed output would otherwise be duplicated in each stage
+LOG->autoflush(1);
+STDOUT->autoflush(1);
 print LOG ("\n".$0);
 for my $arg (@arguments){
 	if(substr($arg,0,1) eq "-"){
@@ -177,344 +259,662 @@ for my $arg (@arguments){
 print LOG ("\n\n");
 
 ###################################################################################################
-## Getting UniProt data either from new WebScrap or old archive
+## Checking inputs before any stage starts
 ###################################################################################################
 
-### Use previously used scrap results
-if ($uniprot){
-	if (-d "$uniprot"){
-		$start = time();
-		print LOG "\n\tCopying UniProt scrap started at ".localtime($start)."\n";
-		print "Utilizing previous UniProt scrap located at $uniprot...\n\n";
-		system "cp -r $uniprot/* $uniprot_dir/";
-		$stop = time();
-		print LOG "\tUniProt scrap copying completed at ".localtime($stop)." (".duration($stop,$start).")\n";
-	}
-	else {
+## Stages run in their own processes, so the homology tool is settled here rather than mid-run
+until ((uc($hom_tool) eq "GESAMT") || (uc($hom_tool) eq "FOLDSEEK")){
+	print "\n\n[W] $hom_tool is not a valid homology tool!\n\n Please select either GESAMT or FoldSeek:\t";
+	chomp(my $selection = <STDIN>);
+	$hom_tool = $selection;
+}
+$hom_tool = uc($hom_tool);
+
+## Searches of the batch list: [name, GO keyword or UniProt query]
+my @batch;
+if ($batch_list){
+	if ($uniprot){
 		print color 'red';
-		print "\n\n[E]  Could not access previous UniProt scrap located at $uniprot...\n\n";
+		print "\n\n[E]  --batch_list scrapes UniProt for each search and cannot be used with --uniprot...\n\n";
 		print color 'reset';
 		exit;
 	}
-}
-### Perform UniProt scraping
-elsif($go_keyword){
-	$start = time();
-	print LOG "\n\tUniProt scrap started at ".localtime($start)."\n";
-	print "\nStarting UniProt scrap...\n\n";
-	my $flags = "";
-	
-	if($go_keyword){
-		$go_keyword =~ s/"//g;
-		$flags .= "--go_keyword \"$go_keyword\" ";
-	}
-
-	if(@method){
-		$flags .= "--method @method ";
-	}
-
-	if($need_3D){
-		$flags .= "--structures ";
-	}
-
-	if($verified_only){
-		$flags .= "-v";
+	my %names;
+	open BATCH, "<", $batch_list or die "Unable to read $batch_list: $!\n";
+	while (my $line = <BATCH>){
+		chomp($line);
+		next if ($line =~ /^\s*(?:#|$)/);
+		my ($batch_name,$query) = ($line =~ /\t/) ? split("\t",$line,2) : ("",$line);
+		$query =~ s/^\s+|\s+$//g;
+		unless ($batch_name){
+			($batch_name = $query) =~ s/[^\w.-]+/_/g;
+			$batch_name =~ s/^_+|_+$//g;
+		}
+		if ($names{$batch_name}++){
+			print color 'red';
+			print "\n\n[E]  $batch_name is listed more than once in $batch_list...\n\n";
+			print color 'reset';
+			exit;
+		}
+		push(@batch,[$batch_name,$query]);
 	}
-
-	if($custom){
-		$flags = "-c '$custom'";
+	close BATCH;
+	unless (@batch){
+		print color 'red';
+		print "\n\n[E]  No searches found in $batch_list...\n\n";
+		print color 'reset';
+		exit;
 	}
+}
 
-	system "$scraper_script \\
-			--outdir $outdir/UNIPROT_SCRAP_RESULTS \\
-			-df \\
-			-ds \\
-			$flags
-	";
-
-	unless(-f "$uniprot_dir/metadata.log"){
+if ($uniprot){
+	unless (-d "$uniprot"){
 		print color 'red';
-		print "\n\n[E]  UniProt scraping failed\n\n";
+		print "\n\n[E]  Could not access previous UniProt scrap located at $uniprot...\n\n";
 		print color 'reset';
 		exit;
 	}
-	$stop = time();
-	print LOG "\tUniProt scrap completed at ".localtime($stop)." (".duration($stop,$start).")\n";
 }
-else{
+elsif (!$go_keyword && !@batch){
 	print color 'red';
-	print "\n\n[E]  Please provide a GO keyword or UNIPROT_SCRAP_RESULTS directory...\n\n";
+	print "\n\n[E]  Please provide a GO keyword, a batch list or UNIPROT_SCRAP_RESULTS directory...\n\n";
 	print color 'reset';
 	exit;
 }
 
+## Archive locations are known up front; the 3D homology searches only need them to be built
 my %archives;
+my @staged_archives;
 
-###################################################################################################
-## Copying precompiled 3D homology archives
-###################################################################################################
+foreach my $archive (@archives){
 
-if(@archives){
+	opendir(ARCH,$archive);
 
-	$start = time();
+	my $arch_tool = "FOLDSEEK";
 
-	print LOG "\n\tCopying archives started at ".localtime($start)."...\n";
-	
-	### Copy pre-existing archives to new work enviroment
-	foreach my $archive (@archives){
+	## Checking if archive is GESAMT or FoldSeek
+	while (my $item = readdir(ARCH)){
+		unless (-d $archive."/"."$item"){
+			if ($item =~ /^gesamt.archive/){
+				$arch_tool = "GESAMT";
+				last;
+			}
+		}
+	}
 
-		opendir(ARCH,$archive);
+	close ARCH;
 
-		my $arch_tool = "FOLDSEEK";
+	print("Provided archive at $archive is a $arch_tool archive...\n\n");
 
-		## Checking if archive is GESAMT or FoldSeek
-		while (my $item = readdir(ARCH)){
-			unless (-d $archive."/"."$item"){
-				if ($item =~ /^gesamt.archive/){
-					$arch_tool = "GESAMT";
-					last;
-				}
-			}
-		}
+	if ($arch_tool eq $hom_tool){
+		my ($archive_path) = abs_path($archive);
+		my ($archive_name) = $archive_path =~ /\/(\w+)\/*$/;
+		my $staged = $arch_dir."/".$hom_tool."/".$archive_name;
+		$archives{$archive_name} = $staged;
+		push(@staged_archives,[$archive,$archive_path,$archive_name,$staged]);
+	}
+	else{
+		print color 'yellow';
+		print("\t[W]  $archive is a $arch_tool archive and is not compatible with $hom_tool. Skipping...\n\n");
+		print color 'reset';
+	}
+}
+
+foreach my $structure_set (@predictions){
+	my ($db_name) = $structure_set =~ /\/(\w+)\/*$/;
+	$archives{$db_name} = $arch_dir."/".$hom_tool."/".$db_name;
+}
 
-		close ARCH;
+###################################################################################################
+## Getting UniProt data either from new WebScrap or old archive
+###################################################################################################
 
-		print("Provided archive at $archive is a $arch_tool archive...\n\n");
+## Chains are extracted from the downloaded PDB/mmCIF entries by as many processes as the stage is given
+add_stage("uniprot", [], $threads, sub {
 
-		if ($arch_tool eq $hom_tool){
-			my ($archive_path) = abs_path($archive);
-			my ($archive_name) = $archive_path =~ /\/(\w+)\/*$/;
-			unless(-d $arch_dir."/".$hom_tool."/".$archive_name){
-				system "cp -r $archive_path $arch_dir/$hom_tool/$archive_name";
-			}
-			else{
-				print("\t$archive already exists in archive location $arch_dir/$hom_tool. Skipping...\n\n");
-			}
-			$archives{$archive_name} = $archive_path;
-		}
-		else{
-			print color 'yellow';
-			print("\t[W]  $archive is a $arch_tool archive and is not compatible with $hom_tool. Skipping...\n\n");
+	### Use previously used scrap results
+	if ($uniprot){
+		$start = time();
+		print LOG "\n\tStaging UniProt scrap started at ".localtime($start)."\n";
+		print "Utilizing previous UniProt scrap located at $uniprot...\n\n";
+		my $method = stage_data($uniprot,$uniprot_dir);
+		unless ($method){
+			print color 'red';
+			print "\n\n[E]  Could not stage previous UniProt scrap located at $uniprot...\n\n";
 			print color 'reset';
+			exit 1;
 		}
-
+		## Metadata store, lists and logs are written in place by the scraper
+		unshare_files($uniprot_dir);
+		$stop = time();
+		print LOG "\tUniProt scrap staging ($method) completed at ".localtime($stop)." (".duration($stop,$start).")\n";
 	}
+	### Perform UniProt scraping
+	elsif (@batch){
+		$start = time();
+		print LOG "\n\tUniProt scraps of ".scalar(@batch)." searches started at ".localtime($start)."\n";
+		## Each search is scraped into the same directory: files and accessions acquired for a
+		## previous search are not downloaded again. What belongs to each search is kept aside.
+		my %union;
+		foreach my $search (@batch){
+			my ($batch_name,$query) = @{$search};
+			print "\nStarting UniProt scrap for $batch_name...\n\n";
+			print LOG "\t\t$batch_name: $query\n";
+			## The metadata.log of the previous search would hide a failed scrap; its accessions are in the store
+			unlink("$uniprot_dir/metadata.log") if (-f "$uniprot_dir/metadata.sqlite");
+			## UniProt queries (fields, parentheses) are searched as given, like --custom
+			if ($query =~ /[:()]/){
+				scrape_uniprot(undef,$query);
+			}
+			else {
+				scrape_uniprot($query,undef);
+			}
 
-	$stop = time();
+			my $keyword_dir = "$batch_dir/$batch_name";
+			make_path($keyword_dir,{mode => 0755}) unless (-d $keyword_dir);
+			foreach my $file ("metadata.log","accessions.list","uniprot_scraper.log"){
+				system("cp $uniprot_dir/$file $keyword_dir/$file") == 0 or die "Can't copy $uniprot_dir/$file to $keyword_dir: $!\n" if (-f "$uniprot_dir/$file");
+			}
+			open META, "<", "$keyword_dir/metadata.log" or die "Can't read $keyword_dir/metadata.log: $!\n";
+			my $count = 0;
+			while (my $line = <META>){
+				if ($line =~ /^>(\S+)/){
+					$union{$1} = 1;
+					$count++;
+				}
+			}
+			close META;
+			print LOG "\t\t\t$count accessions\n";
+		}
 
-	print LOG "\tArchive copying completed at ".localtime($start)." (".duration($stop,$start).")\n";
-}
+		## Union of the searches, searched once by the following stages
+		open LIST, ">", "$uniprot_dir/accessions.list" or die "Can't write to $uniprot_dir/accessions.list: $!\n";
+		print LIST map { "$_\n" } sort(keys(%union));
+		close LIST;
+		run_step("Metadata union","","$metadata_store_script export \\
+				--db $uniprot_dir/metadata.sqlite \\
+				--log $uniprot_dir/metadata.log \\
+				--accessions $uniprot_dir/accessions.list
+		");
+		print LOG "\t\t".scalar(keys(%union))." accessions in total\n";
+
+		$stop = time();
+		print LOG "\tUniProt scraps completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+	}
+	else{
+		$start = time();
+		print LOG "\n\tUniProt scrap started at ".localtime($start)."\n";
+		print "\nStarting UniProt scrap...\n\n";
+		scrape_uniprot($go_keyword,$custom);
+		$stop = time();
+		print LOG "\tUniProt scrap completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+	}
+}, {
+	params => [
+		"uniprot=".($uniprot ? abs_path($uniprot) : ""),
+		"go_keyword=".($go_keyword // ""),
+		"method=@method",
+		"need_3D=".($need_3D ? 1 : 0),
+		"verified_only=".($verified_only ? 1 : 0),
+		"rest=".($rest ? 1 : 0),
+		"custom=".($custom // ""),
+		"pdb_mirror=".($pdb_mirror ? abs_path($pdb_mirror) : ""),
+		"af_mirror=".($af_mirror ? abs_path($af_mirror) : "")
+	],
+	tools => [$scraper_script,@batch ? $metadata_store_script : ()],
+	## A rebuilt offline index is a new source: the scrap is redone
+	inputs => [$uniprot ? $uniprot : (), $offline ? $offline : ()],
+	## Searches added to the batch list are scraped into the existing results
+	watch => [$batch_list ? $batch_list : ()],
+	outputs => [$uniprot_dir,@batch ? $batch_dir : ()]
+});
 
 ###################################################################################################
-## Creating 3D homology archives
+## Staging precompiled and creating 3D homology archives
 ###################################################################################################
 
-ARCHIVE_CREATION:
-if (@predictions){
+add_stage("archives", [], $threads, sub {
 
-	$start = time();
+	if(@staged_archives){
 
-	print LOG "\n\t$hom_tool archive creation started at ".localtime($start)."\n";
-	print "\nCreating archives...\n";
-	### Make FOLDSEEK archive from structure sets
-	if (uc($hom_tool) eq "FOLDSEEK"){
-		print "\tCreating archives for FoldSeek...\n";
-		for my $structure_set (@predictions){
-			my ($db_name) = $structure_set =~ /\/(\w+)\/*$/;
-			$archives{$db_name} = $arch_dir."/FOLDSEEK/".$db_name;
-			unless (-d $arch_dir."/FOLDSEEK/".$db_name){	
-				print "\tCreating archive for $db_name...\n";
-				system ("
-					$foldseek_script \\
-					  --create \\
-					  --db $arch_dir/FOLDSEEK/$db_name/$db_name \\
-					  --pdb $structure_set \\
-					  --threads $threads
-				");
+		$start = time();
+
+		print LOG "\n\tStaging archives started at ".localtime($start)."...\n";
+		
+		### Stage pre-existing archives in the new work enviroment
+		foreach my $staging (@staged_archives){
+			my ($archive,$archive_path,$archive_name,$staged) = @{$staging};
+			unless (archive_complete($staged,$hom_tool,$archive_name)){
+				## Remove leftovers from an interrupted staging
+				if (-e $staged){
+					remove_tree($staged);
+				}
+				my $method = stage_data($archive_path,$staged);
+				unless ($method && archive_complete($staged,$hom_tool,$archive_name)){
+					print color 'red';
+					print "\n\n[E]  Could not stage archive $archive to $staged...\n\n";
+					print color 'reset';
+					exit 1;
+				}
+				print LOG "\t\t$archive_name staged with $method\n";
 			}
 			else{
-				print "\tArchive for $db_name already exists at $arch_dir/FOLDSEEK/...\n";
+				print("\t$archive already exists in archive location $arch_dir/$hom_tool. Skipping...\n\n");
 			}
 		}
+
+		$stop = time();
+
+		print LOG "\tArchive staging completed at ".localtime($stop)." (".duration($stop,$start).")\n";
 	}
-	### Make GESAMT archive from structure sets
-	elsif (uc($hom_tool) eq "GESAMT"){
-		print "\tCreating archives for GESAMT...\n";
-		foreach my $structure_set (@predictions){
+
+	if (@predictions){
+
+		$start = time();
+
+		print LOG "\n\t$hom_tool archive creation started at ".localtime($start)."\n";
+		print "\nCreating archives...\n";
+		### Make FOLDSEEK/GESAMT archives from structure sets; existing archives are updated
+		### with the structures added, changed or removed since they were built (manifest.tsv)
+		my $tool = $hom_tool;
+		print "\tCreating archives for ".($tool eq "GESAMT" ? "GESAMT" : "FoldSeek")."...\n";
+		for my $structure_set (@predictions){
 			my ($db_name) = $structure_set =~ /\/(\w+)\/*$/;
-			$archives{$db_name} =  $arch_dir."/GESAMT/".$db_name;
-			unless (-d $arch_dir."/GESAMT/".$db_name){
+			my $arch_path = $archives{$db_name};
+			my $manifest_file = "$arch_path/manifest.tsv";
+			my $previous = read_manifest($manifest_file);
+			my $current = structure_manifest($structure_set,$previous);
+
+			unless (-d $arch_path){
 				print "\tCreating archive for $db_name...\n";
-				system ("
-					$gesamt_script \\
-					  -cpu $threads \\
-					  -make \\
-					  -arch $arch_dir/GESAMT/$db_name \\
-					  -pdb $structure_set
-				");
+				build_archive($tool,$db_name,$arch_path,$structure_set);
+				write_manifest($manifest_file,$current);
+				next;
 			}
-			else{
-				print "\tArchive for $db_name already exists at $arch_dir/GESAMT/...\n";
+
+			## Archives built before manifests existed are taken as up to date
+			unless ($previous){
+				print "\tArchive for $db_name already exists at $arch_dir/$tool/; recording its manifest...\n";
+				write_manifest($manifest_file,$current);
+				next;
 			}
-		}
-	}
-	else{
-		ASK:
-		print "\n\n[W] $hom_tool is not a valid homology tool!\n\n Please select either GESAMT or FoldSeek:\t";
-		chomp(my $selection = <STDIN>);
-		if (uc($selection) eq "GESAMT" || uc($selection) eq "FOLDSEEK"){
-			$hom_tool = $selection;
-			goto ARCHIVE_CREATION;
-		}
-		else{
-			goto ASK;
-		}
-	}
 
-	$stop = time();
+			my (@added,@changed,@removed);
+			foreach my $file (sort(keys(%{$current}))){
+				if (!exists $previous->{$file}){
+					push(@added,$file);
+				}
+				elsif ($previous->{$file}[2] ne $current->{$file}[2]){
+					push(@changed,$file);
+				}
+			}
+			@removed = grep { !exists $current->{$_} } sort(keys(%{$previous}));
+
+			unless (@added || @changed || @removed){
+				print "\tArchive for $db_name already exists at $arch_dir/$tool/ and is up to date...\n";
+				next;
+			}
 
-	print LOG "\t$hom_tool archive creation completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+			print "\tUpdating archive for $db_name: ".scalar(@added)." added, ".scalar(@changed)." changed, ".scalar(@removed)." removed...\n";
+			print LOG "\t\t$db_name: ".scalar(@added)." structures added, ".scalar(@changed)." changed, ".scalar(@removed)." removed\n";
 
-}
+			## Only additions can be appended to an archive; anything else needs a rebuild
+			if (@changed || @removed){
+				remove_tree($arch_path);
+				build_archive($tool,$db_name,$arch_path,$structure_set);
+			}
+			else {
+				my $delta_dir = "$arch_path/delta";
+				remove_tree($delta_dir) if (-d $delta_dir);
+				make_path($delta_dir,{mode => 0755});
+				foreach my $file (@added){
+					symlink(abs_path("$structure_set/$file"),"$delta_dir/$file") or die "Can't link $structure_set/$file: $!\n";
+				}
+				if ($tool eq "GESAMT"){
+					## gesamt --update-archive rewrites the archive files in place
+					unshare_files($arch_path);
+					system (traced("run_GESAMT.pl",$db_name,"
+						$gesamt_script \\
+						  -cpu $threads \\
+						  -update \\
+						  -arch $arch_path \\
+						  -pdb $delta_dir
+					"));
+				}
+				else {
+					system (traced("run_foldseek.pl",$db_name,"
+						$foldseek_script \\
+						  --update \\
+						  --db $arch_path/$db_name \\
+						  --pdb $delta_dir \\
+						  --threads $threads
+					"));
+				}
+				remove_tree($delta_dir);
+				check_archive($tool,$db_name,$arch_path);
+			}
+			write_manifest($manifest_file,$current);
+
+			invalidate_results($tool,$db_name,[@added,@changed],[@changed,@removed]);
+		}
+
+		$stop = time();
+
+		print LOG "\t$hom_tool archive creation completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+	}
+}, {
+	## Structure sets are compared to the archive manifests by the stage itself
+	params => ["hom_tool=$hom_tool"],
+	tools => [$hom_tool eq "GESAMT" ? ($gesamt_script,"gesamt") : ($foldseek_script,"foldseek")],
+	archives => [map { $_->[1] } @staged_archives],
+	watch => [@predictions],
+	outputs => ["$arch_dir/$hom_tool"]
+});
 
 ###################################################################################################
 ## Extract PDB amino acid sequences
 ###################################################################################################
-unless (@prot_fasta){
-	$start = time();
-	print LOG "\n\tProtein sequence extraction started at ".localtime($start)."\n";
-	print "\nExtracting protein sequences from PDB files...\n";
-	foreach my $structure_set (@predictions){
-		system "
+
+add_stage("extract", [], @prot_fasta ? 1 : $threads, sub {
+	unless (@prot_fasta){
+		$start = time();
+		print LOG "\n\tProtein sequence extraction started at ".localtime($start)."\n";
+		print "\nExtracting protein sequences from PDB files...\n";
+		## One indexed multi-FASTA for all structure sets; unchanged structures are not read again
+		run_step("Protein sequence extraction","proteins.faa","
 			$extract_script \\
-			  --pdb $structure_set/*.pdb* \\
-			  --out $seq_hom_dir/FASTA
-		";
+			  --dirs @predictions \\
+			  --fasta $seq_hom_dir/proteins.faa \\
+			  --threads $threads
+		");
+		$stop = time();
+		print LOG "\tProtein sequence extraction completed at ".localtime($stop)." (".duration($stop,$start).")\n";
 	}
-	system "cat $seq_hom_dir/FASTA/*.faa > $seq_hom_dir/proteins.faa";
-	$stop = time();
-	print LOG "\tProtein sequence extraction completed at ".localtime($stop)." (".duration($stop,$start).")\n";
-}
-else{
-	print LOG "\n\tProtein fastas provided. Skipping extraction...\n";
-	foreach my $fasta (@prot_fasta){
-		system "cat $fasta >> $seq_hom_dir/proteins.faa";
+	else{
+		print LOG "\n\tProtein fastas provided. Skipping extraction...\n";
+		run_step("Protein sequence staging","proteins.faa","cat @prot_fasta > $seq_hom_dir/proteins.faa");
 	}
-}
+}, {
+	tools => [@prot_fasta ? () : $extract_script],
+	inputs => [@prot_fasta],
+	## Structure sets are watched rather than inputs, so their extraction state is kept
+	watch => [@prot_fasta ? () : @predictions],
+	outputs => ["$seq_hom_dir/proteins.faa",@prot_fasta ? () : ("$seq_hom_dir/proteins.faa.fai","$seq_hom_dir/proteins.faa.state")]
+});
 
 ###################################################################################################
 ## Perform sequence homology searches
 ###################################################################################################
 
-unless (-f "$seq_hom_dir/All_sequence_results.tsv"){
+add_stage("sequence_search", ["uniprot","extract"], $threads, sub {
+	## Accessions with results from previous runs are not searched again
 	$start = time();
 	print LOG "\n\tSequence homology searches started at ".localtime($start)."\n";
 	print "\nPerforming sequence homology searches...\n";
-	system "
+	run_step("Sequence homology search","","
 		$seq_hom_script \\
 		--faa $seq_hom_dir/proteins.faa \\
 		--uni $fasta_dir \\
 		--threads $threads \\
 		--eval $seq_eval \\
-		--outdir $seq_hom_dir
-	";
+		--outdir $seq_hom_dir \\
+		--batch
+	");
 	$stop = time();
 	print LOG "\tSequence homology searches completed at ".localtime($stop)."( ".duration($stop,$start).")\n";
-}
-else{
-	print LOG "\n\tSequence homology searches performed previously. Skipping search...\n";
-}
+}, {
+	params => ["eval=$seq_eval"],
+	tools => [$seq_hom_script,"diamond"],
+	inputs => ["$seq_hom_dir/proteins.faa"],
+	items => [$fasta_dir, sub {
+		my ($accession) = $_[0] =~ /(\w+)\.fasta$/;
+		return $accession ? ("$seq_hom_dir/RESULTS/$accession.diamond.6") : ();
+	}],
+	outputs => ["$seq_hom_dir/RESULTS","$seq_hom_dir/DB.dmnd","$seq_hom_dir/All_sequence_results.tsv"]
+});
 
 ###################################################################################################
 ## Perform 3D homology searches
 ###################################################################################################
 
-my @results;
-
-if (scalar(keys(%archives))>0){
-	$start = time();
-	print LOG "\n\t3D homology searches with $hom_tool started at ".localtime($start)."\n";
-	for my $arch (keys(%archives)){
-		print "\nPerforming 3D homology searches on $arch archive with ";
-		my $arch_path = $archives{$arch};
-		if (uc($hom_tool) eq "FOLDSEEK"){
-			print "FoldSeek...\n";
-			system ("
-				$foldseek_script \\
-				--query \\
-				--db $arch_path/$arch \\
-				--input $pdb_dir/*\.pdb* \\
-				--outdir $struct_res_dir/FOLDSEEK/$arch \\
-				--gzip
-			");
-
-		}
-		elsif (uc($hom_tool) eq "GESAMT"){
-			print "GESAMT...\n";
-			system ("
-				$gesamt_script \\
-					--cpu $threads \\
+add_stage("structure_search", ["uniprot","archives"], $threads, sub {
+	if (scalar(keys(%archives))>0){
+		$start = time();
+		print LOG "\n\t3D homology searches with $hom_tool started at ".localtime($start)."\n";
+		for my $arch (keys(%archives)){
+			print "\nPerforming 3D homology searches on $arch archive with ";
+			my $arch_path = $archives{$arch};
+			if ($hom_tool eq "FOLDSEEK"){
+				print "FoldSeek...\n";
+				run_step("FoldSeek search on $arch",$arch,"
+					$foldseek_script \\
 					--query \\
-					--arch $arch \\
+					--db $arch_path/$arch \\
 					--input $pdb_dir/*\.pdb* \\
-					--outdir $struct_res_dir/GESAMT/$arch \\
-					--gzip \\
-					-mode normal
-			");
+					--outdir $struct_res_dir/FOLDSEEK/$arch \\
+					--threads $threads \\
+					--batch \\
+					--gzip
+				");
+
+			}
+			elsif ($hom_tool eq "GESAMT"){
+				print "GESAMT...\n";
+				## GESAMT gains little past a few threads per query; run several queries at once instead
+				my $gesamt_jobs = int($threads/4);
+				$gesamt_jobs = 1 if ($gesamt_jobs < 1);
+				run_step("GESAMT search on $arch",$arch,"
+					$gesamt_script \\
+						--cpu $threads \\
+						--jobs $gesamt_jobs \\
+						--query \\
+						--arch $arch_path \\
+						--input $pdb_dir/*\.pdb* \\
+						--outdir $struct_res_dir/GESAMT/$arch \\
+						--gzip \\
+						-mode normal
+				");
+			}
 		}
+		$stop = time();
+		print LOG "\t3D homology searches completed at ".localtime($stop)." (".duration($stop,$start).")\n";
 	}
-	$stop = time();
-	print LOG "\t3D homology searches completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+}, {
+	## Archives updated in place invalidate their own results (see invalidate_results)
+	params => ["hom_tool=$hom_tool"],
+	tools => [$hom_tool eq "GESAMT" ? ($gesamt_script,"gesamt") : ($foldseek_script,"foldseek")],
+	archives => [map { $_->[3] } @staged_archives],
+	watch => [map { "$archives{$_}/manifest.tsv" } sort(keys(%archives))],
+	items => [$pdb_dir, sub {
+		my ($query) = $_[0] =~ /(\w+)\.pdb(?:\.gz)?$/;
+		return unless ($query);
+		if ($hom_tool eq "GESAMT"){
+			(my $pdb = $_[0]) =~ s/\.pdb(?:\.gz)?$//;
+			return glob("$struct_res_dir/GESAMT/*/$pdb.*.gesamt*");
+		}
+		return (glob("$struct_res_dir/FOLDSEEK/*/$query.fseek*"),glob("$struct_res_dir/FOLDSEEK_w_MICAN/*/${query}_w_tmscore.fseek*"));
+	}],
+	outputs => ["$struct_res_dir/$hom_tool",$hom_tool eq "FOLDSEEK" ? "$struct_res_dir/FOLDSEEK_w_MICAN" : ()]
+});
+
+my $structure_stage = "structure_search";
+
+if ($hom_tool eq "FOLDSEEK"){
+	$structure_stage = "tmscore";
+	add_stage("tmscore", ["structure_search"], $threads, sub {
+		$start = time();
+		print LOG "\n\tTMscore calculation started at ".localtime($start)."\n";
+		print "\nCalculating TMscores for FoldSeek results with ".(lc($tm_backend) eq "numpy" ? "the NumPy engine" : "MICAN")."...\n";
+		## Scores computed by previous runs are kept next to the download cache
+		my $score_flags = "";
+		if($cache){
+			$score_flags = "--score_cache $cache/scores.sqlite";
+		}
+		my $pack_flag = $pack ? "--pack" : "";
+		my $cascade_flags = "--cascade $cascade";
+		$cascade_flags .= " --cascade_bits $cascade_bits" if (defined $cascade_bits);
+		run_step("TMscore calculation","","
+			$mican_script \\
+				--results_dir $struct_res_dir \\
+				--uniprot_pdb $pdb_dir \\
+				--threads $threads \\
+				--backend $tm_backend \\
+				$pack_flag \\
+				$cascade_flags \\
+				$score_flags \\
+				--predict_dir @predictions
+		");
+		$stop = time();
+		print LOG "\tTMscore calculation completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+	}, {
+		params => ["tm_backend=".lc($tm_backend),"cascade=$cascade","cascade_bits=".($cascade_bits // ""),"pack=".($pack ? 1 : 0)],
+		tools => [$mican_script,$pack ? $pipeline_dir."/structure_pack.py" : (),lc($tm_backend) eq "numpy" ? $pipeline_dir."/tmscore_engine.py" : "mican"],
+		watch => ["$struct_res_dir/FOLDSEEK"],
+		## Structure packs (STRUCTURE_HOMOLOGY/RESULTS/PACKS) update themselves and are kept
+		outputs => ["$struct_res_dir/FOLDSEEK_w_MICAN"]
+	});
 }
 
-if (uc($hom_tool) eq "FOLDSEEK"){
+###################################################################################################
+## Parse 3D Homology Results
+###################################################################################################
+
+add_stage("parse", [$structure_stage], 1, sub {
+	$start = time();
+	print LOG "\n\tParsing 3D homology results started at ".localtime($start)."\n";
+	print "\nParsing 3D homology results...\n";
+	run_step("Parsing of 3D homology results","","$parser_script \\
+			--gesamt $struct_res_dir/GESAMT \\
+			--foldseek $struct_res_dir/FOLDSEEK_w_MICAN \\
+			--qscore $qscore \\
+			--tm $fs_tm \\
+			--outdir $results_dir
+	");
+	$stop = time();
+	print LOG "\tParsing 3D homology results completed at ".localtime($stop)."( ".duration($stop,$start).")\n";
+}, {
+	params => ["qscore=$qscore","tmscore=$fs_tm"],
+	tools => [$parser_script],
+	inputs => ["$struct_res_dir/GESAMT","$struct_res_dir/FOLDSEEK_w_MICAN"],
+	outputs => ["$results_dir/FoldSeek_parsed_results.matches","$results_dir/GESAMT_parsed_results.matches"]
+});
+
+###################################################################################################
+## Compiling results and adding metadata
+###################################################################################################
+
+add_stage("compile", ["parse","sequence_search"], 1, sub {
 	$start = time();
-	print LOG "\n\tTMscore calculation started at ".localtime($start)."\n";
-	print "\nCalculating TMscores for FoldSeek results with MICAN...\n";
-	system ("
-		$mican_script \\
-			--results_dir $struct_res_dir \\
-			--uniprot_pdb $pdb_dir \\
-			--predict_dir @predictions
+	print LOG "\n\tCompiling results started at ".localtime($start)."...\n";
+	print "\nCompiling all evidences and adding metadata...\n";
+	my $annot_flag = $annot_file ? "--annot $annot_file" : "";
+	run_step("Result compilation","","$metadata_script \\
+			  --metadata $uniprot_dir/metadata.log \\
+			  --foldseek $results_dir/FoldSeek_parsed_results.matches \\
+			  --gesamt $results_dir/GESAMT_parsed_results.matches \\
+			  --seqnc $seq_hom_dir/All_sequence_results.tsv \\
+			  $annot_flag \\
+			  --outfile $results_dir
 	");
 	$stop = time();
-	print LOG "\tTMscore calculation completed at ".localtime($stop)." (".duration($stop,$start).")\n";
+	print LOG ("\tResult compilation completed on ".localtime($stop)." (".duration($stop,$start).")\n");
+}, {
+	tools => [$metadata_script],
+	inputs => [
+		"$uniprot_dir/metadata.log",
+		"$results_dir/FoldSeek_parsed_results.matches",
+		"$results_dir/GESAMT_parsed_results.matches",
+		"$seq_hom_dir/All_sequence_results.tsv",
+		$annot_file ? $annot_file : ()
+	],
+	outputs => ["$results_dir/compiled_results.tsv"]
+});
+
+###################################################################################################
+## Compiling results of each search of a batch list
+###################################################################################################
+
+if (@batch){
+	add_stage("fan_out", ["compile"], 1, sub {
+		$start = time();
+		print LOG "\n\tCompiling results of ".scalar(@batch)." searches started at ".localtime($start)."...\n";
+		print "\nCompiling results of each search...\n";
+		## Results of the shared searches are restricted to the accessions of each search by its metadata
+		my $annot_flag = $annot_file ? "--annot $annot_file" : "";
+		foreach my $search (@batch){
+			my ($batch_name) = @{$search};
+			run_step("Result compilation of $batch_name",$batch_name,"$metadata_script \\
+					  --metadata $batch_dir/$batch_name/metadata.log \\
+					  --foldseek $results_dir/FoldSeek_parsed_results.matches \\
+					  --gesamt $results_dir/GESAMT_parsed_results.matches \\
+					  --seqnc $seq_hom_dir/All_sequence_results.tsv \\
+					  $annot_flag \\
+					  --outfile $batch_dir/$batch_name/RESULTS
+			");
+		}
+		$stop = time();
+		print LOG ("\tResult compilation of the searches completed on ".localtime($stop)." (".duration($stop,$start).")\n");
+	}, {
+		params => ["batch=".join(",",map { $_->[0] } @batch)],
+		tools => [$metadata_script],
+		inputs => [
+			(map { "$batch_dir/$_->[0]/metadata.log" } @batch),
+			"$results_dir/FoldSeek_parsed_results.matches",
+			"$results_dir/GESAMT_parsed_results.matches",
+			"$seq_hom_dir/All_sequence_results.tsv",
+			$annot_file ? $annot_file : ()
+		],
+		outputs => [map { "$batch_dir/$_->[0]/RESULTS" } @batch]
+	});
 }
 
 ###################################################################################################
-## Parse 3D Homology Results
+## Columnar results store
 ###################################################################################################
 
-$start = time();
-print LOG "\n\tParsing 3D homology results started at ".localtime($start)."\n";
-print "\nParsing 3D homology results...\n";
-system "$parser_script \\
-		--gesamt $struct_res_dir/GESAMT \\
-		--foldseek $struct_res_dir/FOLDSEEK_w_MICAN \\
-		--qscore $qscore \\
-		--tm $fs_tm \\
-		--outdir $results_dir
-";
-$stop = time();
-print LOG "\tParsing 3D homology results completed at ".localtime($stop)."( ".duration($stop,$start).")\n";
+add_stage("store", ["compile"], 1, sub {
+	$start = time();
+	print LOG "\n\tBuilding results store started at ".localtime($start)."...\n";
+	print "\nBuilding columnar results store...\n";
+	run_step("Results store","","$store_script build \\
+			  --outdir $results_dir/results_store \\
+			  --sequence $seq_hom_dir/All_sequence_results.tsv \\
+			  --foldseek $results_dir/FoldSeek_parsed_results.matches \\
+			  --gesamt $results_dir/GESAMT_parsed_results.matches \\
+			  --compiled $results_dir/compiled_results.tsv
+	");
+	$stop = time();
+	print LOG ("\tResults store completed on ".localtime($stop)." (".duration($stop,$start).")\n");
+}, {
+	tools => [$store_script],
+	inputs => [
+		"$seq_hom_dir/All_sequence_results.tsv",
+		"$results_dir/FoldSeek_parsed_results.matches",
+		"$results_dir/GESAMT_parsed_results.matches",
+		"$results_dir/compiled_results.tsv"
+	],
+	outputs => ["$results_dir/results_store"]
+});
 
 ###################################################################################################
-## Compiling results and adding metadata
+## Running the stages
 ###################################################################################################
 
-$start = time();
-print LOG "\n\tCompiling results started at ".localtime($start)."...\n";
-print "\nCompiling all evidences and adding metadata...\n";
-system "$metadata_script \\
-		  --metadata $uniprot_dir/metadata.log \\
-		  --foldseek $results_dir/FoldSeek_parsed_results.matches \\
-		  --gesamt $results_dir/GESAMT_parsed_results.matches \\
-		  --seqnc $seq_hom_dir/All_sequence_results.tsv \\
-		  --annot $annot_file \\
-		  --outfile $results_dir
-";
-$stop = time();
-print LOG ("\tResult compilation completed on ".localtime($stop)." (".duration($stop,$start).")\n");
+foreach my $stage_name (@rerun){
+	unless (grep { $_->{name} eq $stage_name } @stages){
+		print color 'red';
+		print "\n\n[E]  Unknown stage $stage_name for --rerun; stages are: ".join(", ",map { $_->{name} } @stages)."\n\n";
+		print color 'reset';
+		exit 1;
+	}
+}
+
+unless (run_stages($threads)){
+	print color 'red';
+	print "\n\n[E]  QueGO stopped after a failed stage; see $outdir/run_QueGO.log\n\n";
+	print color 'reset';
+	exit 1;
+}
 
 ###################################################################################################
 ## End of Script
@@ -524,9 +924,718 @@ print color 'reset';
 my $master_stop = time();
 print LOG ("\n$0 completed on ".localtime($master_stop)." (".duration($master_stop,$master_start).")\n");
 
+if ($trace){
+	system "$trace_script export --input $ENV{QUEGO_TRACE} --out $outdir/trace.json";
+	system "$trace_script summary --input $ENV{QUEGO_TRACE} > $outdir/trace_summary.txt";
+	print LOG ("Trace of the run in $ENV{QUEGO_TRACE}; summary in $outdir/trace_summary.txt\n");
+}
+
 ###################################################################################################
 ## Subroutines
 
+sub add_stage {
+
+	## Stage name, stages it depends on, CPUs it can use, the code running it and what its
+	## fingerprint is made of (see run_stage)
+	my ($stage_name,$depends,$cpus,$code,$track) = @_;
+	push(@stages,{ name => $stage_name, depends => $depends, cpus => $cpus, code => $code, track => $track });
+}
+
+sub run_stages {
+
+	## Runs each stage in its own process once the stages it depends on are done. Ready stages
+	## split the free CPUs (small stages first) and see their share as \$threads.
+	my ($budget) = @_;
+	my @pending = @stages;
+	my %done;
+	my %running;
+	my $free = $budget;
+	my $failed;
+	my %started;
+
+	while (@pending || %running){
+
+		unless ($failed){
+			my @ready = sort { $a->{cpus} <=> $b->{cpus} } grep { my $stage = $_; !grep { !$done{$_} } @{$stage->{depends}} } @pending;
+			while (@ready && (($free > 0) || !%running)){
+				my $stage = shift(@ready);
+				my $cpus = int($free/(scalar(@ready)+1));
+				$cpus = $stage->{cpus} if ($cpus > $stage->{cpus});
+				$cpus = 1 if ($cpus < 1);
+				$free -= $cpus;
+				@pending = grep { $_ != $stage } @pending;
+
+				print LOG "\n\tStage $stage->{name} started with $cpus CPU(s) at ".localtime(time())."\n";
+				my $pid = fork();
+				die "Unable to fork: $!\n" unless (defined $pid);
+				if ($pid == 0){
+					$threads = $cpus;
+					$ENV{QUEGO_STAGE} = $stage->{name};
+					run_stage($stage);
+					exit 0;
+				}
+				$running{$pid} = [$stage,$cpus];
+				$started{$pid} = Time::HiRes::time();
+			}
+		}
+
+		last unless (%running);
+
+		## Stages are reaped one at a time, so the change in CPU time of the children is theirs
+		my ($cpu_user,$cpu_sys) = (times())[2,3];
+		my $pid = wait();
+		my $status = $?;
+		next unless ($running{$pid});
+		my ($stage,$cpus) = @{delete $running{$pid}};
+		$free += $cpus;
+		my ($user,$sys) = (times())[2,3];
+		my $end = Time::HiRes::time();
+		trace_event({
+			type => "stage",
+			stage => $stage->{name},
+			start => $started{$pid},
+			end => $end,
+			wall => $end - $started{$pid},
+			user => $user - $cpu_user,
+			sys => $sys - $cpu_sys,
+			max_rss_kb => undef,
+			cpus => $cpus,
+			status => $status >> 8,
+			pid => $pid,
+			ppid => $$
+		});
+		if ($status == 0){
+			$done{$stage->{name}} = 1;
+		}
+		else {
+			$failed = $stage->{name};
+			print LOG "\n\t[E]  Stage $stage->{name} failed (exit status ".($status >> 8)."); waiting for running stages\n";
+			## Stages that have not started are dropped
+			@pending = ();
+		}
+	}
+
+	return $failed ? 0 : 1;
+}
+
+sub run_stage {
+
+	## Runs a stage unless its fingerprint matches the one recorded when it last completed.
+	## A fingerprint covers:
+	##   params, tools	settings; tools are our scripts (by content) or executables in $PATH
+	##   inputs		files/directories (by content); a change invalidates all outputs
+	##   archives		archive directories, too large to checksum: by their manifest.tsv when
+	##			they have one, otherwise by the size and modification time of their files;
+	##			a change invalidates all outputs
+	##   watch		files/directories (by content); a change reruns the stage, which keeps
+	##			what is still valid on its own (i.e., archives updated from their manifests)
+	##   items		directory of per-item inputs and a sub listing the outputs of an item;
+	##			outputs of changed or removed items are deleted before the stage runs
+	##   outputs		what the stage produces; removed when settings or inputs change
+	## A .running marker left behind by an interrupted or failed run forces the stage to run again.
+	my ($stage) = @_;
+	my $track = $stage->{track};
+	my $stage_name = $stage->{name};
+
+	unless ($track){
+		$stage->{code}->();
+		return;
+	}
+
+	my $base = "$fingerprint_dir/$stage_name";
+	my $record = read_fingerprint("$base.done");
+	my $interrupted = -e "$base.running";
+
+	my $previous_files = read_manifest("$base.files");
+	my $files = path_manifest([@{$track->{inputs} || []},@{$track->{watch} || []}],$previous_files);
+	archive_manifest($track->{archives},$previous_files,$files);
+	my %fingerprint = (
+		settings => settings_digest($track),
+		inputs => manifest_digest($files,[@{$track->{inputs} || []},@{$track->{archives} || []}]),
+		watch => manifest_digest($files,$track->{watch})
+	);
+
+	my ($item_dir,$item_outputs) = @{$track->{items} || []};
+	my $previous_items = read_manifest("$base.items");
+	my $items = (defined($item_dir) && -d $item_dir) ? structure_manifest($item_dir,$previous_items) : {};
+
+	my $reason;
+	my $clear;
+	if (grep { $_ eq $stage_name } @rerun){
+		($reason,$clear) = ("rerun requested",1);
+	}
+	elsif ($interrupted){
+		$reason = "previous run was interrupted";
+	}
+	elsif (!$record){
+		$reason = "no fingerprint recorded";
+	}
+	elsif ($record->{settings} ne $fingerprint{settings}){
+		($reason,$clear) = ("parameters or tools changed",1);
+	}
+	elsif ($record->{inputs} ne $fingerprint{inputs}){
+		($reason,$clear) = ("inputs changed",1);
+	}
+	elsif ($record->{watch} ne $fingerprint{watch}){
+		$reason = "inputs changed";
+	}
+	elsif (my @missing = grep { !-e $_ } @{$track->{outputs} || []}){
+		$reason = "outputs missing (".join(", ",@missing).")";
+	}
+
+	## Items are compared to those seen by the last completed run
+	my @stale;
+	if ($item_outputs && $previous_items && !$clear){
+		foreach my $item (sort(keys(%{$previous_items}))){
+			unless ($items->{$item} && ($items->{$item}[2] eq $previous_items->{$item}[2])){
+				push(@stale,$item);
+			}
+		}
+		my $added = grep { !$previous_items->{$_} } keys(%{$items});
+		if ((@stale || $added) && !$reason){
+			$reason = scalar(@stale)." item(s) changed or removed, $added added";
+		}
+	}
+
+	unless ($reason){
+		print "\nStage $stage_name is up to date. Skipping...\n";
+		print LOG "\n\tStage $stage_name is up to date (fingerprint unchanged). Skipping...\n";
+		return;
+	}
+
+	print LOG "\n\tStage $stage_name runs: $reason\n";
+
+	open RUN, ">", "$base.running" or die "Can't write to $base.running: $!\n";
+	print RUN "started\t".time()."\n";
+	close RUN;
+
+	if ($clear){
+		print LOG "\t\tRemoving previous outputs of $stage_name\n";
+		foreach my $output (@{$track->{outputs} || []}){
+			if (-d $output){ remove_tree($output); }
+			elsif (-e $output){ unlink($output); }
+		}
+		foreach my $dir (@dirs){
+			make_path($dir,{mode => 0755}) unless (-d $dir);
+		}
+	}
+	else {
+		## Partial files left by an interrupted run (written under .tmp/.part names until complete)
+		clear_partial(@{$track->{outputs} || []}) if ($interrupted);
+		if (@stale){
+			print LOG "\t\tRemoving outputs of ".scalar(@stale)." changed or removed item(s)\n";
+			foreach my $item (@stale){
+				unlink($item_outputs->($item));
+			}
+		}
+	}
+
+	$stage->{code}->();
+
+	write_manifest("$base.files",$files);
+	write_manifest("$base.items",$items) if ($item_outputs);
+	open DONE, ">", "$base.done.tmp" or die "Can't write to $base.done.tmp: $!\n";
+	foreach my $key (sort(keys(%fingerprint))){
+		print DONE "$key\t$fingerprint{$key}\n";
+	}
+	print DONE "completed\t".time()."\n";
+	close DONE;
+	rename("$base.done.tmp","$base.done") or die "Can't rename $base.done.tmp: $!\n";
+	unlink("$base.running");
+}
+
+sub run_step {
+
+	## A failed command fails its stage, so the stage is not recorded as done
+	my ($label,$item,$command) = @_;
+
+	my ($tool) = $command =~ /^\s*(\S+)/;
+	system(traced(basename($tool),$item,$command));
+	return if ($? == 0);
+
+	print color 'red';
+	print "\n\n[E]  $label failed (exit status ".($? >> 8).")...\n\n";
+	print color 'reset';
+	exit 1;
+}
+
+sub trace_event {
+
+	## Events recorded by this script (i.e., stages); one line per event, as quego_trace.py does
+	my ($event) = @_;
+	return unless ($ENV{QUEGO_TRACE});
+
+	open my $fh, ">>", $ENV{QUEGO_TRACE} or die "Can't write to $ENV{QUEGO_TRACE}: $!\n";
+	print $fh JSON::PP->new->canonical->encode($event)."\n";
+	close $fh;
+}
+
+sub read_fingerprint {
+
+	my ($file) = @_;
+	return unless (-f $file);
+
+	my %fingerprint;
+	open FP, "<", $file or die "Can't read $file: $!\n";
+	while (my $line = <FP>){
+		chomp($line);
+		my ($key,$value) = split("\t",$line);
+		$fingerprint{$key} = $value if (defined($value));
+	}
+	close FP;
+
+	return \%fingerprint;
+}
+
+sub settings_digest {
+
+	my ($track) = @_;
+	my $md5 = Digest::MD5->new;
+
+	$md5->add("param\t$_\n") foreach (@{$track->{params} || []});
+	foreach my $tool (@{$track->{tools} || []}){
+		$md5->add("tool\t".tool_signature($tool)."\n");
+	}
+
+	return $md5->hexdigest;
+}
+
+sub tool_signature {
+
+	## Scripts are identified by their content; executables found in \$PATH by their size and
+	## modification time, which change when they are upgraded
+	my ($tool) = @_;
+
+	if (-f $tool){
+		open my $fh, "<", $tool or die "Can't read $tool: $!\n";
+		binmode($fh);
+		my $md5 = Digest::MD5->new->addfile($fh)->hexdigest;
+		close $fh;
+		return basename($tool)."\t$md5";
+	}
+
+	foreach my $dir (split(":",$ENV{PATH} // "")){
+		if (-f "$dir/$tool" && -x "$dir/$tool"){
+			my ($size,$mtime) = (stat("$dir/$tool"))[7,9];
+			return "$tool\t$dir\t$size\t$mtime";
+		}
+	}
+
+	return "$tool\tmissing";
+}
+
+sub path_manifest {
+
+	## Size, modification time and MD5 of each file under the given paths; like
+	## structure_manifest, unchanged files keep their previous checksum
+	my ($paths,$previous) = @_;
+	my %manifest;
+
+	foreach my $path (@{$paths}){
+		unless (-e $path){
+			$manifest{$path} = [0,0,"missing"];
+			next;
+		}
+		## Files are recorded under the path given; File::Find names them by their absolute path
+		if (-f $path){
+			$manifest{$path} = file_entry($path,$previous ? $previous->{$path} : undef);
+			next;
+		}
+		find({ wanted => sub {
+			my $file = $File::Find::name;
+			return unless (-f $file);
+			$manifest{$file} = file_entry($file,$previous ? $previous->{$file} : undef);
+		}, follow_fast => 1, no_chdir => 1}, $path);
+	}
+
+	return \%manifest;
+}
+
+sub archive_manifest {
+
+	## Adds the archives to a path manifest without reading their content: the manifest.tsv
+	## of an archive built by QueGO lists its structures; other archives are stamped by the
+	## size and modification time of their files
+	my ($archives,$previous,$manifest) = @_;
+
+	foreach my $archive (@{$archives || []}){
+		if (-f "$archive/manifest.tsv"){
+			$manifest->{"$archive/manifest.tsv"} = file_entry("$archive/manifest.tsv",$previous ? $previous->{"$archive/manifest.tsv"} : undef);
+			next;
+		}
+		unless (-d $archive){
+			$manifest->{$archive} = [0,0,"missing"];
+			next;
+		}
+		find({ wanted => sub {
+			my $file = $File::Find::name;
+			return unless (-f $file);
+			my ($size,$mtime) = (stat($file))[7,9];
+			$manifest->{$file} = [$size,$mtime,"$size:$mtime"];
+		}, follow_fast => 1, no_chdir => 1}, $archive);
+	}
+
+	return $manifest;
+}
+
+sub manifest_digest {
+
+	## Digest of the content of the files under the given paths, ignoring modification times
+	my ($manifest,$paths) = @_;
+	my $md5 = Digest::MD5->new;
+
+	foreach my $path (@{$paths || []}){
+		foreach my $file (sort(grep { ($_ eq $path) || (index($_,"$path/") == 0) } keys(%{$manifest}))){
+			$md5->add(substr($file,length($path))."\t$manifest->{$file}[2]\n");
+		}
+		$md5->add("\n");
+	}
+
+	return $md5->hexdigest;
+}
+
+sub file_entry {
+
+	my ($file,$previous) = @_;
+
+	my ($size,$mtime) = (stat($file))[7,9];
+	if ($previous && ($previous->[0] == $size) && ($previous->[1] == $mtime)){
+		return [$size,$mtime,$previous->[2]];
+	}
+	open my $fh, "<", $file or die "Can't read $file: $!\n";
+	binmode($fh);
+	my $md5 = Digest::MD5->new->addfile($fh)->hexdigest;
+	close $fh;
+
+	return [$size,$mtime,$md5];
+}
+
+sub clear_partial {
+
+	my @paths = grep { -d $_ } @_;
+	return unless (@paths);
+
+	my @partial;
+	find({ wanted => sub { push(@partial,$File::Find::name) if (-f $_ && /\.(?:tmp|part)$/); } }, @paths);
+	if (@partial){
+		print LOG "\t\tRemoving ".scalar(@partial)." partial file(s) left by the interrupted run\n";
+		unlink(@partial);
+	}
+}
+
+sub stage_data {
+
+	## Make the content of a previous scrap/archive available without duplicating it:
+	## hard links, then reflinks (copy-on-write filesystems), then symbolic links, then a copy;
+	## files updated in place are copied afterwards (unshare_files)
+	my ($source,$target) = @_;
+
+	$source = abs_path($source);
+	make_path($target,{mode => 0755}) unless (-d $target);
+
+	my @methods = (
+		["hard links", "cp -al $source/. $target/"],
+		["reflinks", "cp -r --reflink=always $source/. $target/"],
+		["symbolic links", "cp -rs $source/. $target/"],
+		["copy", "cp -r $source/. $target/"],
+	);
+
+	foreach my $method (@methods){
+		my ($label,$command) = @{$method};
+		if (system("$command 2>/dev/null") == 0 && same_content($source,$target)){
+			return $label;
+		}
+		## Clear partial results before trying the next method
+		remove_tree($target,{keep_root => 1});
+	}
+
+	return;
+}
+
+sub unshare_files {
+
+	## Staged files that are hard or symbolic links to their source are replaced by copies,
+	## so files written in place do not also rewrite the previous scrap/archive
+	my ($dir) = @_;
+
+	opendir(my $dh,$dir) or die "Can't access $dir: $!\n";
+	foreach my $item (sort(readdir($dh))){
+		my $file = "$dir/$item";
+		next unless (-f $file);
+		next unless ((-l $file) || ((stat($file))[3] > 1));
+		system("cp -pL $file $file.unshare.tmp") == 0 or die "Can't copy $file: $!\n";
+		rename("$file.unshare.tmp",$file) or die "Can't replace $file: $!\n";
+	}
+	closedir($dh);
+}
+
+sub same_content {
+
+	## Compare relative paths and sizes of all files in both trees
+	my ($source,$target) = @_;
+	my %files;
+
+	find({ wanted => sub { $files{substr($File::Find::name,length($source))} = -s $_ if -f $_; }, follow_fast => 1}, $source);
+
+	my $count = 0;
+	my $complete = 1;
+	find({ wanted => sub {
+		if (-f $_){
+			my $file = substr($File::Find::name,length($target));
+			$count++;
+			unless (defined($files{$file}) && ($files{$file} == -s $_)){
+				$complete = 0;
+			}
+		}
+	}, follow_fast => 1}, $target);
+
+	return ($complete && ($count == scalar(keys(%files))));
+}
+
+sub archive_complete {
+
+	## Check that a staged archive contains the files needed by the homology tool
+	my ($archive,$tool,$name) = @_;
+
+	return 0 unless (-d $archive);
+
+	if (uc($tool) eq "GESAMT"){
+		opendir(my $dh,$archive) or return 0;
+		my @parts = grep { /^gesamt\.archive/ && -s "$archive/$_" } readdir($dh);
+		closedir($dh);
+		return (scalar(@parts) > 0);
+	}
+
+	## Databases can be split in several data files ($db.0, $db.1, ...)
+	foreach my $db ($name, "${name}_ss", "${name}_h"){
+		return 0 unless ((-e "$archive/$db") || (-e "$archive/$db.0"));
+		foreach my $file ("$db.dbtype", "$db.index"){
+			return 0 unless (-e "$archive/$file");
+		}
+	}
+
+	return 1;
+}
+
+sub build_archive {
+
+	my ($tool,$db_name,$arch_path,$structure_set) = @_;
+
+	if ($tool eq "GESAMT"){
+		system (traced("run_GESAMT.pl",$db_name,"
+			$gesamt_script \\
+			  -cpu $threads \\
+			  -make \\
+			  -arch $arch_path \\
+			  -pdb $structure_set
+		"));
+	}
+	else {
+		system (traced("run_foldseek.pl",$db_name,"
+			$foldseek_script \\
+			  --create \\
+			  --db $arch_path/$db_name \\
+			  --pdb $structure_set \\
+			  --threads $threads
+		"));
+	}
+
+	check_archive($tool,$db_name,$arch_path);
+}
+
+sub check_archive {
+
+	## A manifest is only written for a complete archive; a failed build fails the stage
+	my ($tool,$db_name,$arch_path) = @_;
+
+	unless (archive_complete($arch_path,$tool,$db_name)){
+		print color 'red';
+		print "\n\n[E]  Could not build the $tool archive for $db_name at $arch_path...\n\n";
+		print color 'reset';
+		exit 1;
+	}
+}
+
+sub structure_manifest {
+
+	## Size, modification time and MD5 of each structure in a set; files whose size and
+	## modification time did not change keep their previous checksum instead of being read again
+	my ($structure_set,$previous) = @_;
+	my %manifest;
+
+	opendir(SET,$structure_set) or die "Can't access $structure_set: $!\n";
+	foreach my $file (readdir(SET)){
+		next if (($file =~ /^\./) || !(-f "$structure_set/$file"));
+		$manifest{$file} = file_entry("$structure_set/$file",$previous ? $previous->{$file} : undef);
+	}
+	closedir(SET);
+
+	return \%manifest;
+}
+
+sub read_manifest {
+
+	my ($file) = @_;
+	return unless (-f $file);
+
+	my %manifest;
+	open MAN, "<", $file or die "Can't read $file: $!\n";
+	while (my $line = <MAN>){
+		chomp($line);
+		next if (($line =~ /^#/) || ($line eq ''));
+		my ($structure,$size,$mtime,$md5) = split("\t",$line);
+		$manifest{$structure} = [$size,$mtime,$md5];
+	}
+	close MAN;
+
+	return \%manifest;
+}
+
+sub write_manifest {
+
+	my ($file,$manifest) = @_;
+
+	open MAN, ">", "$file.tmp" or die "Can't write to $file.tmp: $!\n";
+	print MAN "### File\tSize\tModified\tMD5\n";
+	foreach my $structure (sort(keys(%{$manifest}))){
+		print MAN join("\t",$structure,@{$manifest->{$structure}})."\n";
+	}
+	close MAN;
+	rename("$file.tmp",$file) or die "Can't rename $file.tmp: $!\n";
+}
+
+sub invalidate_results {
+
+	## Added structures can be hit by any query, so the set is searched again; pair scores
+	## are cached, so only new pairs are rescored. Removed structures are filtered out of
+	## existing results without searching again.
+	my ($tool,$set,$added,$removed) = @_;
+
+	my @result_dirs = ("$struct_res_dir/$tool/$set");
+	push(@result_dirs,"$struct_res_dir/${tool}_w_MICAN/$set") if ($tool eq "FOLDSEEK");
+
+	if (@{$added}){
+		foreach my $dir (@result_dirs){
+			if (-d $dir){
+				print "\tRemoving results from $dir to search the updated archive...\n";
+				remove_tree($dir);
+			}
+		}
+		return;
+	}
+
+	return unless (@{$removed});
+
+	my %removed = map { structure_stem($_) => 1 } @{$removed};
+	foreach my $dir (@result_dirs){
+		next unless (-d $dir);
+		opendir(RES,$dir) or die "Can't access $dir: $!\n";
+		my @files = grep { -f "$dir/$_" && /\.(?:fseek|gesamt)(?:\.gz)?$/ } readdir(RES);
+		closedir(RES);
+		foreach my $file (@files){
+			my $gzip = ($file =~ /\.gz$/) ? ":gzip" : "";
+			my $content = "";
+			my $dropped = 0;
+			open IN, "<$gzip", "$dir/$file" or die "Can't read $dir/$file: $!\n";
+			while (my $line = <IN>){
+				unless (($line =~ /^#/) || ($line =~ /^\s*$/)){
+					## Matched structure: target column for Foldseek, last column for GESAMT
+					my @data = ($tool eq "GESAMT") ? split(/\s+/,$line) : split("\t",$line);
+					my $target = structure_stem(($tool eq "GESAMT") ? $data[-1] : $data[1]);
+					my ($chainless) = $target =~ /^(.+)_[^_]+$/;
+					if (exists $removed{$target} || (defined($chainless) && exists $removed{$chainless})){
+						$dropped++;
+						next;
+					}
+				}
+				$content .= $line;
+			}
+			close IN;
+			next unless ($dropped);
+			if ($gzip){
+				gzip(\$content => "$dir/$file.tmp") or die "Can't write to $dir/$file.tmp: $GzipError\n";
+			}
+			else {
+				open OUT, ">", "$dir/$file.tmp" or die "Can't write to $dir/$file.tmp: $!\n";
+				print OUT $content;
+				close OUT;
+			}
+			rename("$dir/$file.tmp","$dir/$file") or die "Can't rename $dir/$file.tmp: $!\n";
+		}
+	}
+}
+
+sub structure_stem {
+
+	## Structure name without its file extensions (i.e. AF-P12345-F1-model_v4.pdb.gz => AF-P12345-F1-model_v4)
+	my ($file) = @_;
+	$file =~ s/\.(?:pdb|ent|cif|mmcif)(?:\.gz)?(?=$|_)//;
+	$file =~ s/\.gz$//;
+	return $file;
+}
+
+sub scrape_uniprot {
+
+	## Runs the scraper for a GO keyword or a custom UniProt query; exits if no metadata came out
+	my ($go_keyword,$custom) = @_;
+	my $flags = "";
+	
+	if($go_keyword){
+		$go_keyword =~ s/"//g;
+		$flags .= "--go_keyword \"$go_keyword\" ";
+	}
+
+	if(@method){
+		$flags .= "--method @method ";
+	}
+
+	if($need_3D){
+		$flags .= "--structures ";
+	}
+
+	if($verified_only){
+		$flags .= "-v ";
+	}
+
+	if($rest){
+		$flags .= "--rest ";
+	}
+
+	if($custom){
+		$flags = "-c '$custom' ";
+		if($rest){
+			$flags .= "--rest ";
+		}
+	}
+
+	if($cache){
+		$flags .= "--cache $cache ";
+		$flags .= "--cache_max_size $cache_max_size " if (defined $cache_max_size);
+		$flags .= "--cache_max_age $cache_max_age " if (defined $cache_max_age);
+	}
+
+	if($offline){
+		$flags .= "--offline $offline ";
+		$flags .= "--pdb_mirror $pdb_mirror " if ($pdb_mirror);
+		$flags .= "--alphafold_mirror $af_mirror " if ($af_mirror);
+	}
+
+	system traced("uniprot_scraper.py","","$scraper_script \\
+			--outdir $outdir/UNIPROT_SCRAP_RESULTS \\
+			--extract_workers $threads \\
+			-df \\
+			-ds \\
+			$flags
+	");
+
+	unless(-f "$uniprot_dir/metadata.log"){
+		print color 'red';
+		print "\n\n[E]  UniProt scraping failed\n\n";
+		print color 'reset';
+		exit 1;
+	}
+}
+
 sub duration {
 	my $elapsed = ($_[0] - $_[1]);
 	my $days = int($elapsed/(24*60*60));
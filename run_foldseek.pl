@@ -1,19 +1,25 @@
 #!/usr/bin/perl
 ## Pombert Lab 2022
-my $version = '0.2.3';
+my $version = '0.3.2';
 my $name = 'run_foldseek.pl';
-my $updated = '2022-07-22';
+my $updated = '2026-10-17';
 
 use strict;
 use warnings;
 use File::Find;
 use File::Basename;
 use File::Path qw(make_path);
+use Cwd qw(abs_path);
 use POSIX 'strftime';
 use Getopt::Long qw(GetOptions);
+use FindBin qw($RealBin);
+use lib $RealBin;
+use QueGO::Trace qw(traced);
 
 my @command = @ARGV; ## Keeping track of command line for log
 
+my ($script,$pipeline_dir) = fileparse($0);
+
 ## Usage definition
 my $USAGE = <<"OPTIONS";
 NAME		${name}
@@ -24,6 +30,7 @@ SYNOPSIS	Run foldseek searches against PDB structures
 REQUIREMENTS	Foldseek - https://github.com/steineggerlab/foldseek
 
 CREATE DB	${name} -create -db /media/Data_2/FSEEK/rcsb -pdb /media/Data_2/PDB/
+UPDATE DB	${name} -update -db /media/Data_2/FSEEK/rcsb -pdb /media/Data_2/PDB_NEW/
 QUERY DB	${name} -query -db /media/Data_2/FSEEK/rcsb -input *.pdb -o ./FSEEK_RESULTS -z
 
 OPTIONS:
@@ -35,6 +42,7 @@ OPTIONS:
 ## Creating a Foldseek database
 -c (--create)	Create a foldseek database
 -p (--pdb)	Folder containing the PDB files for the database
+-u (--update)	Add the PDB files from --pdb to an existing database (createdb + concatdbs)
 
 ## Querying a Foldseek database
 -q (--query)	Query a Foldseek database
@@ -46,6 +54,8 @@ OPTIONS:
 		  2: 3Di+AA Gotoh-Smith-Waterman
 -m (--mseq)	Amount of prefilter sequences handed to the alignment [Default: 300]
 -z (--gzip)	Compress output files [Default: off]
+-b (--batch)	Search all pending query files at once (createdb/search/convertalis) and split
+		the hits back into one result file per query [Default: off]
 
 ## Reference
 van Kempen M, Kim S, Tumescheit C, Mirdita M, Söding J, and Steinegger M.
@@ -61,6 +71,7 @@ my $verbosity = 3;
 my $log = 'foldseek.log';
 
 my $create;
+my $update;
 my $pdb;
 
 my $query;
@@ -69,19 +80,22 @@ my @input;
 my $atype = 2;
 my $mseqs = 300;
 my $gnuzip;
+my $batch;
 GetOptions(
 	'd|db=s' => \$db,
 	'l|log=s' => \$log,
 	't|threads=i' => \$threads,
 	'v|verbosity=i' => \$verbosity,
 	'c|create' => \$create,
+	'u|update' => \$update,
 	'p|pdb=s' => \$pdb,
 	'q|query' => \$query,
 	'o|outdir=s' => \$outdir,
 	'a|atype=i' => \$atype,
 	'm|mseq=i' => \$mseqs,
 	'i|input=s@{1,}' => \@input,
-	'z|gzip' => \$gnuzip
+	'z|gzip' => \$gnuzip,
+	'b|batch' => \$batch
 );
 
 ## Creating log
@@ -100,8 +114,8 @@ if ($prog eq ''){
 }
 
 ## Checking for unknown task
-if (!defined $create and !defined $query){
-	die "\nUnknown task. Please specify -create or -query on the command line.\n\n";
+if (!defined $create and !defined $update and !defined $query){
+	die "\nUnknown task. Please specify -create, -update or -query on the command line.\n\n";
 }
 
 ## Creating a foldseek database
@@ -116,11 +130,21 @@ if ($create){
 		make_path( $dbpath, { mode => 0755 } ) or die "Can't create folder $dbpath: $!\n";
 	}
 
-	system ("foldseek \\
+	system (traced("foldseek createdb",$dbname,"foldseek \\
 			  createdb \\
 			  --threads $threads \\
 			  $pdb \\
-			  $db") == 0 or checksig();
+			  $db")) == 0 or checksig();
+}
+
+## Adding structures to an existing foldseek database
+if ($update){
+
+	unless ($pdb){
+		die "\nERROR: Please enter folder containing the PDB files to add to the database.";
+	}
+
+	update_db();
 }
 
 ## Running foldseek queries/Skipping previously done searches
@@ -130,6 +154,11 @@ if ($query){
 		make_path($outdir, {mode=>0755}) or die "Can't create folder $outdir: $!\n";
 	}
 
+	## Search all pending queries with a single query database
+	if ($batch){
+		batch_search();
+	}
+
 	while (my $file = shift(@input)){
 
 		my ($pdb, $dir) = fileparse($file);
@@ -139,7 +168,7 @@ if ($query){
 
 			print "\n  Running foldseek on $file...\n";
 
-			system ("foldseek \\
+			system (traced("foldseek easy-search",$pdb,"foldseek \\
 			  easy-search \\
 			  --max-seqs $mseqs \\
 			  --alignment-type $atype \\
@@ -148,7 +177,7 @@ if ($query){
 			  $file \\
 			  $db \\
 			  $outdir/$pdb.fseek \\
-			  $outdir/tmp 1>/dev/null 2>$outdir/error.log") == 0 or checksig();
+			  $outdir/tmp 1>/dev/null 2>$outdir/error.log")) == 0 or checksig();
 			
 			if ($gnuzip){
 				## Compressing data with GZIP to save some space
@@ -180,6 +209,197 @@ print LOG "Total run time: $endtime minutes\n";
 close LOG;
 
 ### Subroutine(s)
+sub batch_search {
+
+	my %pending;
+	foreach my $file (@input){
+		my ($pdb) = fileparse($file);
+		($pdb) = $pdb =~ /(\w+)\.pdb(?:\.gz)?$/;
+		unless (-f "$outdir/$pdb.fseek" || -f "$outdir/$pdb.fseek.gz" || exists $pending{$pdb}){
+			$pending{$pdb} = $file;
+		}
+	}
+
+	return unless (%pending);
+
+	print "\n  Running foldseek on ".scalar(keys(%pending))." pending queries as a single batch...\n";
+
+	my $batch_dir = "$outdir/tmp/batch";
+	if (-d $batch_dir){ system "rm -R $batch_dir"; }
+	make_path("$batch_dir/queries",{mode=>0755}) or die "Can't create folder $batch_dir/queries: $!\n";
+
+	## createdb takes a directory; link the pending queries into one
+	foreach my $pdb (keys(%pending)){
+		my ($filename) = fileparse($pending{$pdb});
+		symlink(abs_path($pending{$pdb}),"$batch_dir/queries/$filename") or die "Can't link $pending{$pdb}: $!\n";
+	}
+
+	my $batch_item = scalar(keys(%pending))." queries";
+
+	system (traced("foldseek createdb",$batch_item,"foldseek \\
+	  createdb \\
+	  --threads $threads \\
+	  -v $verbosity \\
+	  $batch_dir/queries \\
+	  $batch_dir/queryDB 1>/dev/null 2>>$outdir/error.log")) == 0 or checksig();
+
+	system (traced("foldseek search",$batch_item,"foldseek \\
+	  search \\
+	  --max-seqs $mseqs \\
+	  --alignment-type $atype \\
+	  --threads $threads \\
+	  -v $verbosity \\
+	  $batch_dir/queryDB \\
+	  $db \\
+	  $batch_dir/aln \\
+	  $outdir/tmp/search 1>/dev/null 2>>$outdir/error.log")) == 0 or checksig();
+
+	## Same columns as easy-search
+	system (traced("foldseek convertalis",$batch_item,"foldseek \\
+	  convertalis \\
+	  --threads $threads \\
+	  -v $verbosity \\
+	  $batch_dir/queryDB \\
+	  $db \\
+	  $batch_dir/aln \\
+	  $batch_dir/aln.m8 1>/dev/null 2>>$outdir/error.log")) == 0 or checksig();
+
+	## Split hits per query; results are written to temporary files and renamed once complete.
+	## Hits are appended, so those left by an interrupted run are removed first
+	foreach my $pdb (keys(%pending)){
+		unlink("$outdir/$pdb.fseek.tmp");
+	}
+	my %written;
+	my $current = '';
+	open ALN, "<", "$batch_dir/aln.m8" or die "Can't read $batch_dir/aln.m8: $!\n";
+	while (my $line = <ALN>){
+		my ($query) = split("\t",$line);
+		unless ($query eq $current){
+			close OUT if ($current ne '');
+			$current = $query;
+			my $pdb = query_name($query,\%pending);
+			unless (defined $pdb){
+				print STDERR "  Unable to match foldseek query $query to an input file\n";
+				open OUT, ">", "/dev/null";
+				next;
+			}
+			open OUT, ">>", "$outdir/$pdb.fseek.tmp" or die "Can't write to $outdir/$pdb.fseek.tmp: $!\n";
+			$written{$pdb} = 1;
+		}
+		print OUT $line;
+	}
+	close OUT if ($current ne '');
+	close ALN;
+
+	foreach my $pdb (sort(keys(%pending))){
+		## Queries without hits get an empty result, like with easy-search
+		unless ($written{$pdb}){
+			open OUT, ">", "$outdir/$pdb.fseek.tmp" or die "Can't write to $outdir/$pdb.fseek.tmp: $!\n";
+			close OUT;
+		}
+		rename("$outdir/$pdb.fseek.tmp","$outdir/$pdb.fseek") or die "Can't rename $outdir/$pdb.fseek.tmp: $!\n";
+		if ($gnuzip){
+			system "gzip $outdir/$pdb.fseek";
+		}
+	}
+
+	system "rm -R $batch_dir";
+}
+
+sub update_db {
+
+	my ($dbname,$dbpath) = fileparse($db);
+	my $update_dir = "$dbpath/update";
+	if (-d $update_dir){ system "rm -R $update_dir"; }
+	make_path($update_dir,{mode=>0755}) or die "Can't create folder $update_dir: $!\n";
+
+	system (traced("foldseek createdb",$dbname,"foldseek \\
+	  createdb \\
+	  --threads $threads \\
+	  -v $verbosity \\
+	  $pdb \\
+	  $update_dir/delta")) == 0 or checksig();
+
+	## concatdbs shifts the keys of the second database past the largest key of the first;
+	## the lookup and source files are shifted the same way below
+	my $key_offset = max_key("$db.index",0) + 1;
+	my $file_offset = (-f "$db.source") ? max_key("$db.source",0) + 1 : 0;
+
+	my @suffixes = grep { -f "$db$_.dbtype" && -f "$update_dir/delta$_.dbtype" } ('', '_ss', '_ca', '_h');
+	foreach my $suffix (@suffixes){
+		system (traced("foldseek concatdbs",$dbname.$suffix,"foldseek \\
+		  concatdbs \\
+		  --threads $threads \\
+		  -v $verbosity \\
+		  $db$suffix \\
+		  $update_dir/delta$suffix \\
+		  $update_dir/merged$suffix")) == 0 or checksig();
+		die "\nERROR: foldseek concatdbs failed on $db$suffix\n\n" unless (-f "$update_dir/merged$suffix.index");
+	}
+
+	foreach my $table ('lookup', 'source'){
+		next unless ((-f "$db.$table") && (-f "$update_dir/delta.$table"));
+		open OUT, ">", "$update_dir/merged.$table" or die "Can't write to $update_dir/merged.$table: $!\n";
+		open IN, "<", "$db.$table" or die "Can't read $db.$table: $!\n";
+		while (my $line = <IN>){ print OUT $line; }
+		close IN;
+		open IN, "<", "$update_dir/delta.$table" or die "Can't read $update_dir/delta.$table: $!\n";
+		while (my $line = <IN>){
+			chomp $line;
+			my @data = split("\t",$line);
+			if ($table eq 'lookup'){
+				## key, name, file number
+				$data[0] += $key_offset;
+				$data[2] += $file_offset if (defined $data[2]);
+			}
+			else {
+				## file number, file name
+				$data[0] += $file_offset;
+			}
+			print OUT join("\t",@data)."\n";
+		}
+		close IN;
+		close OUT;
+		push(@suffixes,".$table");
+	}
+
+	## Swap the merged databases in only once everything has been merged
+	foreach my $suffix (@suffixes){
+		my @files = ($suffix =~ /^\./) ? ($suffix) : ($suffix, "$suffix.index", "$suffix.dbtype");
+		foreach my $file (@files){
+			rename("$update_dir/merged$file","$db$file") or die "Can't replace $db$file: $!\n";
+		}
+	}
+
+	system "rm -R $update_dir";
+}
+
+sub max_key {
+
+	my ($file,$column) = @_;
+	my $max = -1;
+	open KEYS, "<", $file or die "Can't read $file: $!\n";
+	while (my $line = <KEYS>){
+		my @data = split("\t",$line);
+		$max = $data[$column] if ($data[$column] > $max);
+	}
+	close KEYS;
+	return $max;
+}
+
+sub query_name {
+
+	## Foldseek names entries after their file, with a chain suffix for multi-chain files
+	my ($query,$pending) = @_;
+	my ($pdb) = $query =~ /^(\w+)/;
+	while (defined($pdb) && !exists($pending->{$pdb})){
+		unless ($pdb =~ s/_[^_]+$//){
+			undef($pdb);
+		}
+	}
+	return $pdb;
+}
+
 sub checksig {
 
 	my $exit_code = $?;
@@ -196,4 +416,4 @@ sub checksig {
 		exit(131);
 	}
 
-}
\ No newline at end of file
+}
@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+name = "score_cache.py"
+version = "0.2.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Persistent cache of structure pair scores (i.e., TM-scores) shared between QueGO runs.
+		Scores are keyed by the content hashes of both structures plus the scorer name and
+		version, so reruns and overlapping searches only score pairs never seen before.
+		Scores that depend on an alignment (i.e., the NumPy engine scoring Foldseek ranges)
+		are also keyed by the ranges given after the structures.
+		Used by run_MICAN.pl.
+
+COMMAND		{name} \\
+		  -d /media/Data_2/QUEGO_CACHE/scores.sqlite \\
+		  -s mican:2019.11.27 \\
+		  -l pairs.tsv \\
+		  -o cached.tsv
+
+OPTIONS
+-d (--db)		Score cache database [Default = $QUEGO_CACHE/scores.sqlite]
+-s (--scorer)		Scorer name and version (i.e., mican:2019.11.27)
+-l (--lookup)		Tab-delimited pairs (structure 1, structure 2, optional ranges: qstart, qend, tstart,
+			tend); cached scores are written to --out as the index of the pair (0-based) and its score
+-i (--insert)		Tab-delimited scores to add: structure 1, structure 2, optional ranges, score
+-o (--out)		Output file for --lookup [Default = stdout]
+-c (--info)		Print the number of cached scores per scorer
+
+"""
+
+import gzip
+import sqlite3
+import hashlib
+from os import path, stat, makedirs, environ
+from time import time
+
+class ScoreCache:
+
+	def __init__(self,db_file):
+
+		makedirs(path.dirname(path.abspath(db_file)),exist_ok=True)
+
+		## Several runs can share the cache; SQLite serializes their writes
+		self.db = sqlite3.connect(db_file,timeout=600)
+		self.db.execute("""
+			CREATE TABLE IF NOT EXISTS scores (
+				hash1 TEXT NOT NULL,
+				hash2 TEXT NOT NULL,
+				scorer TEXT NOT NULL,
+				score TEXT NOT NULL,
+				created REAL NOT NULL,
+				PRIMARY KEY (hash1,hash2,scorer)
+			) WITHOUT ROWID
+		""")
+		## Content hashes are remembered per file so unchanged structures are not read again
+		self.db.execute("""
+			CREATE TABLE IF NOT EXISTS files (
+				path TEXT PRIMARY KEY,
+				size INTEGER NOT NULL,
+				mtime REAL NOT NULL,
+				hash TEXT NOT NULL
+			)
+		""")
+		self.db.commit()
+		self.hashes = {}
+
+	def structure_hash(self,file):
+
+		if file in self.hashes:
+			return self.hashes[file]
+
+		absolute = path.abspath(file)
+		info = stat(absolute)
+		row = self.db.execute("SELECT hash FROM files WHERE path = ? AND size = ? AND mtime = ?",(absolute,info.st_size,info.st_mtime)).fetchone()
+		if row:
+			digest = row[0]
+		else:
+			digest = content_hash(absolute)
+			self.db.execute("INSERT OR REPLACE INTO files (path,size,mtime,hash) VALUES (?,?,?,?)",(absolute,info.st_size,info.st_mtime,digest))
+
+		self.hashes[file] = digest
+		return digest
+
+	def pair_key(self,file1,file2,ranges=()):
+
+		## Ranges are added to the second hash, so pairs scored on other alignments do not match
+		try:
+			hash1, hash2 = self.structure_hash(file1), self.structure_hash(file2)
+		except OSError:
+			return None
+		if ranges:
+			hash2 += ":" + ",".join(ranges)
+		return hash1, hash2
+
+	##############################################################################################
+	## Batched lookups and insertions
+	##############################################################################################
+
+	def lookup(self,pairs,scorer):
+
+		## pairs: list of (structure 1, structure 2, ranges...); returns {index: score} for cached pairs
+		keys = {}
+		for index, (file1, file2, *ranges) in enumerate(pairs):
+			key = self.pair_key(file1,file2,ranges)
+			if key:
+				keys.setdefault(key,[]).append(index)
+		self.db.commit()
+
+		cached = {}
+		unique = list(keys)
+		## One query per batch of pairs instead of one per pair
+		for begin in range(0,len(unique),400):
+			batch = unique[begin:begin+400]
+			clause = " OR ".join(["(hash1 = ? AND hash2 = ?)"]*len(batch))
+			values = [value for key in batch for value in key]
+			for hash1, hash2, score in self.db.execute(f"SELECT hash1, hash2, score FROM scores WHERE scorer = ? AND ({clause})",[scorer]+values):
+				for index in keys[(hash1,hash2)]:
+					cached[index] = score
+
+		return cached
+
+	def insert(self,scores,scorer):
+
+		## scores: list of (structure 1, structure 2, ranges..., score); scores are kept as written by the scorer
+		rows = []
+		now = time()
+		for file1, file2, *ranges, score in scores:
+			key = self.pair_key(file1,file2,ranges)
+			if key:
+				rows.append((key[0],key[1],scorer,score,now))
+
+		self.db.executemany("INSERT OR REPLACE INTO scores (hash1,hash2,scorer,score,created) VALUES (?,?,?,?,?)",rows)
+		self.db.commit()
+		return len(rows)
+
+	def info(self):
+
+		return self.db.execute("SELECT scorer, COUNT(*) FROM scores GROUP BY scorer ORDER BY scorer").fetchall()
+
+	def close(self):
+
+		self.db.commit()
+		self.db.close()
+
+def content_hash(file):
+
+	## Hash of the uncompressed structure, so gzipped and plain copies of a file share their scores
+	digest = hashlib.sha256()
+	opener = gzip.open if file.endswith(".gz") else open
+	with opener(file,"rb") as FILE:
+		while True:
+			chunk = FILE.read(1 << 20)
+			if not chunk:
+				break
+			digest.update(chunk)
+	return digest.hexdigest()
+
+def read_tsv(file):
+
+	rows = []
+	TSV = open(file,"r")
+	for line in TSV:
+		line = line.rstrip("\n")
+		if line:
+			rows.append(line.split("\t"))
+	TSV.close()
+	return rows
+
+if __name__ == "__main__":
+
+	from sys import argv, stdout
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-d","--db",default=f"{environ['QUEGO_CACHE']}/scores.sqlite" if environ.get("QUEGO_CACHE") else None)
+	parser.add_argument("-s","--scorer")
+	parser.add_argument("-l","--lookup")
+	parser.add_argument("-i","--insert")
+	parser.add_argument("-o","--out")
+	parser.add_argument("-c","--info",action='store_true')
+
+	args = parser.parse_args()
+
+	if not args.db:
+		exit("\n[E]  Please provide a score cache with --db or $QUEGO_CACHE\n")
+	if (args.lookup or args.insert) and not args.scorer:
+		exit("\n[E]  Please provide the scorer name and version with --scorer\n")
+
+	cache = ScoreCache(args.db)
+
+	if args.insert:
+		cache.insert(read_tsv(args.insert),args.scorer)
+
+	if args.lookup:
+		cached = cache.lookup(read_tsv(args.lookup),args.scorer)
+		OUT = open(args.out,"w") if args.out else stdout
+		for index in sorted(cached):
+			OUT.write(f"{index}\t{cached[index]}\n")
+		if args.out:
+			OUT.close()
+
+	if args.info:
+		print(f"\n{args.db}")
+		for scorer, count in cache.info():
+			print(f"\t{scorer}\t{count} scores")
+		print()
+
+	cache.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+name = "structure_pack.py"
+version = "0.1.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Packs a structure set (UniProt PDBs/ or a folder of predicted structures) into a
+		single file of gzip members, one per structure, with an offset index (PACK.idx).
+		Structures are read back by name (1abc_A.pdb.gz) or ID (1abc_A) from a memory map,
+		without decompressing anything else; the whole pack also reads as one gzip stream
+		(zcat). Packs are rebuilt only when the set changes; unchanged members are copied.
+
+COMMAND		{name} build -i UNIPROT_SCRAP_RESULTS/PDBs -o PACKS/UNIPROT.pack
+		{name} get -p PACKS/UNIPROT.pack -i 1abc_A -o 1abc_A.pdb
+		{name} ca -p PACKS/UNIPROT.pack -i 1abc_A
+		{name} list -p PACKS/UNIPROT.pack
+
+BUILD OPTIONS
+-i (--input)		Directory of structures (.pdb, .ent, .cif; may be gzipped)
+-o (--out)		Pack file; the index is written to PACK.idx
+-l (--level)		Compression level of structures that are not already gzipped [Default = 6]
+
+GET/CA/LIST OPTIONS
+-p (--pack)		Pack file
+-i (--id)		Structure name(s) or ID(s)
+-o (--out)		Output file [Default = stdout]
+
+"""
+
+import re
+import gzip
+import mmap
+from os import path, listdir, stat, replace, makedirs
+from collections import OrderedDict
+
+structure_file = re.compile(r"\.(pdb|ent|cif)(\.gz)?$")
+
+def structure_id(file_name):
+
+	## 1abc_A.pdb.gz => 1abc_A
+	return structure_file.sub("",path.basename(file_name))
+
+def ca_coordinates(lines):
+
+	## CA coordinates of the first model, one per residue, in file order
+	ca = []
+	seen = set()
+	for line in lines:
+		if line.startswith("ENDMDL"):
+			break
+		if line.startswith("ATOM") and (line[12:16] == " CA "):
+			residue = (line[21],line[22:27])
+			if residue not in seen:
+				seen.add(residue)
+				ca.append((float(line[30:38]),float(line[38:46]),float(line[46:54])))
+	return ca
+
+def read_index(index_file):
+
+	## name => [offset, length, source size, source mtime]
+	index = {}
+	if not path.isfile(index_file):
+		return index
+	INDEX = open(index_file,"r")
+	for line in INDEX:
+		if line.startswith("#"):
+			continue
+		name, offset, length, size, mtime = line.rstrip("\n").split("\t")
+		index[name] = [int(offset),int(length),int(size),int(mtime)]
+	INDEX.close()
+	return index
+
+def build(input_dir,pack_file,level=6):
+
+	## Returns the number of structures packed, or None if the pack was up to date
+	index_file = f"{pack_file}.idx"
+	previous = read_index(index_file) if path.isfile(pack_file) else {}
+	## An index describing another pack (i.e., interrupted between renames) is not used
+	if previous and (sum(entry[1] for entry in previous.values()) != path.getsize(pack_file)):
+		previous = {}
+	makedirs(path.dirname(pack_file) or ".",exist_ok=True)
+
+	files = {}
+	for file_name in sorted(listdir(input_dir)):
+		if structure_file.search(file_name):
+			info = stat(f"{input_dir}/{file_name}")
+			files[file_name] = (info.st_size,int(info.st_mtime))
+
+	if previous and (len(previous) == len(files)) and all((name in previous) and (tuple(previous[name][2:4]) == files[name]) for name in files):
+		return None
+
+	OLD = open(pack_file,"rb") if previous else None
+	PACK = open(f"{pack_file}.tmp","wb")
+	INDEX = open(f"{index_file}.tmp","w")
+	INDEX.write("#name\toffset\tlength\tsource_size\tsource_mtime\n")
+
+	offset = 0
+	for file_name, (size, mtime) in files.items():
+		entry = previous.get(file_name)
+		if entry and (tuple(entry[2:4]) == (size,mtime)):
+			## Unchanged structures are copied from the previous pack
+			OLD.seek(entry[0])
+			member = OLD.read(entry[1])
+		else:
+			SOURCE = open(f"{input_dir}/{file_name}","rb")
+			member = SOURCE.read()
+			SOURCE.close()
+			## Gzipped structures are already gzip members
+			if not file_name.endswith(".gz"):
+				member = gzip.compress(member,compresslevel=level,mtime=0)
+		PACK.write(member)
+		INDEX.write(f"{file_name}\t{offset}\t{len(member)}\t{size}\t{mtime}\n")
+		offset += len(member)
+
+	PACK.close()
+	INDEX.close()
+	if OLD:
+		OLD.close()
+
+	## The index is renamed last; a pack not matching its index is rebuilt
+	replace(f"{pack_file}.tmp",pack_file)
+	replace(f"{index_file}.tmp",index_file)
+
+	return len(files)
+
+class StructurePack:
+
+	def __init__(self,pack_file,cache_size=64):
+
+		self.pack_file = pack_file
+		self.index = read_index(f"{pack_file}.idx")
+		self.ids = {}
+		for name in self.index:
+			self.ids.setdefault(structure_id(name),name)
+
+		self.PACK = open(pack_file,"rb")
+		self.map = mmap.mmap(self.PACK.fileno(),0,access=mmap.ACCESS_READ) if self.index else b""
+
+		## Decoded structures (and CA coordinates) most recently used
+		self.cache = OrderedDict()
+		self.cache_size = cache_size
+
+	def name(self,key):
+
+		## Structure names (1abc_A.pdb.gz), IDs (1abc_A) or paths to the original files
+		key = path.basename(key)
+		if key in self.index:
+			return key
+		return self.ids.get(structure_id(key))
+
+	def __contains__(self,key):
+
+		return self.name(key) is not None
+
+	def _cached(self,key,decode):
+
+		if key in self.cache:
+			self.cache.move_to_end(key)
+			return self.cache[key]
+		value = decode()
+		self.cache[key] = value
+		if len(self.cache) > self.cache_size:
+			self.cache.popitem(last=False)
+		return value
+
+	def member(self,key):
+
+		name = self.name(key)
+		if name is None:
+			raise KeyError(f"{key} not found in {self.pack_file}")
+		offset, length = self.index[name][0:2]
+		return self.map[offset:offset+length]
+
+	def structure(self,key):
+
+		## Decompressed structure (text)
+		## Members copied from gzipped files may hold several gzip streams (i.e., pigz)
+		return self._cached(("structure",self.name(key)),lambda: gzip.decompress(self.member(key)).decode())
+
+	def ca(self,key):
+
+		import numpy as np
+		return self._cached(("ca",self.name(key)),lambda: np.array(ca_coordinates(self.structure(key).splitlines()),dtype=np.float64).reshape(-1,3))
+
+	def close(self):
+
+		if self.index:
+			self.map.close()
+		self.PACK.close()
+
+if __name__ == "__main__":
+
+	from sys import argv, stdout
+	import argparse
+
+	if (len(argv) < 2) or (argv[1] not in ("build","get","ca","list")):
+		exit(f"{usage}")
+
+	command = argv[1]
+	parser = argparse.ArgumentParser(usage=usage)
+
+	if command == "build":
+		parser.add_argument("-i","--input",required=True)
+		parser.add_argument("-o","--out",required=True)
+		parser.add_argument("-l","--level",type=int,default=6)
+		args = parser.parse_args(argv[2:])
+		packed = build(args.input,args.out,args.level)
+		if packed is None:
+			print(f"\t{args.out} is up to date")
+		else:
+			print(f"\t{packed} structures packed in {args.out}")
+		exit()
+
+	parser.add_argument("-p","--pack",required=True)
+	parser.add_argument("-i","--id",nargs="+",default=[])
+	parser.add_argument("-o","--out")
+	args = parser.parse_args(argv[2:])
+
+	pack = StructurePack(args.pack)
+	OUT = open(args.out,"w") if args.out else stdout
+
+	if command == "list":
+		for name, (offset, length, size, mtime) in pack.index.items():
+			OUT.write(f"{structure_id(name)}\t{name}\t{length}\n")
+	else:
+		for key in args.id:
+			if key not in pack:
+				exit(f"[E]  {key} not found in {args.pack}")
+			if command == "get":
+				OUT.write(pack.structure(key))
+			else:
+				for x, y, z in pack.ca(key):
+					OUT.write(f"{structure_id(pack.name(key))}\t{x:.3f}\t{y:.3f}\t{z:.3f}\n")
+
+	if args.out:
+		OUT.close()
+	pack.close()
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+name = "tmscore_engine.py"
+version = "0.1.0"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Calculates TM-scores for pairs of structures in-process with NumPy. The residue
+		correspondence is taken from the Foldseek alignment ranges (qstart-qend/tstart-tend),
+		pairs are superposed in batches (Kabsch) and refined with the TM-score iteration.
+		Used as a rescoring backend by run_MICAN.pl.
+
+COMMAND		{name} \\
+		  -p pairs.tsv \\
+		  -o scores.tsv
+
+OPTIONS
+-p (--pairs)		Tab-delimited pairs: query structure, target structure, qstart, qend, tstart, tend
+-o (--out)		Output file with the index of each pair (0-based) and its TM-score [Default = stdout]
+-b (--batch)		Number of pairs superposed at once [Default = 512]
+-n (--norm)		Length used to normalize the TM-score: target, query, min or max [Default = target]
+-k (--packs)		Structure packs (structure_pack.py) to read structures from, as DIR=PACK: structures
+			of DIR are read from PACK
+
+"""
+
+import gzip
+from os import path
+from sys import argv, stdout
+
+import numpy as np
+from structure_pack import StructurePack, ca_coordinates
+
+## Seeds for the TM-score search, as (start, length) fractions of the aligned residues
+seeds = [(0,1)] + [(start/8,1/4) for start in range(0,7,2)] + [(start/16,1/8) for start in range(0,15,2)]
+iterations = 10
+
+coordinates = {}
+packs = {}
+
+def read_ca(file):
+
+	## CA coordinates of the first model, one per residue, in file order
+	if file in coordinates:
+		return coordinates[file]
+
+	pack = packs.get(path.normpath(path.dirname(file)))
+	if pack and (file in pack):
+		coordinates[file] = pack.ca(file)
+		return coordinates[file]
+
+	opener = gzip.open if file.endswith(".gz") else open
+	with opener(file,"rt") as PDB:
+		ca = ca_coordinates(PDB)
+
+	coordinates[file] = np.array(ca,dtype=np.float64).reshape(-1,3)
+	return coordinates[file]
+
+def d0(length):
+
+	return np.maximum(1.24*np.cbrt(np.maximum(length,19)-15)-1.8,0.5)
+
+def aligned_pair(query,target,qstart,qend,tstart,tend):
+
+	## Residues in the aligned ranges are paired along the diagonal; ranges of different
+	## lengths (gaps) are interpolated linearly
+	qstart, qend = max(qstart,1), min(qend,len(query))
+	tstart, tend = max(tstart,1), min(tend,len(target))
+	qlength = qend-qstart+1
+	tlength = tend-tstart+1
+	n = min(qlength,tlength)
+	if n < 3:
+		return None, None
+	steps = np.arange(n)/max(n-1,1)
+	qindex = qstart-1 + np.rint(steps*(qlength-1)).astype(int)
+	tindex = tstart-1 + np.rint(steps*(tlength-1)).astype(int)
+	return query[qindex], target[tindex]
+
+def superpose(x,y,weights):
+
+	## Weighted Kabsch for a batch: returns x rotated and translated onto y
+	total = np.maximum(weights.sum(axis=1),1e-9)[:,None]
+	xc = (x*weights[:,:,None]).sum(axis=1)/total
+	yc = (y*weights[:,:,None]).sum(axis=1)/total
+	xo = x-xc[:,None,:]
+	yo = y-yc[:,None,:]
+	h = np.matmul((xo*weights[:,:,None]).transpose(0,2,1),yo)
+	u, s, vt = np.linalg.svd(h)
+	sign = np.sign(np.linalg.det(np.matmul(u,vt)))
+	sign[sign == 0] = 1
+	vt[:,2,:] *= sign[:,None]
+	## Row vectors: x R^T with R = V U^T
+	return np.matmul(xo,np.matmul(u,vt))+yc[:,None,:]
+
+def tm_batch(x,y,valid,norm):
+
+	## x, y: (batch, residues, 3) padded coordinates; valid: (batch, residues) mask
+	n = valid.sum(axis=1)
+	cutoff = d0(norm)[:,None]
+	search = np.maximum(cutoff,4.5)
+	positions = np.arange(x.shape[1])[None,:]
+	best = np.zeros(x.shape[0])
+
+	for start, length in seeds:
+		size = np.maximum(np.rint(n*length),np.minimum(n,4))
+		first = np.minimum(np.rint(n*start),n-size)
+		weights = (valid & (positions >= first[:,None]) & (positions < (first+size)[:,None])).astype(np.float64)
+
+		## Pairs drop out of the iteration once their superposition is stable
+		active = np.arange(x.shape[0])
+		for iteration in range(iterations):
+			moved = superpose(x[active],y[active],weights)
+			distance = np.sqrt(((moved-y[active])**2).sum(axis=2))
+			score = ((1/(1+(distance/cutoff[active])**2))*valid[active]).sum(axis=1)/norm[active]
+			best[active] = np.maximum(best[active],score)
+
+			## Refine the superposition on residues close enough; keep the previous set if too few
+			selected = valid[active] & (distance < search[active])
+			enough = selected.sum(axis=1) >= 3
+			new_weights = np.where(enough[:,None],selected,weights > 0).astype(np.float64)
+			changed = (new_weights != weights).any(axis=1)
+			active = active[changed]
+			weights = new_weights[changed]
+			if not len(active):
+				break
+
+	return best
+
+def tm_scores(pairs,batch=512,norm="target"):
+
+	## pairs: list of (query file, target file, qstart, qend, tstart, tend); returns a list of scores (None if unscorable)
+	scores = [None]*len(pairs)
+	prepared = []
+
+	for index, (query_file, target_file, qstart, qend, tstart, tend) in enumerate(pairs):
+		try:
+			query = read_ca(query_file)
+			target = read_ca(target_file)
+		except (OSError, ValueError):
+			continue
+		x, y = aligned_pair(query,target,int(qstart),int(qend),int(tstart),int(tend))
+		if x is None:
+			continue
+		if norm == "query":
+			length = len(query)
+		elif norm == "min":
+			length = min(len(query),len(target))
+		elif norm == "max":
+			length = max(len(query),len(target))
+		else:
+			length = len(target)
+		prepared.append((len(x),index,x,y,length))
+
+	## Pairs of similar size are batched together to limit padding
+	prepared.sort(key=lambda item: item[0])
+
+	for begin in range(0,len(prepared),batch):
+		block = prepared[begin:begin+batch]
+		size = block[-1][0]
+		x = np.zeros((len(block),size,3))
+		y = np.zeros((len(block),size,3))
+		valid = np.zeros((len(block),size),dtype=bool)
+		for row, (n, index, xi, yi, length) in enumerate(block):
+			x[row,:n] = xi
+			y[row,:n] = yi
+			valid[row,:n] = True
+		norm_lengths = np.array([item[4] for item in block],dtype=np.float64)
+		for row, score in enumerate(tm_batch(x,y,valid,norm_lengths)):
+			scores[block[row][1]] = round(float(score),4)
+
+	return scores
+
+def read_pairs(file):
+
+	pairs = []
+	PAIRS = open(file,"r")
+	for line in PAIRS:
+		line = line.rstrip("\n")
+		if line:
+			pairs.append(line.split("\t")[0:6])
+	PAIRS.close()
+	return pairs
+
+if __name__ == "__main__":
+
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-p","--pairs",required=True)
+	parser.add_argument("-o","--out")
+	parser.add_argument("-b","--batch",type=int,default=512)
+	parser.add_argument("-n","--norm",choices=["target","query","min","max"],default="target")
+	parser.add_argument("-k","--packs",nargs="+",default=[])
+
+	args = parser.parse_args()
+
+	for pack in args.packs:
+		directory, pack_file = pack.split("=",1)
+		packs[path.normpath(directory)] = StructurePack(pack_file)
+
+	scores = tm_scores(read_pairs(args.pairs),batch=args.batch,norm=args.norm)
+
+	OUT = open(args.out,"w") if args.out else stdout
+	for index, score in enumerate(scores):
+		if score is not None:
+			OUT.write(f"{index}\t{score}\n")
+	if args.out:
+		OUT.close()
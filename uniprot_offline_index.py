@@ -0,0 +1,374 @@
+#!/usr/bin/python
+
+name = "uniprot_offline_index.py"
+version = "0.1.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Builds an on-disk inverted index (SQLite) of a local UniProtKB flat file
+		(uniprot_sprot.dat.gz, uniprot_trembl.dat.gz) once, then answers UniProt style
+		queries from it without going online: each search term (GO term, keyword, organism,
+		reviewed status, 3D structure...) points to the accessions carrying it. The names,
+		organism, structural features, PDB/AlphaFold cross-references and sequence of each
+		accession are stored with it, so uniprot_scraper.py --offline can produce the usual
+		UNIPROT_SCRAP_RESULTS without a single request to uniprot.org.
+
+COMMAND		{name} build -d uniprot_sprot.dat.gz -i UNIPROT_INDEX.sqlite
+		{name} search -i UNIPROT_INDEX.sqlite -q '(go:toll)AND(reviewed:true)AND(organism_id:7227)'
+		{name} fasta -i UNIPROT_INDEX.sqlite -a P08953
+
+OPTIONS
+-d (--dat)		UniProtKB flat files (may be gzipped)
+-i (--index)		Index file
+-q (--query)		Query: field:value terms combined with AND, OR, NOT and parentheses
+-a (--accessions)	Accessions to print in FASTA format
+
+QUERY FIELDS
+go		GO identifier (go:0005886) or words of GO term names (go:toll, go:"toll-like receptor")
+keyword		Words of UniProt keywords (keyword:kinase)
+organism_id	NCBI taxonomy identifier of the organism (organism_id:7227)
+reviewed	true (Swiss-Prot) or false (TrEMBL)
+structure_3d	true if the entry has PDB cross-references
+accession	Accession (accession:P08953)
+name		Words of the protein names (name:toll); also used for terms without a field
+
+		Values of several words match accessions having all of them. GO terms are not
+		expanded to their descendants, unlike uniprot.org.
+
+"""
+
+import re
+import gzip
+import sqlite3
+from os import path, replace, remove
+
+schema = """
+CREATE TABLE entries (
+	id INTEGER PRIMARY KEY,
+	accession TEXT UNIQUE,
+	entry_name TEXT,
+	reviewed INTEGER,
+	protein_name TEXT,
+	organism_name TEXT,
+	taxon TEXT,
+	features TEXT,
+	structures TEXT,
+	sequence TEXT
+);
+CREATE TABLE terms (
+	term TEXT,
+	entry INTEGER
+);
+"""
+
+## Secondary structure features, named like the UniProt REST API and accession pages
+feature_names = {"HELIX": "Helix", "STRAND": "Beta strand", "TURN": "Turn"}
+
+query_token = re.compile(r'\(|\)|[\w.-]+:"[^"]*"|"[^"]*"|[^\s()]+')
+
+def words(text):
+
+	return re.findall(r"[a-z0-9]+",text.lower())
+
+def strip_evidence(text):
+
+	## Evidence tags ({ECO:0000250|UniProtKB:P12345}) are not part of names
+	return re.sub(r"\s*\{[^}]*\}","",text).strip()
+
+def open_dat(dat_file):
+
+	if dat_file.endswith(".gz"):
+		return gzip.open(dat_file,"rt")
+	return open(dat_file,"r")
+
+def read_entries(dat_file):
+
+	## One dict per entry of a UniProtKB flat file, read line by line
+	DAT = open_dat(dat_file)
+	entry = None
+	for line in DAT:
+		code = line[0:2]
+		data = line[5:].rstrip("\n")
+		if code == "ID":
+			entry = {"accessions": [], "description": [], "organism": [], "taxon": "", "go": [], "keywords": [], "features": {}, "structures": [], "alphafold": False, "sequence": []}
+			fields = data.split()
+			entry["entry_name"] = fields[0]
+			entry["reviewed"] = int(fields[1].rstrip(";") == "Reviewed")
+		elif entry is None:
+			continue
+		elif code == "AC":
+			entry["accessions"] += [accession for accession in data.replace(";"," ").split()]
+		elif code == "DE":
+			entry["description"].append(data)
+		elif code == "OS":
+			entry["organism"].append(data.strip())
+		elif code == "OX":
+			match = re.search(r"NCBI_TaxID=(\d+)",data)
+			if match:
+				entry["taxon"] = match.group(1)
+		elif code == "KW":
+			entry["keywords"] += [strip_evidence(keyword) for keyword in data.rstrip(".").split(";") if keyword.strip()]
+		elif code == "DR":
+			fields = [field.strip() for field in data.rstrip(".").split(";")]
+			if fields[0] == "GO" and (len(fields) >= 3):
+				entry["go"].append((fields[1],fields[2][2:]))
+			elif fields[0] == "PDB" and (len(fields) >= 5):
+				## Chains are listed as "A/B=1-100, C=1-50"; keep the first chain like on the accession page
+				entry["structures"].append((fields[1],fields[4].split("=")[0].split("/")[0],fields[2]))
+			elif fields[0] == "AlphaFoldDB":
+				entry["alphafold"] = True
+		elif code == "FT":
+			## Continuation lines (qualifiers) start with spaces
+			feature = data.split()[0] if data[0:1].strip() else ""
+			if feature in feature_names:
+				entry["features"][feature_names[feature]] = entry["features"].get(feature_names[feature],0) + 1
+		elif code == "  ":
+			entry["sequence"].append(data.replace(" ",""))
+		elif code == "//":
+			yield entry
+			entry = None
+	DAT.close()
+
+def protein_name(description):
+
+	## RecName (Swiss-Prot) or first SubName (TrEMBL)
+	for prefix in ("RecName: Full=","SubName: Full="):
+		for line in description:
+			if line.startswith(prefix):
+				return strip_evidence(line[len(prefix):].rstrip(";"))
+	return ""
+
+def entry_terms(entry,accession,prot_name):
+
+	terms = {f"accession:{accession.lower()}", f"reviewed:{'true' if entry['reviewed'] else 'false'}", f"structure_3d:{'true' if entry['structures'] else 'false'}"}
+	if entry["taxon"]:
+		terms.add(f"organism_id:{entry['taxon']}")
+	for go_id, go_name in entry["go"]:
+		terms.add(f"go:{go_id.split(':')[-1]}")
+		terms.update([f"go:{word}" for word in words(go_name)])
+	for keyword in entry["keywords"]:
+		terms.update([f"keyword:{word}" for word in words(keyword)])
+	names = " ".join([strip_evidence(re.sub(r"^\w+:\s*\w+=","",line)) for line in entry["description"]])
+	terms.update([f"name:{word}" for word in words(f"{prot_name} {names}")])
+	return terms
+
+def build(dat_files,index_file):
+
+	## Written next to the final index, then renamed; returns the number of entries indexed
+	temp_file = f"{index_file}.tmp"
+	if path.isfile(temp_file):
+		remove(temp_file)
+	db = sqlite3.connect(temp_file)
+	db.execute("PRAGMA journal_mode=OFF")
+	db.execute("PRAGMA synchronous=OFF")
+	db.executescript(schema)
+
+	count = 0
+	for dat_file in dat_files:
+		for entry in read_entries(dat_file):
+			accession = entry["accessions"][0]
+			prot_name = protein_name(entry["description"])
+			## Common names are given in parentheses, like the REST API: Drosophila melanogaster (Fruit fly)
+			org_name = re.sub(r"\.$",""," ".join(entry["organism"]))
+			features = "\n".join([f"{key}:{value}" for key, value in sorted(entry["features"].items())])
+			structures = [f"{pdb}\t{chain}\t{method}" for pdb, chain, method in entry["structures"]]
+			if entry["alphafold"]:
+				structures.append(f"{accession}\t-\tPredicted")
+			cursor = db.execute("INSERT OR IGNORE INTO entries VALUES (NULL,?,?,?,?,?,?,?,?,?)",(accession,entry["entry_name"],entry["reviewed"],prot_name,org_name,entry["taxon"],features,"\n".join(structures),"".join(entry["sequence"])))
+			if not cursor.rowcount:
+				continue
+			db.executemany("INSERT INTO terms VALUES (?,?)",[(term,cursor.lastrowid) for term in entry_terms(entry,accession,prot_name)])
+			count += 1
+
+	## Indexed once all rows are in, which is much faster than maintaining the index while inserting
+	db.execute("CREATE INDEX terms_term ON terms (term, entry)")
+	db.commit()
+	db.close()
+	replace(temp_file,index_file)
+	return count
+
+class QueryError(Exception):
+	pass
+
+def alphafold_link(accession,alphafold_version=4):
+
+	return f"https://alphafold.ebi.ac.uk/files/AF-{accession}-F1-model_v{alphafold_version}.pdb"
+
+class OfflineIndex:
+
+	def __init__(self,index_file):
+
+		if not path.isfile(index_file):
+			raise FileNotFoundError(f"{index_file} not found; create it with {name} build")
+		self.db = sqlite3.connect(f"file:{index_file}?mode=ro",uri=True)
+		self.entries = None
+
+	def term(self,field,value):
+
+		field = field.lower() or "name"
+		value = value.strip('"')
+		if field == "go":
+			value = re.sub(r"^go:","",value,flags=re.IGNORECASE)
+		if field in ("reviewed","structure_3d","organism_id","accession") or ((field == "go") and value.isdigit()):
+			keys = [f"{field}:{value.lower()}"]
+		elif field in ("go","keyword","name"):
+			keys = [f"{field}:{word}" for word in words(value)]
+		else:
+			raise QueryError(f"Unsupported query field: {field}")
+
+		## Accessions having all the words of the value
+		matches = None
+		for key in keys:
+			entries = {row[0] for row in self.db.execute("SELECT entry FROM terms WHERE term = ?",(key,))}
+			matches = entries if matches is None else (matches & entries)
+		return matches or set()
+
+	def all_entries(self):
+
+		if self.entries is None:
+			self.entries = {row[0] for row in self.db.execute("SELECT id FROM entries")}
+		return self.entries
+
+	def search(self,query):
+
+		## Sorted accessions matching the query; AND binds tighter than OR, like uniprot.org
+		tokens = query_token.findall(query)
+		position = 0
+
+		def peek():
+			return tokens[position].upper() if position < len(tokens) else None
+
+		def advance():
+			nonlocal position
+			position += 1
+			return tokens[position-1]
+
+		def expression():
+			result = conjunction()
+			while peek() == "OR":
+				advance()
+				result = result | conjunction()
+			return result
+
+		def conjunction():
+			result = negation()
+			while peek() not in (None,"OR",")"):
+				if peek() == "AND":
+					advance()
+				result = result & negation()
+			return result
+
+		def negation():
+			if peek() == "NOT":
+				advance()
+				return self.all_entries() - negation()
+			return atom()
+
+		def atom():
+			if peek() is None:
+				raise QueryError(f"Incomplete query: {query}")
+			token = advance()
+			if token == "(":
+				result = expression()
+				if peek() != ")":
+					raise QueryError(f"Unbalanced parentheses: {query}")
+				advance()
+				return result
+			if token == ")":
+				raise QueryError(f"Unbalanced parentheses: {query}")
+			field, _, value = token.partition(":") if re.match(r'^[\w.-]+:',token) else ("","",token)
+			return self.term(field,value)
+
+		matches = expression()
+		if position < len(tokens):
+			raise QueryError(f"Unexpected '{tokens[position]}' in query: {query}")
+
+		accessions = []
+		matches = sorted(matches)
+		for start in range(0,len(matches),500):
+			chunk = matches[start:start+500]
+			accessions += [row[0] for row in self.db.execute(f"SELECT accession FROM entries WHERE id IN ({','.join('?'*len(chunk))})",chunk)]
+		return sorted(accessions)
+
+	def entry(self,accession,alphafold_version=4):
+
+		## Same as uniprot_scraper.py rest_entry(): protein name, organism name,
+		## {feature: count}, [[pdb, chain, method, download link], ...]
+		row = self.db.execute("SELECT protein_name, organism_name, features, structures FROM entries WHERE accession = ?",(accession,)).fetchone()
+		if row is None:
+			return None
+		prot_name, org_name, features, structures = row
+		struct_atts = {}
+		for feature in (features.split("\n") if features else []):
+			key, count = feature.rsplit(":",1)
+			struct_atts[key] = int(count)
+		structure_data = []
+		for structure in (structures.split("\n") if structures else []):
+			pdb, chain, method = structure.split("\t")
+			if method == "Predicted":
+				structure_data.append([pdb,chain,method,alphafold_link(pdb,alphafold_version)])
+			else:
+				structure_data.append([pdb,chain,method,f"https://files.rcsb.org/download/{pdb}.pdb"])
+		return prot_name, org_name, struct_atts, structure_data
+
+	def fasta(self,accession):
+
+		## UniProt FASTA header (database|accession|entry name), 60 residues per line
+		row = self.db.execute("SELECT entry_name, reviewed, protein_name, organism_name, taxon, sequence FROM entries WHERE accession = ?",(accession,)).fetchone()
+		if row is None:
+			return None
+		entry_name, reviewed, prot_name, org_name, taxon, sequence = row
+		organism = re.sub(r"\s*\(.*\)$","",org_name)
+		fasta = f">{'sp' if reviewed else 'tr'}|{accession}|{entry_name} {prot_name} OS={organism} OX={taxon}\n"
+		fasta += "".join([f"{sequence[start:start+60]}\n" for start in range(0,len(sequence),60)])
+		return fasta
+
+	def close(self):
+
+		self.db.close()
+
+if __name__ == "__main__":
+
+	from sys import argv, stdout
+	from time import time
+	import argparse
+
+	if (len(argv) < 2) or (argv[1] not in ("build","search","fasta")):
+		exit(f"{usage}")
+
+	command = argv[1]
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-d","--dat",nargs="+")
+	parser.add_argument("-i","--index",required=True)
+	parser.add_argument("-q","--query")
+	parser.add_argument("-a","--accessions",nargs="+",default=[])
+	args = parser.parse_args(argv[2:])
+
+	if command == "build":
+		if not args.dat:
+			exit("[E]  build requires --dat")
+		start = time()
+		count = build(args.dat,args.index)
+		print(f"\t{count} entries indexed in {args.index} ({time()-start:.1f} s)")
+		exit()
+
+	index = OfflineIndex(args.index)
+	if command == "search":
+		if not args.query:
+			exit("[E]  search requires --query")
+		try:
+			for accession in index.search(args.query):
+				print(accession)
+		except QueryError as error:
+			exit(f"[E]  {error}")
+	else:
+		for accession in args.accessions:
+			fasta = index.fasta(accession)
+			if fasta is None:
+				print(f"[W]  {accession} not found in {args.index}")
+			else:
+				stdout.write(fasta)
+	index.close()
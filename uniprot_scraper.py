@@ -1,8 +1,8 @@
 #!/usr/bin/python
 
 name = "uniprot_scraper.py"
-version = "1.8.0"
-updated = "2022-12-04"
+version = "1.13.1"
+updated = "2026-10-17"
 
 usage = f"""\n
 NAME		{name}
@@ -30,6 +30,26 @@ OPTIONS
 -o (--outdir)			Output directory for downloading files [Default = ./UNIPROT_SCRAP_RESULTS]
 -c (--custom)			Custom UniProt search
 
+## DOWNLOAD OPTIONS ##
+-w (--workers)			Number of concurrent downloads [Default = 8]
+--per_host			Maximum concurrent downloads from a single host [Default = 4]
+--cache				Shared download cache linked into the output directory [Default = $QUEGO_CACHE]
+--cache_max_size		Evict least recently used cached files beyond this size (GB)
+--cache_max_age			Evict cached files unused for this many days
+--extract_workers		Number of processes extracting chains from PDB/mmCIF entries [Default = number of CPUs]
+
+## REST API OPTIONS ##
+-r (--rest)			Acquire metadata with bulk UniProt REST queries instead of crawling accession pages
+--rest_url			UniProt REST API location (i.e., a local stand-in) [Default = https://rest.uniprot.org]
+--page_size			Number of accessions requested per result page [Default = 500]
+
+## OFFLINE OPTIONS ##
+--offline			Answer the search from a local UniProt index (uniprot_offline_index.py) instead of uniprot.org
+--pdb_mirror			Local PDB mirror (divided or flat; pdb1abc.ent.gz, 1abc.cif.gz...) to extract chains from
+--alphafold_mirror		Directory of AlphaFold models (AF-P12345-F1-model_v4.pdb[.gz]) to copy predicted structures from
+--alphafold_version		AlphaFold database version of the predicted models downloaded or copied [Default = 4]
+				Structures not found in the mirrors are downloaded
+
 """
 
 def die(string):
@@ -42,10 +62,21 @@ if (len(argv) == 1):
 	die(f"{usage}")
 
 import re
+import json
+import gzip
+import shutil
+import threading
 import argparse
-from os import system, mkdir, path, listdir
+from urllib.request import Request, urlopen
+from urllib.parse import quote, urlsplit
+from os import system, mkdir, path, listdir, environ, remove, replace, cpu_count
 from time import sleep
 from datetime import datetime
+from file_downloader import Downloader
+from download_cache import DownloadCache
+from pdb_chain_extractor import ChainExtractor, find_entry
+from metadata_store import MetadataStore
+from uniprot_offline_index import OfflineIndex, QueryError, alphafold_link
 
 start_time = datetime.today()
 
@@ -62,6 +93,19 @@ parser.add_argument("-f","--fasta",action='store_true')
 parser.add_argument("-m","--method",nargs='+')
 parser.add_argument("-o","--outdir",default="./UNIPROT_SCRAP_RESULTS")
 parser.add_argument("-c","--custom")
+parser.add_argument("-w","--workers",type=int,default=8)
+parser.add_argument("--per_host",type=int,default=4)
+parser.add_argument("--cache",default=environ.get("QUEGO_CACHE"))
+parser.add_argument("--cache_max_size",type=float)
+parser.add_argument("--cache_max_age",type=float)
+parser.add_argument("--extract_workers",type=int,default=cpu_count())
+parser.add_argument("-r","--rest",action='store_true')
+parser.add_argument("--rest_url",default="https://rest.uniprot.org")
+parser.add_argument("--page_size",type=int,default=500)
+parser.add_argument("--offline")
+parser.add_argument("--pdb_mirror")
+parser.add_argument("--alphafold_mirror")
+parser.add_argument("--alphafold_version",type=int,default=4)
 
 args = parser.parse_args()
 
@@ -74,6 +118,16 @@ download_fasta = args.download_fasta
 methods = args.method
 outdir = args.outdir
 custom = args.custom
+workers = args.workers
+per_host = args.per_host
+cache_dir = args.cache
+rest = args.rest
+rest_url = args.rest_url.rstrip("/")
+page_size = args.page_size
+offline = args.offline
+pdb_mirror = args.pdb_mirror
+alphafold_mirror = args.alphafold_mirror
+alphafold_version = args.alphafold_version
 fastadir = outdir + "/FASTA"
 pdbdir = outdir + "/PDBs"
 
@@ -88,14 +142,6 @@ if not (path.exists(fastadir)):
 if not (path.exists(pdbdir)):
 	mkdir(pdbdir)
 
-## Loading all the necessary packages for web scraping
-from selenium import webdriver 
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.firefox.options import Options
-
 ###################################################################################################
 ## Begin logging
 ###################################################################################################
@@ -105,44 +151,18 @@ OPS = open(f"{outdir}/uniprot_scraper.log","w")
 OPS.write(f">NAME\n  {name}\n\n")
 OPS.write(f">VERSION\n  {version}\n\n")
 
-previous_downloads = {}
-accession = ""
-data_key = ""
-if path.isfile(f"{outdir}/metadata.log"):
-	META = open(f"{outdir}/metadata.log","r")
-	for line in META:
-		line = line.replace("\n","")
-		if line:
-			if line[0] == ">":
-				accession = line.replace(">","",1)
-			elif line[0:2] == "\t\t":
-				if accession in previous_downloads.keys():
-					if data_key in previous_downloads[accession].keys():
-						previous_downloads[accession][data_key] = previous_downloads[accession][data_key] + "\n\t\t" + line.replace("\t\t","",1)
-					else:
-						previous_downloads[accession][data_key] = line.replace("\t\t","",1)
-				else:
-					previous_downloads[accession] = {}
-					previous_downloads[accession][data_key] = line.replace("\t\t","",1)
-			elif line[0] == "\t":
-				data_key = line.replace("\t","")
-	META.close()
-
+## Metadata is committed to the store one accession at a time, so an interrupted scrap resumes
+## where it stopped; metadata.log is exported from the store once the scrap is done. A
+## metadata.log written by an earlier version is imported when the store is created.
+store = MetadataStore(f"{outdir}/metadata.sqlite",import_log=f"{outdir}/metadata.log")
 
-## META stores the accession numbers, the organism names, the FASTA and 3D Structure links, and 3D structure features
-META = open(f"{outdir}/metadata.log","w")
+## Accessions of this search, in the order they are written to metadata.log
+run_accessions = []
 
 ###################################################################################################
-## Setting up webscaper object
+## Preparing search
 ###################################################################################################
 
-## Create options for the scraper (really only used to make it headless)
-options = Options()
-options.headless = True
-
-## Create the scraper object
-driver = webdriver.Firefox(options=options,service_log_path=path.devnull)
-
 ## Setting up the results url using keywords
 url = "https://www.uniprot.org/uniprotkb?query="
 
@@ -150,7 +170,8 @@ url = "https://www.uniprot.org/uniprotkb?query="
 keywords = []
 
 if(go_keyword):
-	keywords.append(f"(go:{go_keyword})")
+	## Keywords of several words are searched as a phrase
+	keywords.append(f"(go:\"{go_keyword}\")" if re.search(r"\s",go_keyword.strip()) else f"(go:{go_keyword})")
 if(structures):
 	keywords.append("(structure_3d:true)")
 if(reviewed):
@@ -162,8 +183,10 @@ OPS.write(f">KEYWORDS\n")
 
 if(custom):
 	url = url + custom
+	query = custom
 	OPS.write(f"  {custom}\n")
 else:
+	query = " AND ".join(keywords)
 	url = url + keywords[0]
 	OPS.write(f"  {keywords[0]}\n")
 	for ops in keywords[1:]:
@@ -171,6 +194,11 @@ else:
 		OPS.write(f"  {ops}\n")
 OPS.write(f"\n")
 
+if(rest):
+	## Only the fields written to metadata.log are requested
+	fields = "accession,protein_name,organism_name,ft_helix,ft_strand,ft_turn,xref_pdb,xref_alphafolddb"
+	url = f"{rest_url}/uniprotkb/search?query={quote(query)}&fields={fields}&format=json&size={page_size}"
+
 OPS.write(f">DOWNLOAD_FASTA\n")
 if(download_fasta):
 	OPS.write(f"  TRUE\n")
@@ -191,10 +219,418 @@ else:
 	OPS.write(f"  FALSE\n")
 OPS.write(f"\n")
 
-OPS.write(f">SEARCH_URL\n  {url}\n\n")
+if(offline):
+	OPS.write(f">OFFLINE_INDEX\n  {offline}\n\n")
+else:
+	OPS.write(f">SEARCH_URL\n  {url}\n\n")
 OPS.write(f">LAUNCHED\n  {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
 
-print(f"\nConnecting to {url}")
+if(offline):
+	print(f"\nSearching {offline} for {query}")
+else:
+	print(f"\nConnecting to {url}")
+
+###################################################################################################
+## Shared functions
+###################################################################################################
+
+## Chains are extracted from PDB/mmCIF entries by worker processes, started before any thread
+extractor = ChainExtractor(args.extract_workers)
+pdb_entries = set()
+
+## Chains wanted from each entry, extracted together in a single pass once downloads are done:
+## {(entry, prefix): [{chains}, [callbacks]]}
+wanted_chains = {}
+wanted_lock = threading.Lock()
+
+## Downloads are performed by a pool of workers reusing connections to each host
+downloader = Downloader(workers=workers,per_host=per_host,errors=f"{outdir}/download.error")
+pdb_locks = {}
+
+## Files already downloaded by other runs are linked from the shared cache
+cache = None
+if cache_dir:
+	cache = DownloadCache(cache_dir,max_size=args.cache_max_size,max_age=args.cache_max_age)
+
+def cache_key(pdb_code,method,chain):
+
+	if method != "Predicted":
+		return f"pdb:{pdb_code}_{chain}", f"{pdbdir}/{pdb_code}_{chain}.pdb.gz"
+	return f"pdb:{pdb_code}", f"{pdbdir}/{pdb_code}.pdb.gz"
+
+def get_fasta(link,accession):
+
+	if cache and cache.fetch(f"fasta:{accession}",f"{fastadir}/{accession}.fasta"):
+		print(f"\t\tFASTA linked from cache for {accession}")
+	else:
+		print(f"\t\tDownloading FASTA file for {accession}")
+		downloader.submit(link,f"{fastadir}/{accession}.fasta",lambda: cache and cache.store(f"fasta:{accession}",f"{fastadir}/{accession}.fasta"))
+
+def acquired_files(accession):
+
+	## Files of a stored accession: its FASTA file and the structures kept for it
+	prot_name, org_name, features, structures = store.get(accession)
+	return [f"{fastadir}/{accession}.fasta"] + [cache_key(pdb,method,chain)[1] for pdb, chain, method, link in structures]
+
+def previously_acquired(accession):
+
+	run_accessions.append(accession)
+	if accession in store:
+		## Accessions are stored while their files are still being downloaded and extracted; those
+		## of a run killed in between are acquired again
+		missing = [file for file in acquired_files(accession) if not path.isfile(file)]
+		if not missing:
+			print(f"\tData previously acquired... Skipping...")
+			return True
+		print(f"\tData previously acquired, {len(missing)} file(s) missing... Acquiring again...")
+	return False
+
+def features_list(struct_atts):
+
+	if struct_atts:
+		return [f"{key.upper()}:{struct_atts[key]}" for key in sorted(struct_atts.keys())]
+	return ["None Available"]
+
+def store_chain(pdb_code,method,chain):
+
+	if cache:
+		key, final = cache_key(pdb_code,method,chain)
+		if path.isfile(final):
+			cache.store(key,final)
+
+def want_chain(entry,pdb_code,method,chain,prefix=None):
+
+	with wanted_lock:
+		chains, callbacks = wanted_chains.setdefault((entry,prefix),[set(),[]])
+		chains.add(chain)
+		callbacks.append(lambda written: store_chain(pdb_code,method,chain))
+
+def extract_wanted():
+
+	## One pass per entry for all the chains wanted by the accessions
+	for (entry, prefix), (chains, callbacks) in wanted_chains.items():
+		for callback in callbacks:
+			extractor.submit(entry,sorted(chains),pdbdir,callback,prefix=prefix)
+
+def process_pdb(pdb_code,method,chain):
+
+	if method != "Predicted":
+		## Only the chains wanted are written (gzipped) from the PDB or mmCIF entry; chains
+		## requested by different accessions are extracted together
+		entry = find_entry(pdbdir,pdb_code)
+		if entry and (not path.isfile(f"{pdbdir}/{pdb_code}_{chain}.pdb.gz")):
+			pdb_entries.add(entry)
+			want_chain(entry,pdb_code,method,chain)
+			return
+	else:
+		with pdb_locks.setdefault(pdb_code,threading.Lock()):
+			if not path.isfile(f"{pdbdir}/{pdb_code}.pdb.gz"):
+				system(f"""
+					gzip {pdbdir}/{pdb_code}.pdb
+				""")
+
+	store_chain(pdb_code,method,chain)
+
+def get_entry(pdb_code,method,chain,extension="pdb"):
+
+	## Keep whole PDB entries so other chains can be extracted later without downloading again
+	if cache and (method != "Predicted"):
+		cache.store(f"entry:{pdb_code}" + ("" if extension == "pdb" else f".{extension}"),f"{pdbdir}/{pdb_code}.{extension}")
+	process_pdb(pdb_code,method,chain)
+
+def get_cif(pdb_code,method,chain):
+
+	## Entries too large for the legacy PDB format are only available as mmCIF
+	cif_link = f"https://files.rcsb.org/download/{pdb_code}.cif"
+	print(f"\t\tNo PDB format for {pdb_code}, downloading {cif_link}")
+	downloader.submit(cif_link,f"{pdbdir}/{pdb_code}.cif",lambda: get_entry(pdb_code,method,chain,"cif"))
+
+def get_pdb(struct_link,pdb_code,method,chain):
+
+	if cache:
+		key, final = cache_key(pdb_code,method,chain)
+		if path.isfile(final) or cache.fetch(key,final):
+			print(f"\t\tLinked {path.basename(final)} from cache")
+			return
+
+	## Downloads and chain extraction run in the background while metadata is being collected
+	if method != "Predicted":
+		downloaded = path.isfile(f"{pdbdir}/{pdb_code}_{chain}.pdb.gz") or find_entry(pdbdir,pdb_code)
+	else:
+		downloaded = path.isfile(f"{pdbdir}/{pdb_code}.pdb.gz")
+
+	if not downloaded:
+		if cache and (method != "Predicted") and (cache.fetch(f"entry:{pdb_code}",f"{pdbdir}/{pdb_code}.pdb") or cache.fetch(f"entry:{pdb_code}.cif",f"{pdbdir}/{pdb_code}.cif")):
+			print(f"\t\tLinked {pdb_code} entry from cache")
+			downloader.run(process_pdb,pdb_code,method,chain)
+		else:
+			fallback = (lambda: get_cif(pdb_code,method,chain)) if method != "Predicted" else None
+			downloader.submit(struct_link,f"{pdbdir}/{pdb_code}.pdb",lambda: get_entry(pdb_code,method,chain),fallback)
+			print(f"\t\tDownloading {struct_link}")
+	else:
+		print(f"\t\tSkipping {pdb_code}, already downloaded")
+		downloader.run(process_pdb,pdb_code,method,chain)
+
+def mirror_entry(pdb_code):
+
+	## Divided (pdb/ab/pdb1abc.ent.gz, mmCIF/ab/1abc.cif.gz) or flat layouts of the local PDB mirror
+	code = pdb_code.lower()
+	for directory in (f"{pdb_mirror}/{code[1:3]}",pdb_mirror):
+		for file_name in (f"pdb{code}.ent",f"{code}.cif",f"{code}.pdb"):
+			for suffix in (".gz",""):
+				if path.isfile(f"{directory}/{file_name}{suffix}"):
+					return f"{directory}/{file_name}{suffix}"
+	return find_entry(pdb_mirror,pdb_code)
+
+def get_local(struct_link,pdb_code,method,chain):
+
+	## Structures are taken from the local mirrors; those missing are downloaded
+	if method != "Predicted":
+		entry = pdb_mirror and (not path.isfile(f"{pdbdir}/{pdb_code}_{chain}.pdb.gz")) and mirror_entry(pdb_code)
+		if entry:
+			## Entries of the mirror are read in place and never removed
+			print(f"\t\tExtracting chain {chain} of {pdb_code} from {entry}")
+			want_chain(entry,pdb_code,method,chain,prefix=pdb_code)
+			return
+	else:
+		model = f"{alphafold_mirror}/{path.basename(struct_link)}" if alphafold_mirror else None
+		final = f"{pdbdir}/{pdb_code}.pdb.gz"
+		if model and (not path.isfile(final)) and (path.isfile(model) or path.isfile(f"{model}.gz")):
+			print(f"\t\tCopying {path.basename(model)} from {alphafold_mirror}")
+			if path.isfile(f"{model}.gz"):
+				shutil.copyfile(f"{model}.gz",f"{final}.part")
+			else:
+				with open(model,"rb") as MODEL, gzip.open(f"{final}.part","wb") as OUT:
+					shutil.copyfileobj(MODEL,OUT)
+			replace(f"{final}.part",final)
+			store_chain(pdb_code,method,chain)
+			return
+
+	get_pdb(struct_link,pdb_code,method,chain)
+
+def finish():
+
+	## Wait for the remaining downloads
+	print("\nWaiting for downloads to complete...\n")
+	downloader.close()
+	print(f"\t{downloader.report()}\n")
+	OPS.write(f">DOWNLOADS\n  {downloader.report()}\n\n")
+
+	## Extract the chains wanted and wait for the extractions
+	extract_wanted()
+	extractor.close()
+	OPS.write(f">CHAIN_EXTRACTION\n  {extractor.report()}\n\n")
+	if extractor.errors:
+		ERRORS = open(f"{outdir}/download.error","a")
+		for error in extractor.errors:
+			ERRORS.write(f"{error}\n")
+		ERRORS.close()
+
+	if cache:
+		cache.close()
+
+	## Remove whole entries once their chains are extracted, to prevent unwanted hits being returned
+	for entry in pdb_entries:
+		if path.isfile(entry):
+			remove(entry)
+
+	if download_structures:
+		## Folders left by split_PDB.pl in earlier versions
+		for item in listdir(f"{pdbdir}/"):
+			if (path.isdir(f"{pdbdir}/{item}")):
+				system(f"rm -r {pdbdir}/{item}")
+
+	stop_time = datetime.today()
+	OPS.write(f">COMPLETED\n  {stop_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+	hours, rest = divmod((stop_time-start_time).total_seconds(),60*60)
+	mins, secs = divmod(rest,60)
+
+	OPS.write(f">RUNTIME\n  {int(hours)}:{int(mins)}:{round(secs,2)}\n")
+
+	OPS.close()
+
+	## metadata.log only lists the accessions of this search
+	store.export(f"{outdir}/metadata.log",run_accessions)
+	store.close()
+
+###################################################################################################
+## Acquire metadata with bulk REST queries
+###################################################################################################
+
+def rest_request(link):
+
+	request = Request(link,headers={"User-Agent":f"{name}/{version}"})
+	with urlopen(request,timeout=600) as response:
+		return response.read().decode("utf-8"), response.headers.get("Link","")
+
+def rest_pages(link):
+
+	## Result pages are chained through a cursor given in the Link header of each response
+	while link:
+		content, header = rest_request(link)
+		yield content
+		link = None
+		cursor = re.search(r'<([^>]+)>;\s*rel="next"',header)
+		if cursor:
+			## Follow the cursor on the server we are talking to, so recorded pages can be replayed locally
+			next_page = urlsplit(cursor.group(1))
+			link = f"{rest_url}{next_page.path}?{next_page.query}"
+
+def rest_entry(entry):
+
+	accession = entry["primaryAccession"]
+
+	## Get protein name
+	description = entry.get("proteinDescription",{})
+	prot_name = ""
+	if "recommendedName" in description:
+		prot_name = description["recommendedName"]["fullName"]["value"]
+	elif "submissionNames" in description:
+		prot_name = description["submissionNames"][0]["fullName"]["value"]
+
+	## Get organism name
+	organism = entry.get("organism",{})
+	org_name = organism.get("scientificName","")
+	if "commonName" in organism:
+		org_name += f" ({organism['commonName']})"
+
+	## Count secondary structure features (Helix, Beta strand, Turn)
+	struct_atts = {}
+	for feature in entry.get("features",[]):
+		if feature["type"] not in struct_atts.keys():
+			struct_atts[feature["type"]] = 0
+		struct_atts[feature["type"]] += 1
+
+	## Get experimental structures from the PDB and predicted structures from AlphaFold
+	structure_data = []
+	for xref in entry.get("uniProtKBCrossReferences",[]):
+		properties = {prop["key"]:prop["value"] for prop in xref.get("properties",[])}
+		if xref["database"] == "PDB":
+			pdb = xref["id"]
+			## Chains are listed as "A/B=1-100, C=1-50"; keep the first chain like on the accession page
+			chain = properties.get("Chains","-").split("=")[0].split("/")[0]
+			structure_data.append([pdb,chain,properties.get("Method","-"),f"https://files.rcsb.org/download/{pdb}.pdb"])
+		elif xref["database"] == "AlphaFoldDB":
+			structure_data.append([accession,"-","Predicted",alphafold_link(accession,alphafold_version)])
+
+	return accession, prot_name, org_name, struct_atts, structure_data
+
+if(rest or offline):
+
+	entries = {}
+	if(offline):
+		## Acquire metadata for all accessions from the local index
+		index = OfflineIndex(offline)
+		try:
+			for accession in index.search(query):
+				entries[accession] = list(index.entry(accession,alphafold_version))
+		except QueryError as error:
+			die(f"[E]  {error}")
+		print(f"\tFound {len(entries)} accessions in {offline}")
+	else:
+		## Acquire metadata for all accessions from the paginated search results
+		for page in rest_pages(url):
+			for entry in json.loads(page)["results"]:
+				accession, *data = rest_entry(entry)
+				entries[accession] = data
+			print(f"\tReceived metadata for {len(entries)} accessions")
+
+	ACCESSIONS = open(f"{outdir}/accessions.list","w")
+	for accession in entries.keys():
+		ACCESSIONS.write(f"{accession}\n")
+	ACCESSIONS.close()
+
+	## Acquire all missing FASTA files from a single stream, while structures are being downloaded
+	def split_fasta():
+		FASTA = None
+		STREAM = open(f"{outdir}/sequences.fasta","r")
+		for line in STREAM:
+			if line[0] == ">":
+				if FASTA:
+					FASTA.close()
+					FASTA = None
+				accession = line.split("|")[1]
+				if (accession in entries.keys()) and (not path.exists(f"{fastadir}/{accession}.fasta")):
+					FASTA = open(f"{fastadir}/{accession}.fasta","w")
+			if FASTA:
+				FASTA.write(line)
+		if FASTA:
+			FASTA.close()
+		STREAM.close()
+		if cache:
+			for accession in entries.keys():
+				if path.isfile(f"{fastadir}/{accession}.fasta"):
+					cache.store(f"fasta:{accession}",f"{fastadir}/{accession}.fasta")
+		system(f"rm {outdir}/sequences.fasta")
+
+	if cache:
+		for accession in entries.keys():
+			if not path.exists(f"{fastadir}/{accession}.fasta"):
+				cache.fetch(f"fasta:{accession}",f"{fastadir}/{accession}.fasta")
+
+	if offline:
+		for accession in entries.keys():
+			if not path.exists(f"{fastadir}/{accession}.fasta"):
+				FASTA = open(f"{fastadir}/{accession}.fasta","w")
+				FASTA.write(index.fasta(accession))
+				FASTA.close()
+				if cache:
+					cache.store(f"fasta:{accession}",f"{fastadir}/{accession}.fasta")
+		index.close()
+
+	if [accession for accession in entries.keys() if not path.exists(f"{fastadir}/{accession}.fasta")]:
+		print("\nDownloading FASTA files\n")
+		downloader.submit(f"{rest_url}/uniprotkb/stream?query={quote(query)}&format=fasta",f"{outdir}/sequences.fasta",split_fasta)
+
+	print("\nAcquiring metadata:\n")
+
+	for count,accession in enumerate(sorted(entries.keys())):
+
+		print(f"[{count+1:0>{len(str(len(entries)))}}/{len(entries)}]\t{accession}")
+
+		if previously_acquired(accession):
+			continue
+
+		prot_name, org_name, struct_atts, structure_data = entries[accession]
+		print(f"\t{accession} ({prot_name})\n")
+
+		kept = []
+		if structure_data:
+			for pdb, chain, method, download_link in structure_data:
+				if (not methods) or (method in methods):
+					kept.append([pdb,chain,method,download_link])
+					if offline:
+						get_local(download_link,pdb,method,chain)
+					else:
+						get_pdb(download_link,pdb,method,chain)
+			print()
+
+		store.put(accession,prot_name,org_name,features_list(struct_atts),kept)
+
+	print()
+
+	finish()
+	exit()
+
+###################################################################################################
+## Setting up webscaper object
+###################################################################################################
+
+## Loading all the necessary packages for web scraping
+from selenium import webdriver 
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.firefox.options import Options
+
+## Create options for the scraper (really only used to make it headless)
+options = Options()
+options.headless = True
+
+## Create the scraper object
+driver = webdriver.Firefox(options=options,service_log_path=path.devnull)
 
 ###################################################################################################
 ## Acquire accessions list for given keywords
@@ -289,22 +725,7 @@ try:
 
 		print(f"[{count+1:0>{len(str(len(accession_numbers)))}}/{len(accession_numbers)}]\t{accession}")
 
-		if accession in previous_downloads.keys():
-			print(f"\tData previously acquired... Skipping...")
-			META.write(f">{accession}\n")
-			META.write(f"\tPROTEIN_NAME\n")
-			META.write(f"\t\t{previous_downloads[accession]['PROTEIN_NAME']}\n")
-			META.write(f"\tORGANISM_NAME\n")
-			META.write(f"\t\t{previous_downloads[accession]['ORGANISM_NAME']}\n")
-			META.write(f"\tFEATURES\n")
-			META.write(f"\t\t{previous_downloads[accession]['FEATURES']}\n")
-			META.write(f"\tSTRUCTURES\n")
-			
-			if 'STRUCTURES' in previous_downloads[accession].keys():
-				META.write(f"\t\t{previous_downloads[accession]['STRUCTURES']}\n")
-			else:
-				META.write(f"\n")
-			
+		if previously_acquired(accession):
 			continue
 
 		## acession = [FASTA link,features,[structures]]
@@ -354,13 +775,9 @@ try:
 		for alt in list_content[name_index].find_elements_by_css_selector("button"):
 			org_name = org_name.replace(alt.text,"")
 
-		META.write(f">{accession}\n")
-		META.write(f"\tPROTEIN_NAME\n\t\t{prot_name}\n")
-		META.write(f"\tORGANISM_NAME\n\t\t{org_name}\n")
 		print(f"\t{accession} ({prot_name})\n")
 		if (not path.exists(f"{fastadir}/{accession}.fasta")):
-			print(f"\t\tDownloading FASTA file for {accession}")
-			system(f"wget https://rest.uniprot.org/uniprotkb/{accession}.fasta -O {fastadir}/{accession}.fasta 1>/dev/null 2>>{outdir}/download.error")
+			get_fasta(f"https://rest.uniprot.org/uniprotkb/{accession}.fasta",accession)
 		else:
 			print(f"\t\tFASTA previously downloaded for {accession}...Skipping...")
 
@@ -408,8 +825,6 @@ try:
 			except Exception:
 				next
 
-		META.write(f"\tFEATURES\n")
-		
 		struct_atts = {}
 		
 		if attributes:
@@ -425,18 +840,10 @@ try:
 						struct_atts[feat] = 0
 					struct_atts[feat] += 1
 			
-			for key in sorted(struct_atts.keys()):
-				META.write(f"\t\t{key.upper()}:{struct_atts[key]}\n")
-			
 			scrap_results[accession][1] = struct_atts
 
-		else:
-			
-			META.write(f"\t\tNone Available\n")
-
-		META.write(f"\tSTRUCTURES\n")
-
 		structure_data = []
+		kept = []
 
 		if results:
 
@@ -462,40 +869,9 @@ try:
 
 				## Get the PDB
 				structure_data.append([pdb,chain,method,download_link])
-				if method in methods:
-					META.write(f"\t\t{pdb}\t{chain}\t{method}\t{download_link}\n")
-
-			def get_pdb(struct_link,pdb_code,method,chain):
-
-				if ((not path.isdir(f"{pdbdir}/{pdb_code}")) and (not path.isfile(f"{pdbdir}/{pdb_code}.pdb.gz"))):
-					system(f"wget {struct_link} -O {pdbdir}/{pdb_code}.pdb 1>/dev/null 2>>{outdir}/download.error")
-					print(f"\t\tDownloading {struct_link}")
-				else:
-					print(f"\t\tSkipping {pdb_code}, already downloaded")
+				if (not methods) or (method in methods):
+					kept.append([pdb,chain,method,download_link])
 
-				if method != "Predicted":
-					if (not path.isdir(f"{pdbdir}/{pdb_code}")):
-						system(f"""
-							{pipeline_location}/split_PDB.pl \\
-							-p {pdbdir}/{pdb_code}.pdb \\
-							-o {pdbdir}/{pdb_code}
-						""")
-					system(f"""
-						if [ -f {pdbdir}/{pdb_code}/{pdb_code}_{chain}.pdb ]
-						then
-							if ! [ -f {pdbdir}/{pdb_code}_{chain}.pdb.gz ]
-							then
-								mv {pdbdir}/{pdb_code}/{pdb_code}_{chain}.pdb {pdbdir}
-								gzip {pdbdir}/{pdb_code}_{chain}.pdb
-							fi
-						fi
-					""")
-				else:
-					if not path.isfile(f"{pdbdir}/{pdb_code}.pdb.gz"):
-						system(f"""
-							gzip {pdbdir}/{pdb_code}.pdb
-						""")
-			
 			for set in structure_data:
 
 				pdb, chain, method, download_link = set
@@ -510,31 +886,14 @@ try:
 			
 			scrap_results[accession][2] = structure_data
 
-		else:
-
-			META.write(f"\t\tNONE\n")
+		store.put(accession,prot_name,org_name,features_list(struct_atts),kept)
 
 	print()
 
 	## Close the scraper, we are done surfing
 	driver.close()
 
-	if download_structures:
-		## Remove unneeded PDBs to prevent unwanted hits being returned
-		for item in listdir(f"{pdbdir}/"):
-			if (path.isdir(f"{pdbdir}/{item}")):
-				system(f"rm -r {pdbdir}/{item}")
-
-	stop_time = datetime.today()
-	OPS.write(f">COMPLETED\n  {stop_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-	hours, rest = divmod((stop_time-start_time).total_seconds(),60*60)
-	mins, secs = divmod(rest,60)
-
-	OPS.write(f">RUNTIME\n  {int(hours)}:{int(mins)}:{round(secs,2)}\n")
-
-	OPS.close()
-	META.close()
+	finish()
 
 except Exception:
 	driver.close()
@@ -0,0 +1,145 @@
+#!/usr/bin/python
+
+name = "validate_tmscore_engine.py"
+version = "0.1.1"
+updated = "2026-10-17"
+
+usage = f"""\n
+NAME		{name}
+VERSION		{version}
+UPDATED		{updated}
+SYNOPSIS	Compares the TM-scores of tmscore_engine.py to those of MICAN on a fixture set of
+		structure pairs and reports the agreement and the engine throughput.
+
+COMMAND		{name} \\
+		  -p benchmark/fixtures/tmscore/pairs.tsv \\
+		  -t 0.05
+
+FIXTURE		benchmark/fixtures/tmscore/ (paths relative to the QueGO directory) holds 15 pairs
+		of C-alpha chains: copies of a chain moved rigidly, with coordinate noise (0.5 to 4 A),
+		bent at a hinge or truncated, and unrelated chains. Column 7 holds reference TM-scores
+		of the aligned ranges, normalized by the target length, found by an exhaustive search
+		(every fragment of the alignment as a seed); set it to NA to take them from MICAN.
+
+OPTIONS
+-p (--pairs)		Tab-delimited pairs: query structure, target structure, qstart, qend, tstart, tend,
+			and optionally the MICAN TM-score (MICAN is run on pairs without one)
+-t (--tolerance)	Maximum mean absolute error accepted [Default = 0.05]
+-n (--norm)		Length used to normalize the engine TM-scores: target, query, min or max [Default = target]
+-o (--out)		Write the scores of each pair (query, target, MICAN, engine) to this file
+
+"""
+
+import re
+import gzip
+import shutil
+import tempfile
+import subprocess
+from sys import argv
+from time import time
+
+import numpy as np
+
+from tmscore_engine import tm_scores, read_pairs
+
+def mican_score(query,target,tmp_dir):
+
+	## Same call and parsing as run_MICAN.pl: TMscore of the rank 1 alignment
+	files = []
+	for index, file in enumerate((query,target)):
+		temp = f"{tmp_dir}/{index}.pdb"
+		opener = gzip.open if file.endswith(".gz") else open
+		with opener(file,"rb") as IN, open(temp,"wb") as OUT:
+			shutil.copyfileobj(IN,OUT)
+		files.append(temp)
+
+	result = subprocess.run(["mican","-s",files[0],files[1],"-n","1"],capture_output=True,text=True).stdout
+
+	grab = False
+	for line in result.split("\n"):
+		if re.search(r"Rank\s+sTMscore",line):
+			grab = True
+		match = re.match(r"^\s+(1.*)",line)
+		if grab and match:
+			return float(match.group(1).split()[2])
+
+	return None
+
+def ranks(values):
+
+	order = np.argsort(values,kind="stable")
+	ranked = np.empty(len(values))
+	ranked[order] = np.arange(len(values))
+	## Ties share their average rank
+	for value in np.unique(values):
+		tied = values == value
+		ranked[tied] = ranked[tied].mean()
+	return ranked
+
+def pearson(x,y):
+
+	if (len(x) < 2) or (x.std() == 0) or (y.std() == 0):
+		return float("nan")
+	return float(np.corrcoef(x,y)[0,1])
+
+if __name__ == "__main__":
+
+	import argparse
+
+	if (len(argv) == 1):
+		exit(f"{usage}")
+
+	parser = argparse.ArgumentParser(usage=usage)
+	parser.add_argument("-p","--pairs",required=True)
+	parser.add_argument("-t","--tolerance",type=float,default=0.05)
+	parser.add_argument("-n","--norm",choices=["target","query","min","max"],default="target")
+	parser.add_argument("-o","--out")
+
+	args = parser.parse_args()
+
+	pairs = read_pairs(args.pairs)
+
+	## Reference scores: taken from the fixture when present, otherwise computed with MICAN
+	reference = []
+	FIXTURE = open(args.pairs,"r")
+	lines = [line.rstrip("\n").split("\t") for line in FIXTURE if line.strip()]
+	FIXTURE.close()
+
+	tmp_dir = tempfile.mkdtemp(prefix="MICAN_")
+	for data, pair in zip(lines,pairs):
+		if (len(data) > 6) and (data[6] not in ("","NA")):
+			reference.append(float(data[6]))
+		else:
+			reference.append(mican_score(pair[0],pair[1],tmp_dir))
+	shutil.rmtree(tmp_dir)
+
+	start = time()
+	scores = tm_scores(pairs,norm=args.norm)
+	elapsed = max(time()-start,1e-6)
+
+	if args.out:
+		OUT = open(args.out,"w")
+		OUT.write("## Query\tTarget\tMICAN\tEngine\n")
+		for pair, mican, engine in zip(pairs,reference,scores):
+			OUT.write(f"{pair[0]}\t{pair[1]}\t{'NA' if mican is None else mican}\t{'NA' if engine is None else engine}\n")
+		OUT.close()
+
+	compared = [(mican,engine) for mican, engine in zip(reference,scores) if (mican is not None) and (engine is not None)]
+	if not compared:
+		exit("\n[E]  No pairs could be scored by both MICAN and the engine\n")
+
+	mican = np.array([item[0] for item in compared])
+	engine = np.array([item[1] for item in compared])
+	error = np.abs(engine-mican)
+	mae = float(error.mean())
+
+	print(f"\nPairs\t\t{len(pairs)} ({len(compared)} scored by both)")
+	print(f"MAE\t\t{mae:.4f}")
+	print(f"Max error\t{error.max():.4f}")
+	print(f"Pearson\t\t{pearson(mican,engine):.4f}")
+	print(f"Spearman\t{pearson(ranks(mican),ranks(engine)):.4f}")
+	print(f"Within {args.tolerance}\t{(error <= args.tolerance).mean()*100:.1f}%")
+	print(f"Engine\t\t{len(pairs)/elapsed:.1f} pairs/s\n")
+
+	if mae > args.tolerance:
+		exit(f"[E]  Mean absolute error ({mae:.4f}) is above the tolerance ({args.tolerance})\n")